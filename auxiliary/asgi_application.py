@@ -0,0 +1,251 @@
+import asyncio
+import io
+import sys
+import threading
+import urllib.parse
+from collections.abc import AsyncIterator, Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+
+# Ответ маршрута, который обрабатывается прямо в цикле событий: тело (строка, байты или асинхронный поток порций), статус, заголовки
+NativeResponse = tuple[str | bytes | AsyncIterator[str], int, dict]
+
+# Тип строкового ответа без явного Content-Type - как у Flask
+default_content_type = 'text/html; charset=utf-8'
+
+end_of_stream = object()
+
+
+class AsgiApplication:
+    """
+    ASGI-приложение поверх WSGI-приложения Flask: те же маршруты и ответы, но соединения обслуживает цикл событий asyncio.
+
+    Тело запроса читается и ответ отправляется в цикле событий, поэтому простаивающие keep-alive соединения и медленные
+    клиенты не занимают потоков. Маршрут Flask (разбор, обращение к терминалу, сериализация) выполняется в пуле из threads
+    потоков, потоковый ответ (без Content-Length) передается по порциям, весь ответ готовится в одном потоке пула.
+    native_routes - маршруты (метод, путь) без Flask: асинхронный обработчик получает параметры строки запроса и тело,
+    выполняется в цикле событий и не должен блокировать, блокирующую часть он выносит в пул потоков - так отдаются потоки
+    событий подписок, которым поток не нужен и во время ожидания
+    """
+
+    def __init__(self, wsgi_app: Callable, threads: int, native_routes: dict[tuple[str, str], Callable[[dict, bytes], Awaitable[NativeResponse]]]):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='asgi-worker')
+        self.native_routes = native_routes
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope['type'] == 'lifespan':
+            await self.__lifespan__(receive, send)
+            return
+
+        if scope['type'] != 'http':
+            raise Exception(f'Unsupported ASGI connection type \'{scope["type"]}\'')
+
+        body = await self.__read_body__(receive)
+
+        if body is None:
+            return
+
+        native_route = self.native_routes.get((scope['method'], scope['path']))
+
+        if native_route is not None:
+            content, status, headers = await native_route(dict(urllib.parse.parse_qsl(scope['query_string'].decode('latin-1'))), body)
+            headers = [(name, value) for name, value in headers.items()]
+
+            if isinstance(content, (str, bytes)):
+                await self.__send_response__(send, status, headers, content)
+            else:
+                await self.__send_stream__(send, receive, status, headers, lambda: anext(content, end_of_stream), content.aclose)
+
+            return
+
+        # Весь ответ WSGI, включая порции потокового ответа и его закрытие, готовится в одном потоке пула, как у waitress:
+        # к потоку привязаны время этапов запроса (metrics) и профиль запроса (request_profiler)
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue(maxsize=1)
+        stopped = threading.Event()
+        finished = []
+
+        def put(item) -> None:
+            asyncio.run_coroutine_threadsafe(items.put(item), loop).result()
+
+        async def get():
+            # Ошибка и end_of_stream - последнее, что передает поток
+            item = await items.get()
+
+            if item is end_of_stream or isinstance(item, BaseException):
+                finished.append(True)
+
+            if isinstance(item, BaseException):
+                raise item
+
+            return item
+
+        async def close():
+            # Поток дописывает текущую порцию и закрывает ответ - его порции вычитываются до конца
+            stopped.set()
+
+            while not finished:
+                try:
+                    await get()
+                except Exception:
+                    pass
+
+            await worker
+
+        worker = loop.run_in_executor(self.executor, self.__run_wsgi__, scope, body, put, stopped)
+        status, headers, content, is_streamed = await get()
+
+        if not is_streamed:
+            await self.__send_response__(send, status, headers, content)
+            await worker
+            return
+
+        await self.__send_stream__(send, receive, status, headers, get, close, content)
+
+    # region private
+    def __run_wsgi__(self, scope: dict, body: bytes, put: Callable, stopped: threading.Event) -> None:
+        # Первым передается (статус, заголовки, тело, потоковый ли ответ): ответ с Content-Length - целиком,
+        # у потокового - только то, что записано через write, дальше - порции и end_of_stream или ошибка
+        response_start = []
+        written = []
+
+        def start_response(status: str, headers: list[tuple[str, str]], exc_info=None):
+            response_start[:] = [int(status.split(' ', 1)[0]), headers]
+            return written.append
+
+        try:
+            chunks = self.wsgi_app(self.__environ__(scope, body), start_response)
+        except BaseException as e:
+            put(e)
+            return
+
+        try:
+            status, headers = response_start
+
+            if any(name.lower() == 'content-length' for name, _ in headers):
+                put((status, headers, b''.join(written) + b''.join(chunks), False))
+                return
+
+            put((status, headers, b''.join(written), True))
+
+            for chunk in chunks:
+                if stopped.is_set():
+                    break
+
+                put(chunk)
+
+            put(end_of_stream)
+        except BaseException as e:
+            put(e)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    @staticmethod
+    def __environ__(scope: dict, body: bytes) -> dict:
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': '',
+            'PATH_INFO': scope['path'].encode().decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+
+        for name, value in scope['headers']:
+            key = name.decode('latin-1').upper().replace('-', '_')
+
+            if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                key = f'HTTP_{key}'
+
+            value = value.decode('latin-1')
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+
+        return environ
+
+    @staticmethod
+    async def __read_body__(receive: Callable) -> bytes | None:
+        # None - клиент отключился, не дослав тело
+        parts = []
+
+        while True:
+            message = await receive()
+
+            if message['type'] == 'http.disconnect':
+                return None
+
+            parts.append(message.get('body', b''))
+
+            if not message.get('more_body', False):
+                return b''.join(parts)
+
+    @staticmethod
+    def __start_message__(status: int, headers: list[tuple[str, str]]) -> dict:
+        if not any(name.lower() == 'content-type' for name, _ in headers):
+            headers = headers + [('Content-Type', default_content_type)]
+
+        return {'type': 'http.response.start', 'status': status,
+                'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]}
+
+    async def __send_response__(self, send: Callable, status: int, headers: list[tuple[str, str]], content: str | bytes) -> None:
+        await send(self.__start_message__(status, headers))
+        await send({'type': 'http.response.body', 'body': content.encode() if isinstance(content, str) else content})
+
+    async def __send_stream__(self, send: Callable, receive: Callable, status: int, headers: list[tuple[str, str]],
+                              next_chunk: Callable[[], Awaitable], close: Callable[[], Awaitable], first_chunk: bytes = b'') -> None:
+        # После тела запроса receive вернет только http.disconnect: отключение прерывает ожидание порции (например,
+        # события подписки) и закрывает источник порций, подписка снимается сразу, а не при следующем keepalive
+        disconnected = asyncio.ensure_future(receive())
+
+        try:
+            await send(self.__start_message__(status, headers))
+
+            if first_chunk:
+                await send({'type': 'http.response.body', 'body': first_chunk, 'more_body': True})
+
+            while True:
+                chunk_task = asyncio.ensure_future(next_chunk())
+                await asyncio.wait((chunk_task, disconnected), return_when=asyncio.FIRST_COMPLETED)
+
+                if disconnected.done():
+                    chunk_task.cancel()
+                    await asyncio.gather(chunk_task, return_exceptions=True)
+                    return
+
+                chunk = chunk_task.result()
+
+                if chunk is end_of_stream:
+                    break
+
+                await send({'type': 'http.response.body', 'body': chunk.encode() if isinstance(chunk, str) else chunk, 'more_body': True})
+
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            await close()
+
+    async def __lifespan__(self, receive: Callable, send: Callable) -> None:
+        while True:
+            message = await receive()
+
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # endregion
@@ -0,0 +1,151 @@
+import dataclasses
+import io
+import typing
+from collections.abc import Callable
+from datetime import datetime
+from operator import attrgetter
+
+import numpy
+from werkzeug.datastructures import MIMEAccept
+
+from metatrader.models.metatrader_quote import rates_dtype, empty_rates
+from metatrader.models.record_table import RecordTable
+from metatrader.time_conversion import unix_times_to_datetime64
+
+# Необязательные зависимости: без них соответствующий формат не предлагается при согласовании
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Двоичные ответы строятся из столбцов структурированного массива без объектов Python на каждую строку:
+#   .npy     - массив целиком (numpy.load(..., allow_pickle=False));
+#   MessagePack - {"length": n, "columns": [{"name", "dtype", "data"}]}, data - сырые байты столбца (numpy.frombuffer);
+#   Arrow IPC - поток с одним RecordBatch.
+# Время - datetime64[s] с той же корректировкой времени MetaTrader, что и в JSON; имена столбцов истории - как ключи в JSON
+json_media_type = 'application/json'
+npy_media_type = 'application/x-npy'
+msgpack_media_type = 'application/msgpack'
+arrow_media_type = 'application/vnd.apache.arrow.stream'
+
+# Тип поля записи -> тип столбца пустой таблицы (как у непустой: строки - фиксированной ширины, не меньше 1)
+empty_column_dtypes = {int: 'int64', float: 'float64', str: 'U1', datetime: 'datetime64[s]'}
+
+rates_table_dtype = numpy.dtype([('time', 'datetime64[s]')] + [(name, rates_dtype[name].str) for name in rates_dtype.names[1:]])
+
+# При равном приоритете в Accept (в т.ч. */*) выбирается JSON
+media_types = [json_media_type, npy_media_type] + ([msgpack_media_type] if msgpack is not None else []) + \
+              ([arrow_media_type] if pyarrow is not None else [])
+
+
+def negotiate(accept: MIMEAccept) -> str:
+    # Неподдерживаемый или недоступный формат - ответ в JSON, как и раньше
+    return accept.best_match(media_types, default=json_media_type) or json_media_type
+
+
+def rates_table(rates: numpy.ndarray) -> numpy.ndarray:
+    table = numpy.empty(len(rates), dtype=rates_table_dtype)
+
+    for name in rates_dtype.names:
+        table[name] = rates[name]
+
+    table['time'] = unix_times_to_datetime64(rates['time'])
+
+    return table
+
+
+def rates_by_symbol_table(rates_by_symbol: dict[str, numpy.ndarray]) -> numpy.ndarray:
+    # Бары всех символов подряд, символ - в отдельном столбце
+    symbols = list(rates_by_symbol)
+    counts = [len(rates_by_symbol[x]) for x in symbols]
+    width = max(map(len, symbols), default=1)
+
+    table = rates_table(numpy.concatenate([rates_by_symbol[x] for x in symbols]) if len(symbols) > 0 else empty_rates)
+    return __append_columns__(table, {'symbol': numpy.repeat(numpy.array(symbols, dtype=f'U{width}'), counts)})
+
+
+def aggregated_table(rates: numpy.ndarray, columns: dict[str, numpy.ndarray]) -> numpy.ndarray:
+    return __append_columns__(rates_table(rates), columns)
+
+
+def records_table(records: list | RecordTable, keys: Callable[[type], tuple[str, ...]] | None = None,
+                  record_type: type | None = None) -> numpy.ndarray:
+    """
+    Сделки (датаклассы или RecordTable) или ордера (именованные кортежи MT5) -> структурированный массив по столбцам.
+    keys - имена столбцов по типу записи (как ключи в JSON), по умолчанию - имена полей.
+    record_type - тип записи с аннотациями полей: по нему строятся столбцы пустой таблицы.
+    Строки - фиксированной ширины, datetime - datetime64[s]
+    """
+    if isinstance(records, RecordTable):
+        # Столбцы уже готовы, время - с корректировкой кривого времени в MetaTrader
+        columns = {name: unix_times_to_datetime64(records.columns[name]) if name in records.time_fields else records.columns[name]
+                   for name in records.fields}
+        return __append_columns__(numpy.empty(len(records), dtype=[]), columns)
+
+    if len(records) == 0 and record_type is None:
+        return numpy.empty(0, dtype=[])
+
+    record_type = type(records[0]) if len(records) > 0 else record_type
+    fields = tuple(x.name for x in dataclasses.fields(record_type)) if dataclasses.is_dataclass(record_type) else record_type._fields
+    names = keys(record_type) if keys is not None else fields
+
+    if len(records) == 0:
+        field_types = typing.get_type_hints(record_type)
+        return numpy.empty(0, dtype=[(name, empty_column_dtypes[field_types[field]]) for name, field in zip(names, fields)])
+
+    columns = {}
+
+    for name, field in zip(names, fields):
+        values = list(map(attrgetter(field), records))
+
+        if isinstance(values[0], datetime):
+            columns[name] = numpy.array([x.timestamp() for x in values], dtype='int64').astype('datetime64[s]')
+        elif isinstance(values[0], str):
+            columns[name] = numpy.array(values, dtype=f'U{max(1, max(map(len, values)))}')
+        else:
+            columns[name] = numpy.array(values, dtype='float64' if isinstance(values[0], float) else 'int64')
+
+    return __append_columns__(numpy.empty(len(records), dtype=[]), columns)
+
+
+def encode(table: numpy.ndarray, media_type: str) -> bytes:
+    if media_type == npy_media_type:
+        buffer = io.BytesIO()
+        numpy.lib.format.write_array(buffer, table, allow_pickle=False)
+        return buffer.getvalue()
+
+    if media_type == msgpack_media_type:
+        columns = [{'name': name, 'dtype': table.dtype[name].str, 'data': numpy.ascontiguousarray(table[name]).tobytes()}
+                   for name in table.dtype.names]
+        return msgpack.packb({'length': len(table), 'columns': columns})
+
+    if media_type == arrow_media_type:
+        batch = pyarrow.record_batch([pyarrow.array(table[name]) for name in table.dtype.names], names=list(table.dtype.names))
+        sink = pyarrow.BufferOutputStream()
+
+        with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+
+        return sink.getvalue().to_pybytes()
+
+    raise Exception(f'Unsupported media type \'{media_type}\'')
+
+
+# region private
+def __append_columns__(table: numpy.ndarray, columns: dict[str, numpy.ndarray]) -> numpy.ndarray:
+    result = numpy.empty(len(table), dtype=table.dtype.descr + [(name, column.dtype.str) for name, column in columns.items()])
+
+    for name in table.dtype.names:
+        result[name] = table[name]
+
+    for name, column in columns.items():
+        result[name] = column
+
+    return result
+
+# endregion
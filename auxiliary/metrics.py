@@ -0,0 +1,222 @@
+import bisect
+import threading
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+
+# Метрики сервиса в текстовом формате Prometheus (/metrics).
+# Запись - счетчик или гистограмма по кортежу значений меток под общей блокировкой (без объектов на каждое наблюдение),
+# поэтому замеры включены постоянно. Этапы запроса копятся в RequestTimings текущего потока и пишутся по завершении запроса
+
+time_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+size_buckets = (256, 1024, 4 * 1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2)
+
+content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Counter:
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.values: dict[tuple, float] = {}
+
+        metrics.append(self)
+
+    def increment(self, *label_values, value: float = 1) -> None:
+        with lock:
+            self.values[label_values] = self.values.get(label_values, 0) + value
+
+    def render(self) -> list[str]:
+        with lock:
+            values = list(self.values.items())
+
+        # Счетчик без меток виден и до первого события
+        if len(self.label_names) == 0 and len(values) == 0:
+            values = [((), 0)]
+
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        lines += [f'{self.name}{__labels__(self.label_names, label_values)} {__number__(value)}' for label_values, value in sorted(values)]
+
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = (), buckets: tuple[float, ...] = time_buckets):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+
+        # Метки -> [число наблюдений по корзинам (последняя - +Inf), сумма]
+        self.values: dict[tuple, list] = {}
+
+        metrics.append(self)
+
+    def observe(self, value: float, *label_values) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+
+        with lock:
+            series = self.values.get(label_values)
+
+            if series is None:
+                series = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        with lock:
+            values = [(label_values, list(counts), total) for label_values, (counts, total) in self.values.items()]
+
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+
+        for label_values, counts, total in sorted(values):
+            cumulative = 0
+
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = __labels__(self.label_names + ('le',), label_values + (__number__(bound),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+
+            lines.append(f'{self.name}_sum{__labels__(self.label_names, label_values)} {__number__(total)}')
+            lines.append(f'{self.name}_count{__labels__(self.label_names, label_values)} {cumulative}')
+
+        return lines
+
+
+class Gauge:
+    """Значение читается при выдаче /metrics (глубина очереди, число подписчиков)"""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.function: Callable[[], float] | None = None
+
+        metrics.append(self)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.function = function
+
+    def render(self) -> list[str]:
+        if self.function is None:
+            return []
+
+        return [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} gauge', f'{self.name} {__number__(self.function())}']
+
+
+class RequestTimings:
+    def __init__(self, route: str):
+        self.route = route
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+
+    def add(self, stage_name: str, seconds: float) -> None:
+        self.stages[stage_name] = self.stages.get(stage_name, 0.0) + seconds
+
+    def accounted(self) -> float:
+        return sum(self.stages.values())
+
+
+def begin_request(route: str) -> None:
+    request_context.timings = RequestTimings(route)
+
+
+def end_request(status_code: int, content_length: int | None, timings: RequestTimings | None = None) -> None:
+    # timings - запрос, не привязанный к потоку (поток событий в цикле asyncio), иначе - запрос текущего потока
+    if timings is None:
+        timings = current_request()
+
+        if timings is None:
+            return
+
+        request_context.timings = None
+
+    request_seconds.observe(time.perf_counter() - timings.started, timings.route)
+    requests_total.increment(timings.route, str(status_code))
+
+    for stage_name, seconds in timings.stages.items():
+        stage_seconds.observe(seconds, timings.route, stage_name)
+
+    # У потоковых ответов размер заранее неизвестен
+    if content_length is not None:
+        response_bytes.observe(content_length, timings.route)
+
+
+def current_request() -> RequestTimings | None:
+    return getattr(request_context, 'timings', None)
+
+
+def add_stage(stage_name: str, seconds: float) -> None:
+    timings = current_request()
+
+    if timings is not None:
+        timings.add(stage_name, seconds)
+
+
+@contextmanager
+def stage(stage_name: str):
+    started = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        add_stage(stage_name, time.perf_counter() - started)
+
+
+def terminal_seconds() -> float:
+    # Суммарное время вызовов терминала в текущем потоке (поток-владелец MetaTrader)
+    return getattr(terminal_context, 'seconds', 0.0)
+
+
+def observe_terminal_call(function_name: str, seconds: float) -> None:
+    terminal_context.seconds = terminal_seconds() + seconds
+    terminal_call_seconds.observe(seconds, function_name)
+
+
+def render() -> str:
+    return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+
+# region private
+def __number__(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def __labels__(label_names: tuple[str, ...], label_values: tuple) -> str:
+    if len(label_names) == 0:
+        return ''
+
+    escaped = (str(x).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for x in label_values)
+
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(label_names, escaped)) + '}'
+
+# endregion
+
+
+lock = threading.Lock()
+request_context = threading.local()
+terminal_context = threading.local()
+metrics: list[Counter | Histogram | Gauge] = []
+
+request_seconds = Histogram('mt5_bridge_request_seconds', 'Request handling time by route', ('route',))
+stage_seconds = Histogram('mt5_bridge_request_stage_seconds',
+                          'Request time by route and stage: parse, dealer_validation, terminal (queue wait and MT5 calls), conversion, serialization',
+                          ('route', 'stage'))
+response_bytes = Histogram('mt5_bridge_response_bytes', 'Response body size by route', ('route',), size_buckets)
+requests_total = Counter('mt5_bridge_requests_total', 'Handled requests by route and HTTP status', ('route', 'status'))
+request_errors_total = Counter('mt5_bridge_request_errors_total', 'Requests answered with isSuccess = false by route', ('route',))
+
+terminal_call_seconds = Histogram('mt5_terminal_call_seconds', 'MetaTrader5 function call time', ('function',))
+terminal_queue_wait_seconds = Histogram('mt5_terminal_queue_wait_seconds', 'Time a call waits in the MetaTrader worker queue')
+terminal_errors_total = Counter('mt5_terminal_errors_total', 'Failed terminal calls by MetaTrader error code', ('code',))
+terminal_reconnects_total = Counter('mt5_terminal_reconnects_total', 'Successful reconnects after the terminal was lost')
+terminal_reconnect_attempts_total = Counter('mt5_terminal_reconnect_attempts_total', 'Background reconnect attempts')
+terminal_rejected_total = Counter('mt5_terminal_rejected_total', 'Terminal calls rejected without queueing while reconnecting')
+
+terminal_connected = Gauge('mt5_terminal_connected', 'Terminal connection state: 1 - connected, 0 - reconnecting')
+terminal_queue_depth = Gauge('mt5_terminal_queue_depth', 'Calls waiting in the MetaTrader worker queue')
+subscribers = Gauge('mt5_bridge_subscribers', 'Open Server-Sent Events subscriptions')
@@ -0,0 +1,51 @@
+import json
+
+import numpy
+
+from metatrader.time_conversion import unix_times_to_iso_strings
+
+# Формат совпадает с jsonpickle.encode(Quote, unpicklable=False)
+quote_template = '{{"date": "{}", "open": {}, "high": {}, "low": {}, "close": {}}}'
+
+
+def encode_float_column(column: numpy.ndarray) -> list:
+    values = column.tolist()
+
+    # str(float) совпадает с json только для конечных значений
+    if numpy.isfinite(column).all():
+        return values
+
+    return list(map(json.dumps, values))
+
+
+def encode_rates(rates: numpy.ndarray) -> str:
+    if rates is None or len(rates) == 0:
+        return '[]'
+
+    quotes = map(quote_template.format,
+                 unix_times_to_iso_strings(rates['time']).tolist(),
+                 encode_float_column(rates['open']),
+                 encode_float_column(rates['high']),
+                 encode_float_column(rates['low']),
+                 encode_float_column(rates['close']))
+
+    return '[' + ', '.join(quotes) + ']'
+
+
+def encode_rates_by_symbol(rates_by_symbol: dict[str, numpy.ndarray]) -> str:
+    items = (f'{json.dumps(symbol)}: {encode_rates(rates)}' for symbol, rates in rates_by_symbol.items())
+
+    return '{' + ', '.join(items) + '}'
+
+
+def encode_rates_columns(rates: numpy.ndarray, columns: dict[str, numpy.ndarray]) -> str:
+    # Столбцами: даты и цены баров, объемы и значения индикаторов (null - индикатору не хватает истории)
+    def encode_column(column: numpy.ndarray) -> str:
+        return json.dumps(numpy.where(numpy.isfinite(column), column, None).tolist())
+
+    items = [f'"date": {json.dumps(unix_times_to_iso_strings(rates["time"]).tolist())}']
+    items += [f'"{field}": {encode_column(rates[field])}' for field in ('open', 'high', 'low', 'close')]
+    items.append(f'"tickVolume": {json.dumps(rates["tick_volume"].tolist())}')
+    items.append('"indicators": {' + ', '.join(f'{json.dumps(name)}: {encode_column(column)}' for name, column in columns.items()) + '}')
+
+    return '{' + ', '.join(items) + '}'
@@ -0,0 +1,256 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, UTC
+from logging import Logger
+from types import FrameType
+
+# Кадр стека: (функция, файл, строка объявления функции) - одинаковые функции склеиваются независимо от текущей строки
+Frame = tuple[str, str, int]
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ProfiledRequest:
+    def __init__(self, route: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.route = route
+        self.started = time.time()
+        self.samples: Counter[tuple[Frame, ...]] = Counter()
+
+
+class RequestProfiler:
+    """
+    Выборочное профилирование отдельных запросов по снимкам стеков.
+
+    Включается во время работы для выбранных маршрутов и доли запросов. Пока профилируется хотя бы один запрос,
+    поток-сэмплер раз в interval_seconds снимает стек его потока. Если запрос ждет поток-владелец MetaTrader,
+    к стеку добавляется стек потока-владельца. Профиль завершенного запроса пишется в каталог path,
+    там хранится не больше max_profiles последних профилей.
+    Выключенный профилировщик стоит одной проверки флага на запрос.
+    """
+
+    def __init__(self, path: str, interval_seconds: float, max_profiles: int, logger: Logger):
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self.max_profiles = max_profiles
+        self.logger = logger
+
+        self.enabled = False
+        self.routes: set[str] = set()
+        self.sample_rate = 1.0
+
+        self.lock = threading.Lock()
+        self.active: dict[int, ProfiledRequest] = {}
+        self.thread: threading.Thread | None = None
+        self.frames_by_code: dict[object, Frame] = {}
+
+    def configure(self, enabled: bool, routes: list[str], sample_rate: float) -> None:
+        if not 0 < sample_rate <= 1:
+            raise Exception(f'Sample rate must be in (0, 1], got {sample_rate}')
+
+        with self.lock:
+            self.routes = set(routes)
+            self.sample_rate = sample_rate
+            self.enabled = enabled
+
+            if enabled and self.thread is None:
+                self.thread = threading.Thread(target=self.__run__, name='request-profiler', daemon=True)
+                self.thread.start()
+
+        self.logger.info("Профилирование запросов {state}: маршруты {routes}, доля {sample_rate}",
+                         state='включено' if enabled else 'выключено', routes=sorted(self.routes) or 'все', sample_rate=sample_rate)
+
+    def state(self) -> dict:
+        return {'enabled': self.enabled, 'routes': sorted(self.routes), 'sampleRate': self.sample_rate,
+                'intervalSeconds': self.interval_seconds, 'activeRequests': len(self.active)}
+
+    def begin(self, route: str) -> None:
+        if (len(self.routes) > 0 and route not in self.routes) or random.random() >= self.sample_rate:
+            return
+
+        with self.lock:
+            self.active[threading.get_ident()] = ProfiledRequest(route)
+
+    def end(self) -> None:
+        with self.lock:
+            profiled_request = self.active.pop(threading.get_ident(), None)
+
+        if profiled_request is not None:
+            self.__store__(profiled_request)
+
+    def profiles(self, route: str | None = None) -> list[dict]:
+        # Сохраненные профили без стеков, от новых к старым
+        result = []
+
+        for file_name in reversed(self.__file_names__()):
+            profile = self.__load__(file_name)
+
+            if profile is not None and (route is None or profile['route'] == route):
+                result.append({key: value for key, value in profile.items() if key not in ('frames', 'samples')})
+
+        return result
+
+    def dump_collapsed(self, profile_id: str | None = None, route: str | None = None) -> str:
+        # Формат collapsed stacks (flamegraph.pl, speedscope, inferno): "кадр;кадр;кадр число_снимков"
+        samples: Counter[str] = Counter()
+
+        for profile in self.__select__(profile_id, route):
+            labels = [f'{name} ({file}:{line})' for name, file, line in profile['frames']]
+
+            for stack, count in profile['samples']:
+                samples[';'.join(labels[i] for i in stack)] += count
+
+        return ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
+
+    def dump_speedscope(self, profile_id: str | None = None, route: str | None = None) -> str:
+        # Файл speedscope (https://www.speedscope.app): по профилю на запрос, кадры общие
+        frames: list[dict] = []
+        frame_indexes: dict[tuple, int] = {}
+        profiles = []
+
+        for profile in self.__select__(profile_id, route):
+            indexes = []
+
+            for name, file, line in profile['frames']:
+                key = (name, file, line)
+
+                if key not in frame_indexes:
+                    frame_indexes[key] = len(frames)
+                    frames.append({'name': name, 'file': file, 'line': line})
+
+                indexes.append(frame_indexes[key])
+
+            weights = [count * profile['intervalSeconds'] for _, count in profile['samples']]
+            profiles.append({'type': 'sampled', 'name': f'{profile["route"]} {profile["started"]} ({profile["id"]})', 'unit': 'seconds',
+                             'startValue': 0, 'endValue': sum(weights),
+                             'samples': [[indexes[i] for i in stack] for stack, _ in profile['samples']], 'weights': weights})
+
+        return json.dumps({'$schema': 'https://www.speedscope.app/file-format-schema.json', 'exporter': 'mt5-bridge request profiler',
+                           'name': profile_id or route or 'requests', 'activeProfileIndex': 0,
+                           'shared': {'frames': frames}, 'profiles': profiles})
+
+    # region private
+    def __run__(self) -> None:
+        while True:
+            time.sleep(self.interval_seconds)
+
+            # Снимок делается под блокировкой, чтобы завершившийся запрос не менялся во время записи на диск
+            with self.lock:
+                if not self.enabled and len(self.active) == 0:
+                    self.thread = None
+                    return
+
+                if len(self.active) > 0:
+                    self.__sample__()
+
+    def __sample__(self) -> None:
+        current_frames = sys._current_frames()
+        worker_stack = None
+
+        for thread in threading.enumerate():
+            if thread.name == 'mt5-worker' and thread.ident in current_frames:
+                worker_stack = self.__stack__(current_frames[thread.ident])
+
+        for thread_id, profiled_request in self.active.items():
+            frame = current_frames.get(thread_id)
+
+            if frame is None:
+                continue
+
+            stack = self.__stack__(frame)
+
+            # Запрос ждет результат в TerminalWorker.call - дальше идет стек потока-владельца
+            if worker_stack is not None:
+                for i, (name, file, _) in enumerate(stack):
+                    if name == 'call' and file.endswith('terminal_worker.py'):
+                        stack = stack[:i + 1] + (('[mt5-worker]', '', 0),) + worker_stack
+                        break
+
+            profiled_request.samples[stack] += 1
+
+    def __stack__(self, frame: FrameType | None) -> tuple[Frame, ...]:
+        stack = []
+
+        while frame is not None:
+            code = frame.f_code
+            label = self.frames_by_code.get(code)
+
+            if label is None:
+                file = os.path.relpath(code.co_filename, project_root) if code.co_filename.startswith(project_root) else code.co_filename
+                label = self.frames_by_code[code] = (code.co_name, file.replace('\\', '/'), code.co_firstlineno)
+
+            stack.append(label)
+            frame = frame.f_back
+
+        return tuple(reversed(stack))
+
+    def __store__(self, profiled_request: ProfiledRequest) -> None:
+        frames: list[Frame] = []
+        frame_indexes: dict[Frame, int] = {}
+        samples = []
+
+        for stack, count in profiled_request.samples.most_common():
+            for frame in stack:
+                if frame not in frame_indexes:
+                    frame_indexes[frame] = len(frames)
+                    frames.append(frame)
+
+            samples.append([[frame_indexes[x] for x in stack], count])
+
+        profile = {'id': profiled_request.id, 'route': profiled_request.route,
+                   'started': datetime.fromtimestamp(profiled_request.started, UTC).isoformat(),
+                   'durationSeconds': time.time() - profiled_request.started, 'intervalSeconds': self.interval_seconds,
+                   'samplesCount': sum(profiled_request.samples.values()), 'frames': frames, 'samples': samples}
+
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            file_name = f'{int(profiled_request.started * 1000):015d}_{profiled_request.id}.json'
+
+            with open(os.path.join(self.path, file_name), 'w', encoding='utf-8') as file:
+                json.dump(profile, file)
+
+            # Хранятся только последние max_profiles профилей
+            for old_file_name in self.__file_names__()[:-self.max_profiles]:
+                os.remove(os.path.join(self.path, old_file_name))
+        except OSError as e:
+            self.logger.error("Ошибка записи профиля запроса {route} - {exception}", route=profiled_request.route, exception=e)
+
+    def __select__(self, profile_id: str | None, route: str | None) -> list[dict]:
+        profiles = []
+
+        for file_name in self.__file_names__():
+            if profile_id is not None and not file_name.endswith(f'_{profile_id}.json'):
+                continue
+
+            profile = self.__load__(file_name)
+
+            if profile is not None and (route is None or profile['route'] == route):
+                profiles.append(profile)
+
+        if profile_id is not None and len(profiles) == 0:
+            raise Exception(f'Profile \'{profile_id}\' not found')
+
+        return profiles
+
+    def __file_names__(self) -> list[str]:
+        # Имена файлов начинаются со времени начала запроса - сортировка по имени идет от старых к новым
+        if not os.path.isdir(self.path):
+            return []
+
+        return sorted(x for x in os.listdir(self.path) if x.endswith('.json'))
+
+    def __load__(self, file_name: str) -> dict | None:
+        # Файл мог быть удален ротацией между чтением каталога и открытием
+        try:
+            with open(os.path.join(self.path, file_name), encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    # endregion
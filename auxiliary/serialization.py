@@ -0,0 +1,97 @@
+import dataclasses
+import json
+from collections.abc import Callable
+from datetime import datetime
+from operator import attrgetter
+
+import numpy
+
+from auxiliary import quotes_encoding, web_helpers
+from metatrader.time_conversion import unix_times_to_iso_strings
+from metatrader.models.record_table import RecordTable
+
+# Сериализатор ответов в JSON. Вывод совпадает с jsonpickle.encode(value, unpicklable=False):
+# датакласс - объект с полями в порядке объявления, кортежи (в т.ч. именованные) - массивы,
+# datetime - строка isoformat(), NaN/Infinity - как в json.dumps.
+# Стандартные типы пишет C-кодировщик json, для моделей - преобразователи, собранные один раз на тип.
+# Таблица записей (RecordTable) кодируется по столбцам, без объектов моделей - так же, как список ее строк
+
+
+def encode(value) -> str:
+    if isinstance(value, RecordTable):
+        return encode_record_table(value)
+
+    return encoder.encode(value)
+
+
+def encode_record_table(table: RecordTable) -> str:
+    if len(table) == 0:
+        return '[]'
+
+    columns = []
+
+    for name in table.fields:
+        column = table.columns[name]
+
+        if name in table.time_fields:
+            columns.append(unix_times_to_iso_strings(column, quoted=True).tolist())
+        elif table.dtypes[name] == 'float64':
+            columns.append(quotes_encoding.encode_float_column(column))
+        elif table.dtypes[name] == 'str':
+            columns.append(list(map(json.dumps, column.tolist())))
+        else:
+            columns.append(column.tolist())
+
+    template = '{{' + ', '.join(f'{json.dumps(name)}: {{}}' for name in table.fields) + '}}'
+
+    return '[' + ', '.join(map(template.format, *columns)) + ']'
+
+
+def encode_camel_case(value: tuple | list[tuple]) -> str:
+    # Именованный кортеж MT5 (или их список) -> объект(ы) с ключами lowerCamelCase за один проход
+    if isinstance(value, list):
+        return encoder.encode(list(map(web_helpers.named_tuple_to_camel_case_dict, value)))
+
+    return encoder.encode(web_helpers.named_tuple_to_camel_case_dict(value))
+
+
+def __compile_dataclass_converter__(cls: type) -> Callable:
+    names = tuple(field.name for field in dataclasses.fields(cls))
+
+    if len(names) == 0:
+        return lambda value: {}
+
+    if len(names) == 1:
+        return lambda value: {names[0]: getattr(value, names[0])}
+
+    get_values = attrgetter(*names)
+    return lambda value: dict(zip(names, get_values(value)))
+
+
+def __compile_converter__(cls: type) -> Callable:
+    if dataclasses.is_dataclass(cls):
+        converter = __compile_dataclass_converter__(cls)
+    elif issubclass(cls, datetime):
+        converter = datetime.isoformat
+    elif issubclass(cls, RecordTable):
+        converter = list
+    elif issubclass(cls, numpy.generic):
+        converter = numpy.generic.item
+    else:
+        raise TypeError(f'Type {cls.__name__} is not serializable')
+
+    converters[cls] = converter
+    return converter
+
+
+def __default__(value):
+    converter = converters.get(type(value))
+
+    if converter is None:
+        converter = __compile_converter__(type(value))
+
+    return converter(value)
+
+
+converters: dict[type, Callable] = {}
+encoder = json.JSONEncoder(default=__default__)
@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных запросов.
+
+    Пока выполняется вызов с ключом (метод, аргументы), остальные запросы с тем же ключом
+    ждут и получают его результат (или его исключение). При ttl > 0 результат
+    еще ttl секунд отдается из памяти без обращения к терминалу.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight: dict[Hashable, Future] = {}
+        self.completed: dict[Hashable, tuple[float, object]] = {}
+
+        self.executed = Counter()
+        self.coalesced = Counter()
+        self.cache_hits = Counter()
+
+    def do(self, key: tuple, func: Callable, ttl: float = 0):
+        method = key[0]
+
+        with self.lock:
+            completed = self.completed.get(key)
+            if completed is not None and completed[0] > time.monotonic():
+                self.cache_hits[method] += 1
+                return completed[1]
+
+            future = self.in_flight.get(key)
+            is_leader = future is None
+
+            if is_leader:
+                future = Future()
+                self.in_flight[key] = future
+                self.executed[method] += 1
+            else:
+                self.coalesced[method] += 1
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[key]
+
+            future.set_exception(e)
+            raise
+
+        # Результат сохраняется в том же захвате блокировки, в котором снимается вызов: иначе новый запрос между ними
+        # не нашел бы ни вызова, ни результата и снова обратился бы к терминалу
+        with self.lock:
+            if ttl > 0:
+                now = time.monotonic()
+                self.completed = {k: v for k, v in self.completed.items() if v[0] > now}
+                self.completed[key] = (now + ttl, result)
+
+            del self.in_flight[key]
+
+        future.set_result(result)
+
+        return result
+
+    def stats(self) -> dict:
+        with self.lock:
+            methods = set(self.executed) | set(self.coalesced) | set(self.cache_hits)
+
+            return {method: {'executed': self.executed[method],
+                             'coalesced': self.coalesced[method],
+                             'cacheHits': self.cache_hits[method]} for method in sorted(methods)}
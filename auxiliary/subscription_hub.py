@@ -0,0 +1,260 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from logging import Logger
+
+import numpy
+
+from auxiliary import quotes_encoding, serialization
+from metatrader.enums.timeframe_enum import Metatrader5TimeframeEnum
+from metatrader.terminal_integration import MetaTrader5Integration
+
+
+class Subscription:
+    def __init__(self, quote_keys: set[tuple[str, str]], positions: bool, queue_size: int):
+        self.quote_keys = quote_keys
+        self.positions = positions
+        self.events: queue.Queue[str | None] = queue.Queue(maxsize=queue_size)
+        # Вызывается после каждого события в очереди - будит асинхронного читателя (stream_async)
+        self.wakeup: Callable[[], None] | None = None
+
+
+class SubscriptionHub:
+    """
+    Рассылка изменений котировок и открытых позиций подписчикам (Server-Sent Events).
+
+    Раз в interval_seconds терминал опрашивается один раз на объединение всех подписок:
+    по каждой паре символ/таймфрейм - последние bars_count баров, позиции - если на них есть подписчики.
+    Подписчику уходят только новые или изменившиеся бары и позиции, поэтому нагрузка на терминал
+    зависит от числа различных подписок, а не от числа клиентов.
+    """
+
+    def __init__(self, mt5: MetaTrader5Integration, interval_seconds: float, bars_count: int, max_subscribers: int,
+                 queue_size: int, keepalive_seconds: float, logger: Logger):
+        self.mt5 = mt5
+        self.interval_seconds = interval_seconds
+        self.bars_count = bars_count
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.keepalive_seconds = keepalive_seconds
+        self.logger = logger
+
+        self.lock = threading.Lock()
+        self.has_subscribers = threading.Event()
+        self.subscriptions: set[Subscription] = set()
+
+        # Последнее разосланное состояние: (символ, таймфрейм) -> бары, тикет -> позиция
+        self.last_rates: dict[tuple[str, str], numpy.ndarray] = {}
+        self.last_positions: dict[int, object] | None = None
+
+        self.thread: threading.Thread | None = None
+
+    def subscribe(self, symbols: list[str], timeframes: list[str], positions: bool) -> Subscription:
+        for timeframe in timeframes:
+            Metatrader5TimeframeEnum[timeframe]
+
+        # Неизвестный символ - ошибка запроса, а не подписка, по которой никогда не придет событий
+        for symbol in symbols:
+            self.mt5.get_symbol_static_info(symbol)
+
+        subscription = Subscription({(symbol, timeframe) for symbol in symbols for timeframe in timeframes}, positions, self.queue_size)
+
+        if len(subscription.quote_keys) == 0 and not subscription.positions:
+            raise Exception('Не указаны ни символы с таймфреймами, ни подписка на позиции')
+
+        with self.lock:
+            if len(self.subscriptions) >= self.max_subscribers:
+                raise Exception(f'Превышено число подписчиков ({self.max_subscribers})')
+
+            self.subscriptions.add(subscription)
+            self.has_subscribers.set()
+
+            # Новый подписчик сразу получает последнее известное состояние
+            for key in subscription.quote_keys:
+                if key in self.last_rates:
+                    self.__publish__(subscription, self.__quotes_event__(key, self.last_rates[key]))
+
+            if subscription.positions and self.last_positions is not None:
+                self.__publish__(subscription, self.__positions_event__(list(self.last_positions.values()), []))
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.__run__, name='subscription-poller', daemon=True)
+                self.thread.start()
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+            if len(self.subscriptions) == 0:
+                self.has_subscribers.clear()
+
+    def stream(self, subscription: Subscription) -> Iterator[str]:
+        # Комментарий keepalive позволяет заметить отключившегося клиента, когда изменений нет
+        try:
+            while True:
+                try:
+                    event = subscription.events.get(timeout=self.keepalive_seconds)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+
+                if event is None:
+                    return
+
+                yield event
+        finally:
+            self.unsubscribe(subscription)
+
+    async def stream_async(self, subscription: Subscription) -> AsyncIterator[str]:
+        # То же, что stream, для asyncio-сервера: ожидание событий не занимает поток, поток опроса будит цикл событий
+        loop = asyncio.get_running_loop()
+        arrived = asyncio.Event()
+        subscription.wakeup = lambda: loop.call_soon_threadsafe(arrived.set)
+
+        try:
+            while True:
+                try:
+                    event = subscription.events.get_nowait()
+                except queue.Empty:
+                    arrived.clear()
+
+                    # Событие могло прийти между проверкой очереди и сбросом флага
+                    if subscription.events.empty():
+                        try:
+                            await asyncio.wait_for(arrived.wait(), self.keepalive_seconds)
+                        except TimeoutError:
+                            yield ': keepalive\n\n'
+
+                    continue
+
+                if event is None:
+                    return
+
+                yield event
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'subscribers': len(self.subscriptions),
+                    'quoteKeys': len(set().union(*(x.quote_keys for x in self.subscriptions))),
+                    'positionSubscribers': sum(1 for x in self.subscriptions if x.positions)}
+
+    # region private
+    def __run__(self) -> None:
+        while True:
+            self.has_subscribers.wait()
+            started = time.monotonic()
+
+            try:
+                self.__poll__()
+            except Exception as e:
+                self.logger.error("Ошибка при опросе терминала для подписчиков - {exception}", exception=e)
+
+            time.sleep(max(0.0, self.interval_seconds - (time.monotonic() - started)))
+
+    def __poll__(self) -> None:
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+
+        symbols_by_timeframe: dict[str, set[str]] = {}
+
+        for subscription in subscriptions:
+            for symbol, timeframe in subscription.quote_keys:
+                symbols_by_timeframe.setdefault(timeframe, set()).add(symbol)
+
+        for timeframe, symbols in symbols_by_timeframe.items():
+            rates_by_symbol = self.mt5.get_last_quotes_rates(sorted(symbols), timeframe, self.bars_count)
+
+            for symbol, rates in rates_by_symbol.items():
+                self.__publish_rates__((symbol, timeframe), rates)
+
+        if any(x.positions for x in subscriptions):
+            self.__publish_positions__(self.mt5.get_opened_positions())
+
+        # Состояние без подписчиков устаревает - новый подписчик получит его заново из терминала
+        with self.lock:
+            quote_keys = set().union(*(x.quote_keys for x in self.subscriptions))
+            self.last_rates = {key: rates for key, rates in self.last_rates.items() if key in quote_keys}
+
+            if not any(x.positions for x in self.subscriptions):
+                self.last_positions = None
+
+    def __publish_rates__(self, key: tuple[str, str], rates: numpy.ndarray) -> None:
+        last_rates = self.last_rates.get(key)
+        last_rows = set() if last_rates is None else {x.tobytes() for x in last_rates}
+        changed_rates = rates[[x.tobytes() not in last_rows for x in rates]] if len(rates) > 0 else rates
+
+        if len(changed_rates) == 0:
+            return
+
+        event = self.__quotes_event__(key, changed_rates)
+
+        with self.lock:
+            self.last_rates[key] = rates
+
+            for subscription in list(self.subscriptions):
+                if key in subscription.quote_keys:
+                    self.__publish__(subscription, event)
+
+    def __publish_positions__(self, positions: list) -> None:
+        current_positions = {x.ticket: x for x in positions}
+        last_positions = self.last_positions if self.last_positions is not None else {}
+
+        changed = [x for ticket, x in current_positions.items() if last_positions.get(ticket) != x]
+        closed = [ticket for ticket in last_positions if ticket not in current_positions]
+
+        if self.last_positions is not None and len(changed) == 0 and len(closed) == 0:
+            return
+
+        event = self.__positions_event__(changed, closed)
+
+        with self.lock:
+            self.last_positions = current_positions
+
+            for subscription in list(self.subscriptions):
+                if subscription.positions:
+                    self.__publish__(subscription, event)
+
+    def __publish__(self, subscription: Subscription, event: str) -> None:
+        try:
+            subscription.events.put_nowait(event)
+            self.__wake__(subscription)
+        except queue.Full:
+            # Клиент не успевает читать - подписка закрывается, клиент переподключится и получит снимок заново
+            self.logger.warning("Подписчик не успевает читать события, подписка закрыта")
+            self.subscriptions.discard(subscription)
+
+            if len(self.subscriptions) == 0:
+                self.has_subscribers.clear()
+
+            while not subscription.events.empty():
+                subscription.events.get_nowait()
+
+            subscription.events.put_nowait(None)
+            self.__wake__(subscription)
+
+    @staticmethod
+    def __wake__(subscription: Subscription) -> None:
+        if subscription.wakeup is not None:
+            subscription.wakeup()
+
+    @staticmethod
+    def __quotes_event__(key: tuple[str, str], rates: numpy.ndarray) -> str:
+        symbol, timeframe = key
+        data = f'{{"symbol": {json.dumps(symbol)}, "timeframe": {json.dumps(timeframe)}, "quotes": {quotes_encoding.encode_rates(rates)}}}'
+
+        return f'event: quotes\ndata: {data}\n\n'
+
+    @staticmethod
+    def __positions_event__(changed: list, closed: list[int]) -> str:
+        data = f'{{"changed": {serialization.encode(changed)}, "closed": {serialization.encode(closed)}}}'
+
+        return f'event: positions\ndata: {data}\n\n'
+
+    # endregion
@@ -0,0 +1,490 @@
+from collections.abc import AsyncIterator, Callable, Iterator
+
+import numpy
+
+from config import app_config
+from auxiliary import web_helpers, quotes_encoding, serialization, binary_encoding
+from auxiliary.request_profiler import RequestProfiler
+from auxiliary.single_flight import SingleFlight
+from auxiliary.subscription_hub import Subscription, SubscriptionHub
+from metatrader import bar_aggregation, trade_calculator
+from metatrader.time_conversion import datetime_str_to_unix_time
+from metatrader.models.metatrader_order import MetaTraderOrder
+from metatrader.models.order_instruction import OrderInstruction, OrderInstructionResult, instruction_types
+from metatrader.terminal_integration import MetaTrader5Integration
+
+
+class TerminalOperations:
+    """
+    Операции сервиса над MetaTrader5Integration: разбор тела запроса и сериализация результата.
+    Не зависят от веб-фреймворка, поэтому используются и отдельными маршрутами, и пакетным /batch.
+    """
+
+    def __init__(self, mt5: MetaTrader5Integration):
+        self.mt5 = mt5
+        self.single_flight = SingleFlight()
+        self.subscription_hub = SubscriptionHub(mt5, app_config.SUBSCRIPTION_POLL_INTERVAL_SECONDS, app_config.SUBSCRIPTION_BARS_COUNT,
+                                                app_config.SUBSCRIPTION_MAX_SUBSCRIBERS, app_config.SUBSCRIPTION_QUEUE_SIZE,
+                                                app_config.SUBSCRIPTION_KEEPALIVE_SECONDS, mt5.logger)
+        self.request_profiler = RequestProfiler(app_config.PROFILER_PATH, app_config.PROFILER_INTERVAL_SECONDS, app_config.PROFILER_MAX_PROFILES, mt5.logger)
+
+        # Закодированные статические поля символов и версия справочника, из которой они получены
+        self.static_symbols_encoded: tuple[int, str] = (-1, '')
+
+        # Операции только на чтение, доступные в /batch
+        self.batch_operations: dict[str, Callable[[dict], str]] = {
+            'version': self.get_version,
+            'account-info': self.get_account_info,
+            'opened-positions': self.get_opened_positions,
+            'get-symbols': self.get_symbols,
+            'get-symbol-info': self.get_symbol_info,
+            'get-symbols-static': self.get_symbols_static,
+            'get-symbol-static-info': self.get_symbol_static_info,
+            'get-symbols-volatile': self.get_symbols_volatile,
+            'get-last-quotes': self.get_last_quotes,
+            'get-quotes': self.get_quotes,
+            'get-range-quotes': self.get_range_quotes,
+            'get-aggregated-quotes': self.get_aggregated_quotes,
+            'order-calc-profit': self.order_calc_profit,
+            'order-calc-margin': self.order_calc_margin,
+            'order-calc-profit-grid': self.order_calc_profit_grid,
+            'order-calc-margin-grid': self.order_calc_margin_grid,
+            'order-check': self.order_check,
+            'get-history-deals': self.history_deals_get,
+            'get-history-orders': self.history_orders_get,
+            'get-history-deals-since': self.history_deals_since,
+            'get-history-orders-since': self.history_orders_since,
+        }
+
+    # region Terminal Info
+    def get_version(self, data: dict) -> str:
+        return serialization.encode(self.mt5.get_version())
+
+    # endregion
+
+    # region Account info
+    def get_account_info(self, data: dict) -> str:
+        def get_account_info_encoded():
+            account_info = self.mt5.get_account_info()
+            return serialization.encode_camel_case(account_info)
+
+        return self.__coalesce__(('account-info/get',), get_account_info_encoded)
+
+    # endregion
+
+    # region Opened Positions
+    def get_opened_positions(self, data: dict) -> str:
+        def get_opened_positions_encoded():
+            opened_positions = self.mt5.get_opened_positions()
+            return serialization.encode(opened_positions)
+
+        return self.__coalesce__(('opened-positions/get',), get_opened_positions_encoded)
+
+    # endregion
+
+    # region Symbol Info
+    def get_symbols(self, data: dict) -> str:
+        symbols = self.mt5.get_symbols()
+        return serialization.encode_camel_case(symbols)
+
+    def get_symbol_info(self, data: dict) -> str:
+        symbol = data['symbol']
+
+        symbol_info = self.mt5.get_symbol_info(symbol)
+        return serialization.encode_camel_case(symbol_info)
+
+    def get_symbols_static(self, data: dict) -> str:
+        version, symbols = self.mt5.get_symbols_static()
+        encoded_version, encoded = self.static_symbols_encoded
+
+        if encoded_version != version:
+            encoded = serialization.encode_camel_case(symbols)
+            self.static_symbols_encoded = (version, encoded)
+
+        return encoded
+
+    def get_symbol_static_info(self, data: dict) -> str:
+        symbol = data['symbol']
+
+        static_symbol_info = self.mt5.get_symbol_static_info(symbol)
+        return serialization.encode_camel_case(static_symbol_info)
+
+    def get_symbols_volatile(self, data: dict) -> str:
+        symbols = data.get('symbols')
+
+        volatile_symbols = self.mt5.get_symbols_volatile(symbols)
+        return serialization.encode_camel_case(volatile_symbols)
+
+    # endregion
+
+    # region Position Management
+    def update_stop_loss(self, data: dict) -> str:
+        identifier = int(data['identifier'])
+        sl_value = float(data['stopLossValue'])
+
+        result = self.mt5.update_stop_loss(identifier, sl_value)
+        return serialization.encode_camel_case(result)
+
+    def update_stop_losses(self, data: dict) -> str:
+        # Ответ - по элементу на позицию в порядке запроса, как у пакетного запроса
+        stop_losses = [(int(x['identifier']), float(x['stopLossValue'])) for x in data['stopLosses']]
+
+        def encode_result(result: tuple | Exception) -> str:
+            if isinstance(result, Exception):
+                raise result
+
+            return serialization.encode_camel_case(result)
+
+        results = self.mt5.update_stop_losses(stop_losses)
+        return '[' + ', '.join(web_helpers.execute_batch_item(lambda result=result: encode_result(result)) for result in results) + ']'
+
+    def close_position(self, data: dict) -> str:
+        symbol = data['symbol']
+
+        result = self.mt5.close_position(symbol)
+
+        if result is True:
+            return '{ }'
+
+        raise Exception('Unknown error')
+
+    def open_position(self, data: dict) -> str:
+        symbol = data['symbol']
+        action_str = data['action']
+        volume = float(data['volume'])
+        stop_loss = float(data['stopLoss'])
+
+        result = self.mt5.open_position(action_str, symbol, volume, stop_loss)
+        return serialization.encode_camel_case(result)
+
+    def submit_orders(self, data: dict) -> str:
+        instructions = list(map(self.__parse_order_instruction__, data['orders']))
+        dry_run = bool(data.get('dryRun', False))
+
+        results = self.mt5.submit_orders(instructions, dry_run)
+        return '[' + ', '.join(map(self.__encode_order_result__, results)) + ']'
+
+    @staticmethod
+    def __parse_order_instruction__(data: dict) -> OrderInstruction:
+        # Поля приказов - как в open-position, close-position и update-stop-loss
+        instruction_type = data['type']
+
+        if instruction_type == 'open':
+            return OrderInstruction(instruction_type, symbol=data['symbol'], action=data['action'], volume=float(data['volume']),
+                                    stop_loss=float(data['stopLoss']))
+
+        if instruction_type == 'close':
+            return OrderInstruction(instruction_type, symbol=data['symbol'])
+
+        if instruction_type == 'modify':
+            return OrderInstruction(instruction_type, identifier=int(data['identifier']), stop_loss=float(data['stopLossValue']))
+
+        raise Exception(f'Unknown order instruction type \'{instruction_type}\', expected one of {instruction_types}')
+
+    @staticmethod
+    def __encode_order_result__(item: OrderInstructionResult) -> str:
+        response = {'type': item.instruction.type,
+                    'isSuccess': item.error is None,
+                    'checks': list(map(web_helpers.named_tuple_to_camel_case_dict, item.checks)),
+                    'result': web_helpers.named_tuple_to_camel_case_dict(item.result) if isinstance(item.result, tuple) else item.result,
+                    'checkSeconds': item.check_seconds,
+                    'sendSeconds': item.send_seconds}
+
+        if item.error is not None:
+            response['errorMessage'] = f'{item.error}'
+
+        return serialization.encode(response)
+
+    # endregion
+
+    # region Quotes
+    def get_last_quotes(self, data: dict, media_type: str = binary_encoding.json_media_type) -> str | bytes:
+        symbols = data['symbols']
+        timeframe = data['timeframe']
+        count = int(data['count'])
+
+        def get_last_quotes_encoded():
+            last_rates = self.mt5.get_last_quotes_rates(symbols, timeframe, count)
+
+            if media_type != binary_encoding.json_media_type:
+                return binary_encoding.encode(binary_encoding.rates_by_symbol_table(last_rates), media_type)
+
+            return quotes_encoding.encode_rates_by_symbol(last_rates)
+
+        return self.__coalesce__(('quotes/get-last-quotes', tuple(symbols), timeframe, count, media_type), get_last_quotes_encoded)
+
+    def get_quotes(self, data: dict, media_type: str = binary_encoding.json_media_type) -> str | bytes:
+        symbol = data['symbol']
+        timeframe = data['timeframe']
+        count = int(data['count'])
+
+        rates = self.mt5.get_quotes_rates(symbol, timeframe, count)
+        return self.__encode_rates__(rates, media_type)
+
+    def get_range_quotes(self, data: dict, media_type: str = binary_encoding.json_media_type) -> str | bytes:
+        symbol = data['symbol']
+        timeframe = data['timeframe']
+        date_from = datetime_str_to_unix_time(data['dateFrom'])
+        date_to = datetime_str_to_unix_time(data['dateTo'])
+
+        rates = self.mt5.get_range_quotes_rates(symbol, timeframe, date_from, date_to)
+        return self.__encode_rates__(rates, media_type)
+
+    def get_aggregated_quotes(self, data: dict, media_type: str = binary_encoding.json_media_type) -> str | bytes:
+        symbol = data['symbol']
+        timeframe = data.get('timeframe', 'TIMEFRAME_M1')
+        interval_seconds = int(data['intervalSeconds'])
+        date_from = datetime_str_to_unix_time(data['dateFrom'])
+        date_to = datetime_str_to_unix_time(data['dateTo']) if data.get('dateTo') is not None else 2147483647
+        indicators = [self.__parse_indicator__(x) for x in data.get('indicators', [])]
+
+        rates, columns = self.mt5.get_aggregated_rates(symbol, timeframe, interval_seconds, date_from, date_to, indicators)
+
+        if media_type != binary_encoding.json_media_type:
+            return binary_encoding.encode(binary_encoding.aggregated_table(rates, columns), media_type)
+
+        return quotes_encoding.encode_rates_columns(rates, columns)
+
+    def stream_quotes(self, data: dict) -> Iterator[str]:
+        symbol = data['symbol']
+        timeframe = data['timeframe']
+        count = int(data['count'])
+
+        pages = self.mt5.iter_quotes_rates(symbol, timeframe, count)
+        return web_helpers.stream_json_array(quotes_encoding.encode_rates(rates)[1:-1] for rates in pages)
+
+    def stream_range_quotes(self, data: dict) -> Iterator[str]:
+        symbol = data['symbol']
+        timeframe = data['timeframe']
+        date_from = datetime_str_to_unix_time(data['dateFrom'])
+        date_to = datetime_str_to_unix_time(data['dateTo'])
+
+        pages = self.mt5.iter_range_quotes_rates(symbol, timeframe, date_from, date_to)
+        return web_helpers.stream_json_array(quotes_encoding.encode_rates(rates)[1:-1] for rates in pages)
+
+    # endregion
+
+    # region order_check
+    def order_calc_profit(self, data: dict) -> str:
+        symbol = data['symbol']
+        action_str = data['action']
+        volume = float(data['volume'])
+        price_open = float(data['priceOpen'])
+        price_close = float(data['priceClose'])
+
+        result = self.mt5.order_calc_profit(action_str, symbol, volume, price_open, price_close)
+        return serialization.encode(result)
+
+    def order_calc_margin(self, data: dict) -> str:
+        symbol = data['symbol']
+        action_str = data['action']
+        volume = float(data['volume'])
+        price_open = float(data['priceOpen'])
+
+        result = self.mt5.order_calc_margin(action_str, symbol, volume, price_open)
+        return serialization.encode(result)
+
+    def order_calc_profit_grid(self, data: dict) -> str:
+        # Сетка: строка - объем из volumes, столбец - цена закрытия из pricesClose
+        symbol = data['symbol']
+        action_str = data['action']
+        volumes = numpy.array(data['volumes'], dtype='float64')
+        price_open = float(data['priceOpen'])
+        prices_close = numpy.array(data['pricesClose'], dtype='float64')
+
+        values = self.mt5.order_calc_profit_grid(action_str, symbol, volumes, price_open, prices_close)
+        response = {'volumes': volumes.tolist(), 'priceOpen': price_open, 'pricesClose': prices_close.tolist(), 'values': values.tolist()}
+
+        if data.get('verify', False):
+            rows, columns = trade_calculator.sample_indexes(values.shape, app_config.ORDER_CALC_VERIFY_SAMPLES)
+            arguments = [(volumes[row].item(), price_open, prices_close[column].item()) for row, column in zip(rows, columns)]
+            response['verification'] = self.mt5.verify_order_calc('order_calc_profit', action_str, symbol, arguments, values[rows, columns].tolist())
+
+        return serialization.encode(response)
+
+    def order_calc_margin_grid(self, data: dict) -> str:
+        # Сетка: строка - объем из volumes, столбец - цена из prices
+        symbol = data['symbol']
+        action_str = data['action']
+        volumes = numpy.array(data['volumes'], dtype='float64')
+        prices = numpy.array(data['prices'], dtype='float64')
+
+        values = self.mt5.order_calc_margin_grid(action_str, symbol, volumes, prices)
+        response = {'volumes': volumes.tolist(), 'prices': prices.tolist(), 'values': values.tolist()}
+
+        if data.get('verify', False):
+            rows, columns = trade_calculator.sample_indexes(values.shape, app_config.ORDER_CALC_VERIFY_SAMPLES)
+            arguments = [(volumes[row].item(), prices[column].item()) for row, column in zip(rows, columns)]
+            response['verification'] = self.mt5.verify_order_calc('order_calc_margin', action_str, symbol, arguments, values[rows, columns].tolist())
+
+        return serialization.encode(response)
+
+    def order_check(self, data: dict) -> str:
+        symbol = data['symbol']
+        action_str = data['action']
+        volume = float(data['volume'])
+        stop_loss = float(data['stopLoss'])
+
+        result = self.mt5.order_check(action_str, symbol, volume, stop_loss)
+        return serialization.encode_camel_case(result)
+
+    # endregion
+
+    # region history
+    def history_deals_get(self, data: dict, media_type: str = binary_encoding.json_media_type) -> str | bytes:
+        date_from = datetime_str_to_unix_time(data['dateFrom'])
+
+        result = self.mt5.history_deals_get(date_from)
+
+        if media_type != binary_encoding.json_media_type:
+            return binary_encoding.encode(binary_encoding.records_table(result), media_type)
+
+        return serialization.encode(result)
+
+    def history_orders_get(self, data: dict, media_type: str = binary_encoding.json_media_type) -> str | bytes:
+        date_from = datetime_str_to_unix_time(data['dateFrom'])
+
+        result = self.mt5.history_orders_get(date_from)
+
+        if media_type != binary_encoding.json_media_type:
+            return binary_encoding.encode(binary_encoding.records_table(result, web_helpers.camel_case_keys, MetaTraderOrder), media_type)
+
+        return serialization.encode_camel_case(result)
+
+    def history_deals_since(self, data: dict, media_type: str = binary_encoding.json_media_type) -> str | bytes:
+        since_ticket, since_time = self.__parse_since__(data)
+
+        result = self.mt5.history_deals_since(since_ticket, since_time)
+
+        if media_type != binary_encoding.json_media_type:
+            return binary_encoding.encode(binary_encoding.records_table(result), media_type)
+
+        return serialization.encode(result)
+
+    def history_orders_since(self, data: dict, media_type: str = binary_encoding.json_media_type) -> str | bytes:
+        since_ticket, since_time = self.__parse_since__(data)
+
+        result = self.mt5.history_orders_since(since_ticket, since_time)
+
+        if media_type != binary_encoding.json_media_type:
+            return binary_encoding.encode(binary_encoding.records_table(result, web_helpers.camel_case_keys, MetaTraderOrder), media_type)
+
+        return serialization.encode_camel_case(result)
+
+    def stream_history_deals(self, data: dict) -> Iterator[str]:
+        date_from = datetime_str_to_unix_time(data['dateFrom'])
+
+        pages = self.mt5.iter_history_deals(date_from, app_config.HISTORY_STREAM_PAGE_DAYS * 24 * 60 * 60)
+        return web_helpers.stream_json_array(serialization.encode(page)[1:-1] for page in pages)
+
+    def stream_history_orders(self, data: dict) -> Iterator[str]:
+        date_from = datetime_str_to_unix_time(data['dateFrom'])
+
+        pages = self.mt5.iter_history_orders(date_from, app_config.HISTORY_STREAM_PAGE_DAYS * 24 * 60 * 60)
+        return web_helpers.stream_json_array(serialization.encode_camel_case(page)[1:-1] for page in pages)
+
+    # endregion
+
+    # region Batch
+    def batch(self, data: dict) -> str:
+        items = []
+
+        for sub_request in data['requests']:
+            def execute_sub_request(sub_request=sub_request):
+                operation_type = sub_request['type']
+
+                if operation_type not in self.batch_operations:
+                    raise Exception(f'Unknown batch operation \'{operation_type}\'')
+
+                return self.batch_operations[operation_type](sub_request)
+
+            items.append(web_helpers.execute_batch_item(execute_sub_request))
+
+        return '[' + ', '.join(items) + ']'
+
+    # endregion
+
+    # region Subscriptions
+    def subscribe(self, data: dict) -> Iterator[str]:
+        return self.subscription_hub.stream(self.__subscribe__(data))
+
+    def subscribe_async(self, data: dict) -> AsyncIterator[str]:
+        return self.subscription_hub.stream_async(self.__subscribe__(data))
+
+    def __subscribe__(self, data: dict) -> Subscription:
+        # Параметры строки запроса: symbols и timeframes - через запятую, positions - true/false
+        symbols = [x for x in data.get('symbols', '').split(',') if x]
+        timeframes = [x for x in data.get('timeframes', '').split(',') if x]
+        positions = data.get('positions', 'false').lower() == 'true'
+
+        return self.subscription_hub.subscribe(symbols, timeframes, positions)
+
+    # endregion
+
+    # region Service info
+    def get_coalescing_stats(self, data: dict) -> str:
+        return serialization.encode(self.single_flight.stats())
+
+    def get_state_cache_stats(self, data: dict) -> str:
+        return serialization.encode(self.mt5.state_cache.stats())
+
+    def get_subscriptions_stats(self, data: dict) -> str:
+        return serialization.encode(self.subscription_hub.stats())
+
+    def get_health(self, data: dict) -> str:
+        return serialization.encode({**self.mt5.connection_supervisor.health(), 'queueDepth': self.mt5.terminal_worker.queue_depth()})
+
+    def configure_profiler(self, data: dict) -> str:
+        self.request_profiler.configure(bool(data['enabled']), data.get('routes', []), float(data.get('sampleRate', 1.0)))
+        return serialization.encode(self.request_profiler.state())
+
+    def get_profiles(self, data: dict) -> str:
+        return serialization.encode(self.request_profiler.profiles(data.get('route')))
+
+    def dump_profiles(self, data: dict) -> tuple[str, str]:
+        dump_format = data.get('format', 'collapsed')
+
+        if dump_format == 'collapsed':
+            return self.request_profiler.dump_collapsed(data.get('id'), data.get('route')), 'text/plain; charset=utf-8'
+
+        if dump_format == 'speedscope':
+            return self.request_profiler.dump_speedscope(data.get('id'), data.get('route')), 'application/json'
+
+        raise Exception(f'Unknown profile format \'{dump_format}\'')
+
+    # endregion
+
+    # region private
+    def __coalesce__(self, key: tuple, func: Callable[[], str]) -> str:
+        # Одинаковые одновременные запросы получают один ответ терминала
+        return self.single_flight.do(key, func, app_config.COALESCING_TTL_SECONDS.get(key[0], 0))
+
+    @staticmethod
+    def __encode_rates__(rates: numpy.ndarray, media_type: str) -> str | bytes:
+        if media_type != binary_encoding.json_media_type:
+            return binary_encoding.encode(binary_encoding.rates_table(rates), media_type)
+
+        return quotes_encoding.encode_rates(rates)
+
+    @staticmethod
+    def __parse_indicator__(data: dict) -> tuple[str, int, str]:
+        indicator_type = data['type'].lower()
+        period = int(data['period'])
+        field = data.get('source', 'close').lower()
+
+        if indicator_type not in bar_aggregation.indicator_types:
+            raise Exception(f'Unknown indicator \'{indicator_type}\'')
+
+        if period <= 0 or field not in bar_aggregation.price_fields:
+            raise Exception(f'Invalid indicator parameters: period {period}, source \'{field}\'')
+
+        return indicator_type, period, field
+
+    @staticmethod
+    def __parse_since__(data: dict) -> tuple[int | None, int | None]:
+        since_ticket = int(data['sinceTicket']) if data.get('sinceTicket') is not None else None
+        since_time = datetime_str_to_unix_time(data['sinceTime']) if data.get('sinceTime') is not None else None
+
+        return since_ticket, since_time
+
+    # endregion
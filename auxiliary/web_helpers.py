@@ -1,7 +1,9 @@
+import hashlib
 import json
-from collections.abc import Callable
+import time
+from collections.abc import Callable, Iterator
 
-from metatrader.terminal_integration import MetaTrader5Integration
+from auxiliary import binary_encoding, metrics
 
 
 def __serialize_success_response__(payload: str) -> str:
@@ -9,6 +11,11 @@ def __serialize_success_response__(payload: str) -> str:
 
 
 def __serialize_error_response__(ex: Exception | str | tuple) -> str:
+    timings = metrics.current_request()
+
+    if timings is not None:
+        metrics.request_errors_total.increment(timings.route)
+
     if isinstance(ex, tuple) and len(ex) >= 2:
         error_message = f'Error - {ex[1]} (code:{ex[0]})'
         response = {"isSuccess": False, "errorMessage": f'{error_message}'}
@@ -18,10 +25,115 @@ def __serialize_error_response__(ex: Exception | str | tuple) -> str:
     return json.dumps(response)
 
 
-def execute(func: Callable, mt5: MetaTrader5Integration) -> str:
-    if not mt5.mt5_connect_status:
-        return __serialize_error_response__(mt5.mt5_connect_last_error)
+def __execute_timed__(func: Callable):
+    # Время func за вычетом уже учтенных этапов (разбор, проверка дилера, терминал, преобразование) - сериализация
+    timings = metrics.current_request()
+
+    if timings is None:
+        return func()
+
+    accounted, started = timings.accounted(), time.perf_counter()
 
+    try:
+        return func()
+    finally:
+        timings.add('serialization', time.perf_counter() - started - (timings.accounted() - accounted))
+
+
+def execute(func: Callable) -> str:
+    # Без соединения с терминалом MetaTrader5Integration отказывает сразу (ConnectionSupervisor),
+    # а то, что можно отдать из кэшей, отдает и во время переподключения
+    try:
+        payload = __execute_timed__(func)
+        return __serialize_success_response__(payload)
+    except Exception as e:
+        return __serialize_error_response__(e)
+
+
+def execute_with_etag(func: Callable, if_none_match: str | None) -> tuple[str, int, dict]:
+    # ETag считается по payload: клиент с совпадающим If-None-Match получает 304 без тела
+    try:
+        payload = __execute_timed__(func)
+    except Exception as e:
+        return __serialize_error_response__(e), 200, {}
+
+    etag = '"' + hashlib.blake2b(payload.encode(), digest_size=16).hexdigest() + '"'
+
+    if if_none_match is not None:
+        requested_etags = [x.strip().removeprefix('W/') for x in if_none_match.split(',')]
+
+        if etag in requested_etags or '*' in requested_etags:
+            return '', 304, {'ETag': etag}
+
+    return __serialize_success_response__(payload), 200, {'ETag': etag}
+
+
+def execute_negotiated(func: Callable, media_type: str) -> tuple[str | bytes, int, dict]:
+    # JSON - прежний ответ в обертке isSuccess; двоичный формат - только payload, ошибки - обычным JSON-ответом
+    headers = {'Vary': 'Accept'}
+
+    if media_type == binary_encoding.json_media_type:
+        return execute(func), 200, headers
+
+    try:
+        payload = __execute_timed__(func)
+    except Exception as e:
+        return __serialize_error_response__(e), 200, {**headers, 'Content-Type': binary_encoding.json_media_type}
+
+    return payload, 200, {**headers, 'Content-Type': media_type}
+
+
+def execute_raw(func: Callable[[], tuple[str, str]]) -> tuple[str, int, dict]:
+    # Выгрузка для внешних инструментов (тело и его Content-Type) без обертки isSuccess, ошибки - обычным JSON-ответом
+    try:
+        body, content_type = func()
+    except Exception as e:
+        return __serialize_error_response__(e), 200, {'Content-Type': binary_encoding.json_media_type}
+
+    return body, 200, {'Content-Type': content_type}
+
+
+def execute_stream(func: Callable[[], Iterator[str]]) -> str | Iterator[str]:
+    # Первая порция запрашивается до отправки заголовка, чтобы ранние ошибки вернулись обычным ответом.
+    # Ошибка посреди потока обрывает соединение - незавершенный chunked-ответ клиент увидит как ошибку
+    try:
+        payload_chunks = func()
+        first_chunk = next(payload_chunks)
+    except Exception as e:
+        return __serialize_error_response__(e)
+
+    def stream():
+        yield '{"isSuccess": true, "payload": ' + first_chunk
+        yield from payload_chunks
+        yield '}'
+
+    return stream()
+
+
+def execute_event_stream(func: Callable[[], Iterator[str]]) -> tuple[str | Iterator[str], int, dict]:
+    # Ошибки подписки возвращаются обычным ответом, после этого - поток событий text/event-stream
+    try:
+        events = func()
+    except Exception as e:
+        return __serialize_error_response__(e), 200, {}
+
+    return events, 200, {'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+def stream_json_array(items: Iterator[str]) -> Iterator[str]:
+    # items - содержимое JSON-массивов без скобок, пустые порции пропускаются
+    separator = '['
+
+    for item in items:
+        if item:
+            yield separator + item
+            separator = ', '
+
+    yield ']' if separator == ', ' else '[]'
+
+
+def execute_batch_item(func: Callable) -> str:
+    # Ошибка одного элемента пакета не прерывает остальные
     try:
         payload = func()
         return __serialize_success_response__(payload)
@@ -47,3 +159,21 @@ def dict_keys_modify(dictionary: dict, modifier: Callable) -> dict:
         new_dictionary[modifier(key)] = value
 
     return new_dictionary
+
+
+def camel_case_keys(named_tuple_type: type) -> tuple[str, ...]:
+    # Таблица ключей lowerCamelCase строится один раз на тип именованного кортежа MT5 (SymbolInfo, TradeOrder, ...)
+    keys = camel_case_keys_by_type.get(named_tuple_type)
+
+    if keys is None:
+        keys = tuple(map(snake_to_lower_camel_case, named_tuple_type._fields))
+        camel_case_keys_by_type[named_tuple_type] = keys
+
+    return keys
+
+
+def named_tuple_to_camel_case_dict(named_tuple: tuple) -> dict:
+    return dict(zip(camel_case_keys(type(named_tuple)), named_tuple))
+
+
+camel_case_keys_by_type: dict[type, tuple[str, ...]] = {}
@@ -0,0 +1,105 @@
+# Сервис на waitress против asyncio-сервера (asgi) при одинаковой конкуренции: смесь запросов load_test,
+# затем та же смесь, пока открыты простаивающие keep-alive соединения. Оба сервера запускаются с симулятором терминала.
+# Запуск из корня проекта: python -m benchmarks.asgi_benchmark --concurrency 16 --duration 10 --idle-connections 250
+import argparse
+import http.client
+import json
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.load_test import create_scenario, run_client, percentile
+from config import app_config
+
+dealer = 'AlfaForex'
+
+
+def start_service(http_server: str, port: int) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, 'program.py', dealer, str(port), app_config.SIMULATOR_ENVIRONMENT, http_server],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/service-info/health')
+
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.5)
+
+    process.kill()
+    raise Exception(f'Service ({http_server}) did not start on port {port}')
+
+
+def open_idle_connections(port: int, count: int) -> list[http.client.HTTPConnection]:
+    # Каждое соединение выполняет один запрос и остается открытым
+    connections = []
+
+    for _ in range(count):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        connection.request('POST', '/terminal-info/version', json.dumps({'dealerType': dealer}), {'Content-Type': 'application/json'})
+        connection.getresponse().read()
+        connections.append(connection)
+
+    return connections
+
+
+def run_load(port: int, scenario: list[tuple[str, dict]], concurrency: int, duration: float) -> tuple[dict[str, list[float]], list[str]]:
+    latencies: dict[str, list[float]] = {}
+    errors: list[str] = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    clients = [threading.Thread(target=run_client, args=('127.0.0.1', port, scenario, i, deadline, latencies, errors, lock))
+               for i in range(concurrency)]
+
+    for client in clients:
+        client.start()
+
+    for client in clients:
+        client.join()
+
+    return latencies, errors
+
+
+def report(name: str, latencies: dict[str, list[float]], errors: list[str], duration: float) -> None:
+    values = [x for route_values in latencies.values() for x in route_values]
+
+    print(f'{name:<36} {len(values) / duration:8.1f} req/s  '
+          f'p50={statistics.median(values) * 1000:7.1f} ms  '
+          f'p99={percentile(values, 0.99) * 1000:7.1f} ms  '
+          f'max={max(values) * 1000:8.1f} ms  errors={len(errors)}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=7400)
+    parser.add_argument('--symbol', default='EURUSD')
+    parser.add_argument('--heavy-count', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--idle-connections', type=int, default=250)
+    args = parser.parse_args()
+
+    scenario = create_scenario(dealer, args.symbol, args.heavy_count)
+    print(f'concurrency {args.concurrency}, {args.duration:.0f} s per run, heavy count {args.heavy_count}')
+
+    for http_server in ('waitress', 'asgi'):
+        service = start_service(http_server, args.port)
+
+        try:
+            report(http_server, *run_load(args.port, scenario, args.concurrency, args.duration), args.duration)
+
+            idle_connections = open_idle_connections(args.port, args.idle_connections)
+            report(f'{http_server}, {args.idle_connections} idle connections',
+                   *run_load(args.port, scenario, args.concurrency, args.duration), args.duration)
+
+            for connection in idle_connections:
+                connection.close()
+        finally:
+            service.terminate()
+            service.wait()
@@ -0,0 +1,207 @@
+# Бенчмарк всех маршрутов program.py на симуляторе терминала (pytest-benchmark, работает и под Linux).
+# Запуск из корня проекта:
+#   python -m pytest benchmarks/bench_routes.py --benchmark-only
+# Сравнение с сохраненным прогоном: --benchmark-autosave, затем --benchmark-compare --benchmark-compare-fail=mean:10%
+import json
+import logging
+
+import jsonpickle
+import numpy
+import pytest
+import seqlog
+
+import program
+from benchmarks.serialization_benchmark import create_payloads
+from config import app_config
+from metatrader.enums.mt5_dealer_type_enum import Mt5DealerTypeEnum
+from metatrader.history_ledger import HistoryLedger
+from metatrader.terminal_integration import MetaTrader5Integration
+from metatrader.terminal_simulator import TerminalSimulator
+
+# Объем данных симулятора и задержка каждого обращения к терминалу
+symbols_count = 500
+positions_count = 50
+history_size = 20000
+bars_count = 100000
+latency_seconds = 0.0
+
+dealer = Mt5DealerTypeEnum.AlfaForex.name
+
+route_requests: dict[str, dict] = {
+    '/terminal-info/version': {},
+    '/account-info/get': {},
+    '/opened-positions/get': {},
+    '/symbol-info/get-symbols': {},
+    '/symbol-info/get-symbol-info': {'symbol': 'EURUSD'},
+    '/symbol-info/get-symbols-static': {},
+    '/symbol-info/get-symbol-static-info': {'symbol': 'EURUSD'},
+    '/symbol-info/get-symbols-volatile': {'symbols': ['EURUSD', 'GBPUSD', 'USDJPY']},
+    '/position_management/update-stop-loss': {'identifier': 100001, 'stopLossValue': 1.05},
+    '/position_management/update-stop-losses': {'stopLosses': [{'identifier': 100000 + i, 'stopLossValue': 1.05} for i in range(20)]},
+    '/position_management/close-position': {'symbol': 'EURUSD'},
+    '/position_management/open-position': {'symbol': 'EURUSD', 'action': 'ORDER_TYPE_BUY', 'volume': 0.1, 'stopLoss': 1.05},
+    '/position_management/submit-orders': {'orders': [{'type': 'open', 'symbol': 'EURUSD', 'action': 'ORDER_TYPE_BUY', 'volume': 0.1, 'stopLoss': 1.05},
+                                                      {'type': 'modify', 'identifier': 100001, 'stopLossValue': 1.05},
+                                                      {'type': 'close', 'symbol': 'GBPUSD'}]},
+    '/quotes/get-last-quotes': {'symbols': ['EURUSD', 'GBPUSD', 'USDJPY', 'USDCHF', 'AUDUSD'], 'timeframe': 'TIMEFRAME_M1', 'count': 500},
+    '/quotes/get-quotes': {'symbol': 'EURUSD', 'timeframe': 'TIMEFRAME_M1', 'count': 50000},
+    '/quotes/get-range-quotes': {'symbol': 'EURUSD', 'timeframe': 'TIMEFRAME_M1', 'dateFrom': '2025-05-01T00:00:00Z', 'dateTo': '2025-06-01T00:00:00Z'},
+    '/quotes/get-aggregated-quotes': {'symbol': 'EURUSD', 'timeframe': 'TIMEFRAME_M1', 'intervalSeconds': 7 * 60, 'dateFrom': '2025-05-01T00:00:00Z',
+                                      'indicators': [{'type': 'sma', 'period': 20}, {'type': 'ema', 'period': 50}, {'type': 'atr', 'period': 14},
+                                                     {'type': 'channel', 'period': 20}]},
+    '/quotes/stream-quotes': {'symbol': 'EURUSD', 'timeframe': 'TIMEFRAME_M1', 'count': 50000},
+    '/quotes/stream-range-quotes': {'symbol': 'EURUSD', 'timeframe': 'TIMEFRAME_M1', 'dateFrom': '2025-05-01T00:00:00Z', 'dateTo': '2025-06-01T00:00:00Z'},
+    '/order-check/order-calc-profit': {'symbol': 'EURUSD', 'action': 'ORDER_TYPE_BUY', 'volume': 0.1, 'priceOpen': 1.1, 'priceClose': 1.11},
+    '/order-check/order-calc-margin': {'symbol': 'EURUSD', 'action': 'ORDER_TYPE_BUY', 'volume': 0.1, 'priceOpen': 1.1},
+    '/order-check/order-calc-profit-grid': {'symbol': 'EURUSD', 'action': 'ORDER_TYPE_BUY', 'volumes': [0.1, 0.5, 1.0],
+                                            'priceOpen': 1.1, 'pricesClose': [1.09, 1.1, 1.11], 'verify': True},
+    '/order-check/order-calc-margin-grid': {'symbol': 'EURUSD', 'action': 'ORDER_TYPE_BUY', 'volumes': [0.1, 0.5, 1.0],
+                                            'prices': [1.09, 1.1, 1.11], 'verify': True},
+    '/order-check/order-check': {'symbol': 'EURUSD', 'action': 'ORDER_TYPE_BUY', 'volume': 0.1, 'stopLoss': 1.05},
+    '/get-history/get-history-deals': {'dateFrom': '2020-09-01T00:00:00Z'},
+    '/get-history/get-history-orders': {'dateFrom': '2020-09-01T00:00:00Z'},
+    '/get-history/get-history-deals-since': {'sinceTicket': 219000},
+    '/get-history/get-history-orders-since': {'sinceTime': '2020-12-25T00:00:00Z'},
+    '/get-history/stream-history-deals': {'dateFrom': '2020-09-01T00:00:00Z'},
+    '/get-history/stream-history-orders': {'dateFrom': '2020-09-01T00:00:00Z'},
+    '/batch': {'requests': [
+        {'type': 'account-info'},
+        {'type': 'opened-positions'},
+        {'type': 'get-last-quotes', 'symbols': ['EURUSD', 'GBPUSD'], 'timeframe': 'TIMEFRAME_M5', 'count': 100},
+    ]},
+    '/subscriptions/stream': {'symbols': 'EURUSD,GBPUSD', 'timeframes': 'TIMEFRAME_M1', 'positions': 'true'},
+    '/service-info/coalescing-stats': {},
+    '/service-info/state-cache-stats': {},
+    '/service-info/subscriptions-stats': {},
+    '/service-info/health': {},
+    '/service-info/profiler-configure': {'enabled': False},
+    '/service-info/profiler-profiles': {},
+    '/service-info/profiler-dump': {'format': 'collapsed'},
+    '/metrics': {},
+}
+
+# Маршруты, меняющие состояние терминала: перед каждым замером позиции симулятора возвращаются к исходным
+state_changing_routes = {'/position_management/close-position', '/position_management/open-position', '/position_management/submit-orders'}
+
+# Потоки событий (GET с параметрами в строке запроса): замеряется время до первого события
+event_stream_routes = {'/subscriptions/stream'}
+
+# GET без тела и без обертки isSuccess
+plain_get_routes = {'/metrics', '/service-info/health', '/service-info/profiler-dump'}
+
+
+@pytest.fixture(scope='module')
+def simulator() -> TerminalSimulator:
+    return TerminalSimulator(symbols_count, positions_count, history_size, bars_count, latency_seconds)
+
+
+@pytest.fixture(scope='module')
+def client(simulator, tmp_path_factory):
+    # Сервис пишет сообщения с именованными параметрами - как после seqlog.configure_from_file в program.py
+    logging.setLoggerClass(seqlog.structured_logging.StructuredLogger)
+    logger = logging.getLogger('bench_routes')
+    history_ledger = HistoryLedger(str(tmp_path_factory.mktemp('history_ledger') / 'ledger.sqlite3'), app_config.HISTORY_LEDGER_OVERLAP_SECONDS, logger)
+
+    mt5 = MetaTrader5Integration('', 0, '', '', logger, terminal=simulator, history_ledger=history_ledger)
+    program.configure(mt5, Mt5DealerTypeEnum.AlfaForex)
+
+    return program.app.test_client()
+
+
+def post(client, route: str) -> dict:
+    response = client.post(route, json={'dealerType': dealer, **route_requests[route]})
+    return json.loads(response.get_data())
+
+
+def subscribe(client, route: str) -> str:
+    response = client.get(route, query_string={'dealerType': dealer, **route_requests[route]}, buffered=False)
+
+    try:
+        return next(response.response).decode()
+    finally:
+        response.close()
+
+
+def test_all_routes_covered():
+    routes = {rule.rule for rule in program.app.url_map.iter_rules() if rule.endpoint != 'static'}
+
+    assert routes == set(route_requests)
+
+
+@pytest.mark.parametrize('route', list(route_requests))
+def test_route(benchmark, client, simulator, route):
+    if route in state_changing_routes:
+        initial_positions = list(simulator.positions)
+
+        def reset_positions():
+            simulator.positions = list(initial_positions)
+
+        result = benchmark.pedantic(post, args=(client, route), setup=reset_positions, rounds=50)
+    elif route in plain_get_routes:
+        response = benchmark(client.get, route, query_string=route_requests[route])
+
+        assert response.status_code == 200
+        return
+    elif route in event_stream_routes:
+        event = benchmark(subscribe, client, route)
+
+        assert event.startswith('event: ')
+        return
+    else:
+        result = benchmark(post, client, route)
+
+    assert result['isSuccess'], result
+
+
+serialization_payloads = create_payloads()
+
+
+@pytest.mark.parametrize('route', list(serialization_payloads))
+def test_serialization_matches_jsonpickle(benchmark, route):
+    # Эталон - jsonpickle, которым ответы кодировались раньше: вывод должен совпадать побайтово
+    payload, encode = serialization_payloads[route]
+
+    assert benchmark(encode) == jsonpickle.encode(payload, unpicklable=False)
+
+def test_history_ledger_pending_order(benchmark, tmp_path):
+    # Отложенный ордер выставлен задолго до отметки журнала, после него в историю попадают более новые ордера,
+    # затем он исполняется: get-history-orders из журнала должен совпасть с чтением из терминала без журнала
+    logger = logging.getLogger('bench_routes')
+    terminal = TerminalSimulator(symbols_count, positions_count, 1000, bars_count, 0)
+    history_ledger = HistoryLedger(str(tmp_path / 'ledger.sqlite3'), app_config.HISTORY_LEDGER_OVERLAP_SECONDS, logger)
+    ledger = MetaTrader5Integration('', 0, '', '', logger, terminal=terminal, history_ledger=history_ledger)
+    uncached = MetaTrader5Integration('', 0, '', '', logger, terminal=terminal)
+
+    ticket = terminal.place_pending_order('EURUSD', 0.1, 1.05, terminal.orders[-1].time_setup - 30 * 24 * 60 * 60)
+    ledger.history_orders_get(0)
+
+    for _ in range(3):
+        terminal.order_send({'action': terminal.TRADE_ACTION_DEAL, 'symbol': 'EURUSD', 'volume': 0.1, 'type': 0})
+        ledger.history_orders_get(0)
+
+    terminal.fill_pending_order(ticket)
+
+    assert benchmark(ledger.history_orders_get, 0) == uncached.history_orders_get(0)
+
+
+def test_aggregated_rates_independent_of_cache(benchmark):
+    # Тот же запрос на пустом кэше и после запросов с другими date_from и date_to, в том числе в соседних блоках
+    # начала расчета, должен вернуть те же бары и значения индикаторов до последнего бита
+    logger = logging.getLogger('bench_routes')
+    indicators = [('sma', 20, 'close'), ('ema', 50, 'close'), ('ema', 3, 'high'), ('atr', 14, 'close'), ('channel', 10, 'close')]
+    interval_seconds = 15 * 60
+    now = TerminalSimulator().now
+    request = ('EURUSD', 'TIMEFRAME_M1', interval_seconds, now - 20 * 24 * 60 * 60 + 17, now - 5 * 24 * 60 * 60, indicators)
+
+    cold = MetaTrader5Integration('', 0, '', '', logger, terminal=TerminalSimulator()).get_aggregated_rates(*request)
+
+    warm = MetaTrader5Integration('', 0, '', '', logger, terminal=TerminalSimulator())
+    warm.get_aggregated_rates('EURUSD', 'TIMEFRAME_M1', interval_seconds, now - 60 * 24 * 60 * 60, now - 30 * 24 * 60 * 60, indicators)
+    warm.get_aggregated_rates('EURUSD', 'TIMEFRAME_M1', interval_seconds, now - 21 * 24 * 60 * 60, now - 15 * 24 * 60 * 60, indicators)
+    warm.get_aggregated_rates('EURUSD', 'TIMEFRAME_M1', interval_seconds, now - 19 * 24 * 60 * 60, 2147483647, indicators)
+
+    bars, columns = benchmark(warm.get_aggregated_rates, *request)
+
+    assert numpy.array_equal(bars, cold[0])
+    assert columns.keys() == cold[1].keys()
+    assert all(numpy.array_equal(columns[name], cold[1][name], equal_nan=True) for name in columns)
@@ -0,0 +1,67 @@
+# Размер ответа и время кодирования/декодирования: JSON против .npy, MessagePack и Arrow IPC
+# (форматы без установленной библиотеки пропускаются). Перед замером сверяется содержимое.
+# Запуск из корня проекта: python -m benchmarks.binary_formats_benchmark
+import io
+import json
+import timeit
+
+import numpy
+
+from auxiliary import binary_encoding, quotes_encoding, serialization
+from metatrader.models.metatrader_deal import MetaTraderDeals
+from metatrader.terminal_simulator import TerminalSimulator, create_rates
+
+bars_count = 100000
+history_size = 20000
+repeats = 5
+
+
+def decode(payload: bytes, media_type: str) -> dict[str, numpy.ndarray]:
+    # Клиентская сторона: ответ -> столбцы numpy
+    if media_type == binary_encoding.npy_media_type:
+        table = numpy.load(io.BytesIO(payload), allow_pickle=False)
+        return {name: table[name] for name in table.dtype.names}
+
+    if media_type == binary_encoding.msgpack_media_type:
+        message = binary_encoding.msgpack.unpackb(payload)
+        return {x['name']: numpy.frombuffer(x['data'], dtype=x['dtype']) for x in message['columns']}
+
+    table = binary_encoding.pyarrow.ipc.open_stream(payload).read_all()
+    return {name: table.column(name).to_numpy() for name in table.column_names}
+
+
+def measure(name: str, json_encode, table_encode, expected: numpy.ndarray) -> None:
+    json_payload = json_encode().encode()
+    json_encode_time = min(timeit.repeat(json_encode, number=1, repeat=repeats))
+    json_decode_time = min(timeit.repeat(lambda: json.loads(json_payload), number=1, repeat=repeats))
+
+    print(f'{name}: json {len(json_payload) / 1024:9.1f} KiB, encode {json_encode_time * 1000:8.2f} ms, decode {json_decode_time * 1000:8.2f} ms')
+
+    for media_type in binary_encoding.media_types[1:]:
+        payload = table_encode(media_type)
+        decoded = decode(payload, media_type)
+
+        if list(decoded) != list(expected.dtype.names) or not all(numpy.array_equal(decoded[x], expected[x]) for x in decoded):
+            raise Exception(f'{media_type} payload differs from the source table ({name})')
+
+        encode_time = min(timeit.repeat(lambda: table_encode(media_type), number=1, repeat=repeats))
+        decode_time = min(timeit.repeat(lambda: decode(payload, media_type), number=1, repeat=repeats))
+
+        print(f'{"":>{len(name)}}  {media_type:<36} {len(payload) / 1024:9.1f} KiB (x{len(json_payload) / len(payload):.1f}), '
+              f'encode {encode_time * 1000:8.2f} ms (x{json_encode_time / encode_time:.1f}), '
+              f'decode {decode_time * 1000:8.2f} ms (x{json_decode_time / decode_time:.1f})')
+
+
+if __name__ == '__main__':
+    rates = create_rates(bars_count)
+    rates_table = binary_encoding.rates_table(rates)
+
+    measure(f'{bars_count} bars', lambda: quotes_encoding.encode_rates(rates),
+            lambda media_type: binary_encoding.encode(binary_encoding.rates_table(rates), media_type), rates_table)
+
+    simulator = TerminalSimulator(1, 0, history_size, 0)
+    deals = MetaTraderDeals.create(simulator.history_deals_get(0, 2147483647))
+    deals_table = binary_encoding.records_table(deals)
+
+    measure(f'{history_size} deals', lambda: serialization.encode(deals),
+            lambda media_type: binary_encoding.encode(binary_encoding.records_table(deals), media_type), deals_table)
@@ -0,0 +1,34 @@
+# Кодирование ответа /symbol-info/get-symbols: переименование ключей на каждый запрос против таблицы ключей на тип.
+# Запуск из корня проекта: python -m benchmarks.camel_case_benchmark
+import timeit
+
+import jsonpickle
+
+from auxiliary import serialization, web_helpers
+from metatrader import terminal_simulator
+
+symbols_counts = [100, 500, 2000]
+repeats = 5
+
+
+def encode_per_call(symbols: list[tuple]) -> str:
+    dictionaries = [web_helpers.dict_keys_modify(x._asdict(), web_helpers.snake_to_lower_camel_case) for x in symbols]
+    return jsonpickle.encode(dictionaries, unpicklable=False)
+
+
+def encode_key_map(symbols: list[tuple]) -> str:
+    return serialization.encode_camel_case(symbols)
+
+
+if __name__ == '__main__':
+    for symbols_count in symbols_counts:
+        symbols = [terminal_simulator.create_symbol_info(i) for i in range(symbols_count)]
+
+        if encode_per_call(symbols) != encode_key_map(symbols):
+            raise Exception(f'Key map encoding differs from per-call encoding ({symbols_count} symbols)')
+
+        per_call = min(timeit.repeat(lambda: encode_per_call(symbols), number=1, repeat=repeats))
+        key_map = min(timeit.repeat(lambda: encode_key_map(symbols), number=1, repeat=repeats))
+
+        print(f'{symbols_count:>5} symbols: dict_keys_modify + jsonpickle {per_call * 1000:9.2f} ms, '
+              f'key map {key_map * 1000:9.2f} ms, x{per_call / key_map:.1f}')
@@ -0,0 +1,99 @@
+# Нагрузочный тест запущенного сервиса: смесь тяжелых (история котировок) и легких (версия терминала) запросов.
+# Для сравнения запустить сервис с WAITRESS_THREADS = 1 и со значением по умолчанию, затем:
+#   python -m benchmarks.load_test --port 7200 --dealer AlfaForex --symbol EURUSD --concurrency 16 --duration 30
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+
+
+def create_scenario(dealer: str, symbol: str, heavy_count: int) -> list[tuple[str, dict]]:
+    return [
+        ('/quotes/get-quotes', {'dealerType': dealer, 'symbol': symbol, 'timeframe': 'TIMEFRAME_M1', 'count': heavy_count}),
+        ('/terminal-info/version', {'dealerType': dealer}),
+        ('/account-info/get', {'dealerType': dealer}),
+        ('/terminal-info/version', {'dealerType': dealer}),
+        ('/opened-positions/get', {'dealerType': dealer}),
+        ('/symbol-info/get-symbol-info', {'dealerType': dealer, 'symbol': symbol}),
+    ]
+
+
+def run_client(host: str, port: int, scenario: list[tuple[str, dict]], offset: int, deadline: float,
+               latencies: dict[str, list[float]], errors: list[str], lock: threading.Lock) -> None:
+    connection = http.client.HTTPConnection(host, port, timeout=300)
+    step = offset
+
+    while time.perf_counter() < deadline:
+        route, body = scenario[step % len(scenario)]
+        step += 1
+
+        started = time.perf_counter()
+
+        try:
+            connection.request('POST', route, json.dumps(body), {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            payload = response.read()
+            elapsed = time.perf_counter() - started
+
+            if not json.loads(payload).get('isSuccess'):
+                with lock:
+                    errors.append(f'{route}: {payload[:200]!r}')
+        except Exception as e:
+            elapsed = time.perf_counter() - started
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=300)
+
+            with lock:
+                errors.append(f'{route}: {e}')
+
+        with lock:
+            latencies.setdefault(route, []).append(elapsed)
+
+    connection.close()
+
+
+def percentile(values: list[float], part: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * part))]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--dealer', required=True)
+    parser.add_argument('--symbol', default='EURUSD')
+    parser.add_argument('--heavy-count', type=int, default=100000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30)
+    args = parser.parse_args()
+
+    scenario = create_scenario(args.dealer, args.symbol, args.heavy_count)
+    latencies: dict[str, list[float]] = {}
+    errors: list[str] = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    clients = [threading.Thread(target=run_client, args=(args.host, args.port, scenario, i, deadline, latencies, errors, lock))
+               for i in range(args.concurrency)]
+
+    for client in clients:
+        client.start()
+
+    for client in clients:
+        client.join()
+
+    total = sum(len(x) for x in latencies.values())
+    print(f'concurrency {args.concurrency}, {total} requests, {total / args.duration:.1f} req/s, {len(errors)} errors')
+
+    for route, values in sorted(latencies.items()):
+        print(f'{route:<40} n={len(values):<6} '
+              f'p50={statistics.median(values) * 1000:8.1f} ms  '
+              f'p95={percentile(values, 0.95) * 1000:8.1f} ms  '
+              f'p99={percentile(values, 0.99) * 1000:8.1f} ms  '
+              f'max={max(values) * 1000:8.1f} ms')
+
+    for error in errors[:10]:
+        print(error)
@@ -0,0 +1,84 @@
+# Память на запись и скорость преобразования записей терминала: датаклассы с __dict__ (как было),
+# датаклассы со __slots__ и таблица по столбцам (RecordTable). Перед замером сверяется JSON всех трех вариантов.
+# Запуск из корня проекта: python -m benchmarks.models_memory_benchmark
+import dataclasses
+import gc
+import timeit
+import tracemalloc
+import types
+from collections.abc import Callable
+
+from auxiliary import serialization
+from metatrader import terminal_simulator
+from metatrader.models.metatrader_deal import MetaTraderDeal, MetaTraderDeals
+from metatrader.models.metatrader_quote import Quote, Quotes
+
+records_count = 100000
+repeats = 3
+
+
+def without_slots(cls: type) -> type:
+    # Прежний вид модели: тот же датакласс с __dict__ у каждого экземпляра и тот же create, создающий его
+    legacy = dataclasses.make_dataclass(f'Legacy{cls.__name__}', [(x.name, x.type) for x in dataclasses.fields(cls)])
+    create = cls.create
+    legacy.create = staticmethod(types.FunctionType(create.__code__, {**create.__globals__, cls.__name__: legacy}))
+    return legacy
+
+
+def allocated_bytes(build: Callable[[], object]) -> int:
+    gc.collect()
+    tracemalloc.start()
+
+    try:
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    del result
+    return size
+
+
+def measure(name: str, variants: dict[str, Callable[[], object]]) -> None:
+    results = {variant: build() for variant, build in variants.items()}
+    encoded = {variant: serialization.encode(result) for variant, result in results.items()}
+
+    if len(set(encoded.values())) != 1:
+        raise Exception(f'{name}: JSON differs between model variants')
+
+    print(f'{name}:')
+    baseline = None
+
+    for variant, build in variants.items():
+        size = allocated_bytes(build)
+        create_time = min(timeit.repeat(build, number=1, repeat=repeats))
+        encode_time = min(timeit.repeat(lambda: serialization.encode(results[variant]), number=1, repeat=repeats))
+        baseline = baseline or (size, create_time, encode_time)
+
+        # Таблица поверх массива баров терминала не копирует данные - своей памяти у нее почти нет
+        size_ratio = f'x{baseline[0] / size:5.1f}' if size >= records_count else 'views'
+
+        print(f'  {variant:<18} {size / records_count:8.1f} bytes/record ({size_ratio}), '
+              f'create {create_time * 1000:8.2f} ms (x{baseline[1] / create_time:6.1f}), '
+              f'encode {encode_time * 1000:8.2f} ms (x{baseline[2] / encode_time:4.1f})')
+
+
+if __name__ == '__main__':
+    # Преобразование считается от исходных записей терминала: их память в замер не входит
+    deals = [terminal_simulator.create_deal(i) for i in range(records_count)]
+    legacy_deal = without_slots(MetaTraderDeal)
+
+    measure(f'{records_count} deals', {
+        '__dict__': lambda: [legacy_deal.create(x) for x in deals],
+        '__slots__': lambda: [MetaTraderDeal.create(x) for x in deals],
+        'RecordTable': lambda: MetaTraderDeals.create(deals),
+    })
+
+    rates = terminal_simulator.create_rates(records_count)
+    legacy_quote = without_slots(Quote)
+
+    measure(f'{records_count} quotes', {
+        '__dict__': lambda: [legacy_quote.create(x) for x in rates],
+        '__slots__': lambda: [Quote.create(x) for x in rates],
+        'RecordTable': lambda: Quotes.from_rates(rates),
+    })
@@ -0,0 +1,53 @@
+# Маржа и прибыль по сетке объемов и цен: order_calc_* терминала на каждую точку против локального расчета по symbol_info.
+# Задержка обращения к терминалу моделируется симулятором, перед замером результаты сверяются с точностью терминала.
+# Сверка - с независимой простой моделью симулятора, которая верна только для символа с прибылью в валюте счета (EURUSD);
+# формулы trade_calculator с живым терминалом здесь не сверяются - для этого запрос сетки с verify на реальном терминале
+# Запуск из корня проекта: python -m benchmarks.order_calc_benchmark
+import logging
+import timeit
+
+import numpy
+
+from metatrader.terminal_integration import MetaTrader5Integration
+from metatrader.terminal_simulator import TerminalSimulator
+from metatrader.terminal_state_cache import TerminalStateCache
+
+volumes = numpy.round(numpy.arange(1, 51) * 0.1, 2)
+prices = numpy.round(numpy.linspace(1.05, 1.15, 40), 5)
+symbol = 'EURUSD'
+price_open = 1.1
+latency_seconds = 0.0002
+repeats = 3
+
+
+def terminal_margin_grid(mt5: MetaTrader5Integration) -> numpy.ndarray:
+    return numpy.array([[mt5.order_calc_margin('ORDER_TYPE_BUY', symbol, volume, price) for price in prices.tolist()] for volume in volumes.tolist()])
+
+
+def terminal_profit_grid(mt5: MetaTrader5Integration) -> numpy.ndarray:
+    return numpy.array([[mt5.order_calc_profit('ORDER_TYPE_SELL', symbol, volume, price_open, price) for price in prices.tolist()]
+                        for volume in volumes.tolist()])
+
+
+def measure(name: str, terminal, local) -> None:
+    terminal_time = min(timeit.repeat(terminal, number=1, repeat=repeats))
+    local_time = min(timeit.repeat(local, number=1, repeat=repeats))
+
+    print(f'{name:<36} terminal {terminal_time * 1000:10.2f} ms, local {local_time * 1000:8.3f} ms, x{terminal_time / local_time:.0f}')
+
+
+if __name__ == '__main__':
+    logger = logging.getLogger('order_calc_benchmark')
+    state_cache = TerminalStateCache({'account_info': 60, 'symbol_info': 60})
+    mt5 = MetaTrader5Integration('', 0, '', '', logger, terminal=TerminalSimulator(latency_seconds=latency_seconds), state_cache=state_cache)
+
+    if not numpy.allclose(terminal_margin_grid(mt5), mt5.order_calc_margin_grid('ORDER_TYPE_BUY', symbol, volumes, prices), rtol=0, atol=0.01):
+        raise Exception('Local margin differs from terminal')
+
+    if not numpy.allclose(terminal_profit_grid(mt5), mt5.order_calc_profit_grid('ORDER_TYPE_SELL', symbol, volumes, price_open, prices), rtol=0, atol=0.01):
+        raise Exception('Local profit differs from terminal')
+
+    points = f'{len(volumes)}x{len(prices)} points'
+    measure(f'margin, {points}', lambda: terminal_margin_grid(mt5), lambda: mt5.order_calc_margin_grid('ORDER_TYPE_BUY', symbol, volumes, prices))
+    measure(f'profit, {points}', lambda: terminal_profit_grid(mt5),
+            lambda: mt5.order_calc_profit_grid('ORDER_TYPE_SELL', symbol, volumes, price_open, prices))
@@ -0,0 +1,40 @@
+# get-last-quotes по большому списку символов: одно подключение к терминалу против пула процессов.
+# Задержка обращения к терминалу моделируется симулятором, перед замером сверяется результат.
+# Запуск из корня проекта: python -m benchmarks.process_pool_benchmark
+import functools
+import logging
+import timeit
+
+from auxiliary import quotes_encoding
+from metatrader.terminal_integration import MetaTrader5Integration
+from metatrader.terminal_process_pool import TerminalProcessPool
+from metatrader.terminal_simulator import TerminalSimulator
+
+symbols_count = 200
+bars_count = 500
+latency_seconds = 0.001
+processes_counts = [2, 4, 8]
+repeats = 5
+
+if __name__ == '__main__':
+    logger = logging.getLogger('process_pool_benchmark')
+    terminal_factory = functools.partial(TerminalSimulator, symbols_count, 0, 0, 5000, latency_seconds)
+    symbols = [symbol.name for symbol in terminal_factory().symbols]
+
+    direct = MetaTrader5Integration('', 0, '', '', logger, terminal=terminal_factory())
+    expected = quotes_encoding.encode_rates_by_symbol(direct.get_last_quotes_rates(symbols, 'TIMEFRAME_M1', bars_count))
+    direct_time = min(timeit.repeat(lambda: direct.get_last_quotes_rates(symbols, 'TIMEFRAME_M1', bars_count), number=1, repeat=repeats))
+
+    print(f'{symbols_count} symbols, latency {latency_seconds * 1000:.1f} ms: direct {direct_time * 1000:9.2f} ms')
+
+    for processes_count in processes_counts:
+        pool = TerminalProcessPool(processes_count, 30, '', 0, '', '', logger, terminal_factory)
+        pooled = MetaTrader5Integration('', 0, '', '', logger, terminal=terminal_factory(), terminal_process_pool=pool)
+
+        if quotes_encoding.encode_rates_by_symbol(pooled.get_last_quotes_rates(symbols, 'TIMEFRAME_M1', bars_count)) != expected:
+            raise Exception(f'Pool of {processes_count} processes returned different quotes')
+
+        pool_time = min(timeit.repeat(lambda: pooled.get_last_quotes_rates(symbols, 'TIMEFRAME_M1', bars_count), number=1, repeat=repeats))
+        pool.close()
+
+        print(f'{"":>{len(str(symbols_count))}} pool of {processes_count} processes {pool_time * 1000:9.2f} ms, x{direct_time / pool_time:.1f}')
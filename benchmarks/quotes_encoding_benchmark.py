@@ -0,0 +1,34 @@
+# Сравнение построчного (Quote.create + jsonpickle) и колоночного кодирования котировок
+# Запуск из корня проекта: python -m benchmarks.quotes_encoding_benchmark
+import timeit
+
+import jsonpickle
+import numpy
+
+from auxiliary import quotes_encoding
+from metatrader.terminal_simulator import create_rates
+from metatrader.models.metatrader_quote import Quote
+
+bars_counts = [100, 5000, 100000]
+repeats = 5
+
+
+def encode_per_row(rates: numpy.ndarray) -> str:
+    return jsonpickle.encode(list(map(lambda x: Quote.create(x), rates)), unpicklable=False)
+
+
+def encode_columnar(rates: numpy.ndarray) -> str:
+    return quotes_encoding.encode_rates(rates)
+
+
+if __name__ == '__main__':
+    for bars_count in bars_counts:
+        rates = create_rates(bars_count)
+
+        if encode_per_row(rates) != encode_columnar(rates):
+            raise Exception(f'Columnar encoding differs from per-row encoding ({bars_count} bars)')
+
+        per_row = min(timeit.repeat(lambda: encode_per_row(rates), number=1, repeat=repeats))
+        columnar = min(timeit.repeat(lambda: encode_columnar(rates), number=1, repeat=repeats))
+
+        print(f'{bars_count:>7} bars: per-row {per_row * 1000:9.2f} ms, columnar {columnar * 1000:9.2f} ms, x{per_row / columnar:.1f}')
@@ -0,0 +1,55 @@
+# Сравнение jsonpickle и auxiliary.serialization на ответах каждого маршрута.
+# Побайтовое совпадение вывода с jsonpickle проверяет test_serialization_matches_jsonpickle в bench_routes.py.
+# Запуск из корня проекта: python -m benchmarks.serialization_benchmark
+import timeit
+from collections.abc import Callable
+
+import jsonpickle
+
+from auxiliary import serialization, web_helpers
+from metatrader import terminal_simulator
+from metatrader.models.metatrader_deal import MetaTraderDeals
+from metatrader.models.metatrader_opened_position import MetaTraderOpenedPositions
+
+repeats = 5
+
+
+def camel_dict(named_tuple) -> dict:
+    return web_helpers.dict_keys_modify(named_tuple._asdict(), web_helpers.snake_to_lower_camel_case)
+
+
+def create_payloads() -> dict[str, tuple[object, Callable[[], str]]]:
+    """Маршрут -> (объект, который раньше кодировался jsonpickle, кодирование тем же путем, что и в TerminalOperations)"""
+    version = {'mtVersion': 500, 'build': 5640, 'releaseDate': '20 Feb 2026'}
+    account_info = terminal_simulator.create_account_info()
+    positions = MetaTraderOpenedPositions.create([terminal_simulator.create_position(i) for i in range(50)])
+    symbols = [terminal_simulator.create_symbol_info(i) for i in range(500)]
+    order_send_result = terminal_simulator.create_order_send_result()
+    order_check_result = terminal_simulator.create_order_check_result()
+    deals = MetaTraderDeals.create([terminal_simulator.create_deal(i) for i in range(20000)])
+    orders = [terminal_simulator.create_order(i) for i in range(20000)]
+
+    return {
+        '/terminal-info/version': (version, lambda: serialization.encode(version)),
+        '/account-info/get': (camel_dict(account_info), lambda: serialization.encode_camel_case(account_info)),
+        '/opened-positions/get': (list(positions), lambda: serialization.encode(positions)),
+        '/symbol-info/get-symbols': ([camel_dict(x) for x in symbols], lambda: serialization.encode_camel_case(symbols)),
+        '/symbol-info/get-symbol-info': (camel_dict(symbols[0]), lambda: serialization.encode_camel_case(symbols[0])),
+        '/position_management/update-stop-loss': (camel_dict(order_send_result), lambda: serialization.encode_camel_case(order_send_result)),
+        '/position_management/open-position': (camel_dict(order_send_result), lambda: serialization.encode_camel_case(order_send_result)),
+        '/order-check/order-calc-profit': (12.34, lambda: serialization.encode(12.34)),
+        '/order-check/order-calc-margin': (110.00000000000001, lambda: serialization.encode(110.00000000000001)),
+        '/order-check/order-check': (camel_dict(order_check_result), lambda: serialization.encode_camel_case(order_check_result)),
+        '/get-history/get-history-deals': (list(deals), lambda: serialization.encode(deals)),
+        '/get-history/get-history-orders': ([camel_dict(x) for x in orders], lambda: serialization.encode_camel_case(orders)),
+    }
+
+
+if __name__ == '__main__':
+    for route, (payload, encode) in create_payloads().items():
+        golden = jsonpickle.encode(payload, unpicklable=False)
+        number = max(1, 20000 // len(golden))
+        old = min(timeit.repeat(lambda: jsonpickle.encode(payload, unpicklable=False), number=number, repeat=repeats)) / number
+        new = min(timeit.repeat(encode, number=number, repeat=repeats)) / number
+
+        print(f'{route:<42} {len(golden):>10} bytes: jsonpickle {old * 1000:9.3f} ms, serialization {new * 1000:9.3f} ms, x{old / new:.1f}')
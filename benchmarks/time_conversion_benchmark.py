@@ -0,0 +1,63 @@
+# Преобразования времени: прежние реализации (datetime с заменой часового пояса, numpy.datetime_as_string, dateutil)
+# против metatrader.time_conversion. Перед замером сверяются результаты.
+# Запуск из корня проекта: python -m benchmarks.time_conversion_benchmark
+import timeit
+from datetime import datetime, UTC, timezone, timedelta
+
+import numpy
+from dateutil.parser import parse
+
+from metatrader import time_conversion
+from metatrader.terminal_simulator import create_rates
+
+values_count = 1000000
+rows_count = 100000
+request_dates = ['2024-03-01T00:00:00Z', '2024-03-01T12:30:00+00:00', '2024-03-01T12:30:00.250000+00:00']
+repeats = 5
+
+
+def legacy_unix_time_to_datetime(unix_time: int) -> datetime:
+    date_time = datetime.fromtimestamp(unix_time, UTC)
+    return date_time.replace(tzinfo=timezone(timedelta(hours=3))).astimezone(UTC)
+
+
+def legacy_unix_times_to_iso_strings(unix_times: numpy.ndarray) -> numpy.ndarray:
+    date_times = numpy.datetime_as_string((unix_times.astype('int64') - 3 * 60 * 60).astype('datetime64[s]'), unit='s')
+    return numpy.char.add(date_times, '+00:00')
+
+
+def legacy_datetime_str_to_unix_time(date_time_str: str) -> int:
+    date_time = parse(date_time_str)
+    return int(date_time.replace(tzinfo=timezone(timedelta(hours=-3))).timestamp())
+
+
+def measure(name: str, legacy, current, number: int) -> None:
+    legacy_time = min(timeit.repeat(legacy, number=number, repeat=repeats)) / number
+    current_time = min(timeit.repeat(current, number=number, repeat=repeats)) / number
+
+    print(f'{name:<40} legacy {legacy_time * 1000:10.4f} ms, time_conversion {current_time * 1000:10.4f} ms, x{legacy_time / current_time:.1f}')
+
+
+if __name__ == '__main__':
+    bar_times = create_rates(values_count)['time']
+    deal_times = numpy.random.default_rng(42).integers(946684800, 1893456000, values_count)
+    row_times = bar_times[:rows_count].tolist()
+
+    for times in (bar_times, deal_times):
+        if not numpy.array_equal(legacy_unix_times_to_iso_strings(times), time_conversion.unix_times_to_iso_strings(times)):
+            raise Exception('ISO strings differ from numpy.datetime_as_string')
+
+    if list(map(legacy_unix_time_to_datetime, row_times)) != list(map(time_conversion.unix_time_to_datetime, row_times)):
+        raise Exception('datetime values differ')
+
+    if [legacy_datetime_str_to_unix_time(x) for x in request_dates] != [time_conversion.datetime_str_to_unix_time(x) for x in request_dates]:
+        raise Exception('Parsed request dates differ')
+
+    measure(f'{values_count} bar times -> ISO strings', lambda: legacy_unix_times_to_iso_strings(bar_times),
+            lambda: time_conversion.unix_times_to_iso_strings(bar_times), 1)
+    measure(f'{values_count} deal times -> ISO strings', lambda: legacy_unix_times_to_iso_strings(deal_times),
+            lambda: time_conversion.unix_times_to_iso_strings(deal_times), 1)
+    measure(f'{rows_count} times -> datetime', lambda: list(map(legacy_unix_time_to_datetime, row_times)),
+            lambda: list(map(time_conversion.unix_time_to_datetime, row_times)), 1)
+    measure('request date -> MetaTrader time', lambda: [legacy_datetime_str_to_unix_time(x) for x in request_dates],
+            lambda: [time_conversion.datetime_str_to_unix_time(x) for x in request_dates], 1000)
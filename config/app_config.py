@@ -1,3 +1,105 @@
+import os
+
 # MetaTrader
 FINAM_METATRADER_PATH = r'C:\Program Files\FINAM MetaTrader 5\terminal64.exe'
 ALPHA_FOREX_METATRADER_PATH = r'C:\Program Files\MetaTrader 5 Alfa-Forex\terminal64.exe'
+
+# Смещение часов сервера брокера от UTC: время MetaTrader приводится к UTC вычитанием смещения, даты запросов - прибавлением
+BROKER_UTC_OFFSET_SECONDS = {
+    'AlfaForex': 3 * 60 * 60,
+    'Finam': 3 * 60 * 60,
+}
+
+
+# Кэш баров
+BAR_CACHE_PATH = r'bar_cache'
+BAR_CACHE_MAX_SIZE_BYTES = 2 * 1024 ** 3
+
+# Веб-сервер и поток-владелец MetaTrader
+WAITRESS_THREADS = max(4, (os.cpu_count() or 1) * 2)
+WAITRESS_CONNECTION_LIMIT = 200
+
+# HTTP-сервер: waitress (поток на запрос и на каждый поток событий подписки) или asgi (uvicorn: соединения в цикле событий
+# asyncio, маршруты Flask - в пуле из ASGI_THREADS потоков). Можно переопределить четвертым аргументом запуска.
+# Простаивающее keep-alive соединение asgi закрывает через ASGI_KEEP_ALIVE_SECONDS, как waitress - через channel_timeout
+HTTP_SERVER = 'waitress'
+ASGI_THREADS = WAITRESS_THREADS
+ASGI_KEEP_ALIVE_SECONDS = 120
+
+MT5_QUEUE_SIZE = 100
+MT5_QUEUE_PUT_TIMEOUT_SECONDS = 30
+
+# Объединение одинаковых одновременных запросов: сколько секунд отдавать готовый ответ без обращения к терминалу
+COALESCING_TTL_SECONDS = {
+    'account-info/get': 0,
+    'opened-positions/get': 0,
+    'quotes/get-last-quotes': 0,
+}
+
+# Состояние терминала только для чтения: сколько секунд отдавать из памяти (0 - всегда из терминала).
+# Сделки самого сервиса (open/close-position, update-stop-loss(es), submit-orders) сразу сбрасывают счет и символ сделки
+TERMINAL_STATE_CACHE_TTL_SECONDS = {
+    'version': 60 * 60,
+    'terminal_info': 1,
+    'account_info': 0.5,
+    'symbol_info': 0.5,
+}
+
+# Потоковая выдача истории сделок/ордеров - размер страницы запроса к терминалу
+HISTORY_STREAM_PAGE_DAYS = 30
+
+# Справочник символов - период перечитывания статических полей из терминала
+SYMBOL_CATALOG_REFRESH_SECONDS = 15 * 60
+
+# Симулятор терминала (окружение Simulator): объем данных и задержка каждого обращения к терминалу
+SIMULATOR_ENVIRONMENT = 'Simulator'
+SIMULATOR_SYMBOLS_COUNT = 500
+SIMULATOR_POSITIONS_COUNT = 50
+SIMULATOR_HISTORY_SIZE = 20000
+SIMULATOR_BARS_COUNT = 100000
+SIMULATOR_LATENCY_SECONDS = 0.001
+
+# Локальный журнал истории сделок/ордеров. Из терминала догружается история с последней записи журнала
+# минус перекрытие. Ордер попадает в историю при исполнении, а отбирается по времени выставления - отложенные ордера
+# любого срока жизни покрывает время выставления действующих ордеров (orders_get), запоминаемое при синхронизации
+HISTORY_LEDGER_PATH = r'history_ledger'
+HISTORY_LEDGER_OVERLAP_SECONDS = {
+    'deals': 60 * 60,
+    'orders': 60 * 60,
+}
+
+# Подписки (Server-Sent Events): период опроса терминала, сколько последних баров сравнивать,
+# лимит подписчиков, очередь неотправленных событий на подписчика, период keepalive при отсутствии изменений
+SUBSCRIPTION_POLL_INTERVAL_SECONDS = 1
+SUBSCRIPTION_BARS_COUNT = 2
+SUBSCRIPTION_MAX_SUBSCRIBERS = 100
+SUBSCRIPTION_QUEUE_SIZE = 1000
+SUBSCRIPTION_KEEPALIVE_SECONDS = 15
+
+# Пул процессов с отдельными подключениями к терминалу для get-last-quotes (0 - пул выключен).
+# Через пул идут запросы не меньше чем на TERMINAL_PROCESS_POOL_MIN_SYMBOLS символов
+TERMINAL_PROCESS_POOL_SIZE = 0
+TERMINAL_PROCESS_POOL_MIN_SYMBOLS = 20
+TERMINAL_PROCESS_POOL_TASK_TIMEOUT_SECONDS = 30
+
+# Агрегация баров и индикаторы: для скольких наборов (символ, таймфрейм, интервал, индикаторы) хранить посчитанные закрытые интервалы
+AGGREGATION_CACHE_MAX_ENTRIES = 256
+# Начало расчета индикаторов - граница блока из стольких интервалов: результат зависит только от запроса,
+# запросы с date_from в одном блоке делят запись кэша, лишний расчет - не больше блока
+AGGREGATION_ANCHOR_INTERVALS = 1000
+
+# Профилирование отдельных запросов (включается во время работы через /service-info/profiler-configure):
+# каталог профилей, сколько последних профилей хранить, период снимков стека
+PROFILER_PATH = r'request_profiles'
+PROFILER_MAX_PROFILES = 200
+PROFILER_INTERVAL_SECONDS = 0.005
+
+# Переподключение к терминалу в фоне: задержка перед повторной попыткой удваивается от начальной до максимальной
+RECONNECT_INITIAL_BACKOFF_SECONDS = 1
+RECONNECT_MAX_BACKOFF_SECONDS = 60
+
+# Индекс открытых позиций (изменение стоп-лоссов): сколько секунд снимок positions_get считается актуальным
+POSITION_INDEX_REFRESH_SECONDS = 1
+
+# Локальный расчет маржи и прибыли по сетке объемов и цен: сколько точек сетки сверять с order_calc_* терминала при verify
+ORDER_CALC_VERIFY_SAMPLES = 10
@@ -0,0 +1,197 @@
+import math
+import threading
+from collections import OrderedDict
+
+import numpy
+
+from metatrader.models.metatrader_quote import rates_dtype, empty_rates
+
+# Индикатор: (тип, период, поле бара). Типы: sma, ema, atr, channel (максимум high / минимум low за период)
+indicator_types = ('sma', 'ema', 'atr', 'channel')
+price_fields = ('open', 'high', 'low', 'close')
+
+
+def resample(rates: numpy.ndarray, interval_seconds: int) -> numpy.ndarray:
+    """Бары по возрастанию времени -> бары длительностью interval_seconds (границы кратны интервалу от 1970-01-01)"""
+    if len(rates) == 0:
+        return empty_rates
+
+    buckets = rates['time'] // interval_seconds
+    starts = numpy.flatnonzero(numpy.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = numpy.concatenate((starts[1:], [len(rates)])) - 1
+
+    result = numpy.empty(len(starts), dtype=rates_dtype)
+    result['time'] = buckets[starts] * interval_seconds
+    result['open'] = rates['open'][starts]
+    result['high'] = numpy.maximum.reduceat(rates['high'], starts)
+    result['low'] = numpy.minimum.reduceat(rates['low'], starts)
+    result['close'] = rates['close'][ends]
+    result['tick_volume'] = numpy.add.reduceat(rates['tick_volume'], starts)
+    result['spread'] = rates['spread'][ends]
+    result['real_volume'] = numpy.add.reduceat(rates['real_volume'], starts)
+
+    return result
+
+
+def indicator_names(indicator: tuple[str, int, str]) -> list[str]:
+    indicator_type, period, field = indicator
+    suffix = '' if field == 'close' else field.capitalize()
+
+    if indicator_type == 'channel':
+        return [f'channelHigh{period}', f'channelLow{period}']
+
+    if indicator_type == 'atr':
+        return [f'atr{period}']
+
+    return [f'{indicator_type}{suffix}{period}']
+
+
+def compute_indicator(indicator: tuple[str, int, str], bars: numpy.ndarray, previous_bars: numpy.ndarray,
+                      previous_values: list[numpy.ndarray]) -> list[numpy.ndarray]:
+    """
+    Значения индикатора для bars, продолжающих уже посчитанные previous_bars (previous_values - их значения).
+    Оконным индикаторам нужны последние period - 1 предыдущих баров, экспоненциальным - значения предыдущих баров.
+    Значения начинаются с бара номер period: у sma и channel - полное окно, ema и atr начинаются со среднего за period баров.
+    """
+    indicator_type, period, field = indicator
+
+    if indicator_type == 'sma':
+        return [__rolling_mean__(__with_history__(previous_bars[field], bars[field], period), period, len(bars))]
+
+    if indicator_type == 'channel':
+        return [__rolling_extremum__(__with_history__(previous_bars['high'], bars['high'], period), period, numpy.max, len(bars)),
+                __rolling_extremum__(__with_history__(previous_bars['low'], bars['low'], period), period, numpy.min, len(bars))]
+
+    if indicator_type in ('ema', 'atr'):
+        # Сглаживание Уайлдера у atr - EMA с коэффициентом 1 / period
+        alpha = 2 / (period + 1) if indicator_type == 'ema' else 1 / period
+
+        # Пока баров меньше периода, значений еще нет - ряд считается заново вместе с предыдущими барами
+        if len(previous_bars) < period:
+            series = __exponential_series__(indicator_type, field, numpy.concatenate((previous_bars, bars)), empty_rates)
+            return [__exponential_mean__(series, alpha, period)[len(previous_bars):]]
+
+        # Продолжение - с начала текущего блока расчета от сохраненного значения перед ним: те же операции, что и при
+        # расчете всего ряда сразу, поэтому результат не зависит от того, на каких барах расчет прерывался
+        block_start = period + (len(previous_bars) - period) // __block_size__(alpha) * __block_size__(alpha)
+        series = __exponential_series__(indicator_type, field, numpy.concatenate((previous_bars[block_start:], bars)),
+                                        previous_bars[block_start - 1:block_start])
+
+        return [__exponential_mean__(series, alpha, period, previous_values[0][block_start - 1])[len(previous_bars) - block_start:]]
+
+    raise Exception(f'Unknown indicator \'{indicator_type}\'')
+
+
+class AggregationCache:
+    """
+    Закрытые агрегированные бары и значения индикаторов по символу, таймфрейму, интервалу, набору индикаторов и началу расчета.
+    Начало расчета - граница блока из anchor_intervals интервалов: запросы с date_from в одном блоке делят запись.
+    Повторный запрос пересчитывает только бары, закрывшиеся после закэшированных, и формирующийся бар.
+    """
+
+    def __init__(self, max_entries: int, anchor_intervals: int):
+        self.max_entries = max_entries
+        self.anchor_intervals = anchor_intervals
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[tuple, tuple[numpy.ndarray, dict[tuple, list[numpy.ndarray]]]] = OrderedDict()
+
+    def get(self, key: tuple) -> tuple[numpy.ndarray, dict[tuple, list[numpy.ndarray]]] | None:
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is not None:
+                self.entries.move_to_end(key)
+
+            return entry
+
+    def put(self, key: tuple, bars: numpy.ndarray, values: dict[tuple, list[numpy.ndarray]]) -> None:
+        with self.lock:
+            entry = self.entries.get(key)
+
+            # При одновременных запросах остается более длинный результат
+            if entry is None or len(entry[0]) <= len(bars):
+                self.entries[key] = (bars, values)
+                self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+# region private
+def __with_history__(previous: numpy.ndarray, values: numpy.ndarray, period: int) -> numpy.ndarray:
+    return numpy.concatenate((previous[len(previous) - min(len(previous), period - 1):], values))
+
+
+def __rolling_mean__(values: numpy.ndarray, period: int, new_count: int) -> numpy.ndarray:
+    # values - до period - 1 баров истории и new_count новых баров; результат - только для новых баров.
+    # Каждое окно суммируется отдельно (не через накопленную сумму), поэтому значение не зависит от начала values
+    result = numpy.full(len(values), numpy.nan)
+
+    if len(values) >= period:
+        result[period - 1:] = numpy.lib.stride_tricks.sliding_window_view(values, period).sum(axis=1) / period
+
+    return result[len(values) - new_count:]
+
+
+def __rolling_extremum__(values: numpy.ndarray, period: int, reduce, new_count: int) -> numpy.ndarray:
+    result = numpy.full(len(values), numpy.nan)
+
+    if len(values) >= period:
+        result[period - 1:] = reduce(numpy.lib.stride_tricks.sliding_window_view(values, period), axis=1)
+
+    return result[len(values) - new_count:]
+
+
+def __exponential_series__(indicator_type: str, field: str, bars: numpy.ndarray, previous_bars: numpy.ndarray) -> numpy.ndarray:
+    if indicator_type == 'ema':
+        return bars[field].astype('float64')
+
+    # Истинный диапазон; у самого первого бара вместо предыдущего закрытия - его собственное
+    first_close = previous_bars['close'][-1:] if len(previous_bars) > 0 else bars['close'][:1]
+    previous_close = numpy.concatenate((first_close, bars['close'][:-1]))
+
+    return numpy.maximum(bars['high'], previous_close) - numpy.minimum(bars['low'], previous_close)
+
+
+def __exponential_mean__(values: numpy.ndarray, alpha: float, period: int, seed: float | None = None) -> numpy.ndarray:
+    """
+    y[i] = y[i - 1] + alpha * (x[i] - y[i - 1]), y[-1] = seed. Без seed первое значение - среднее первых period значений
+    (как у ATR Уайлдера и EMA в TA-Lib), до него значений нет.
+    Считается блоками от начала values: внутри блока - через степени (1 - alpha) в закрытой форме, длина блока
+    ограничена, чтобы (1 - alpha) ** -length не переполнялось.
+    """
+    if seed is None:
+        result = numpy.full(len(values), numpy.nan)
+
+        if len(values) >= period:
+            result[period - 1] = numpy.mean(values[:period])
+            result[period:] = __exponential_mean__(values[period:], alpha, period, result[period - 1])
+
+        return result
+
+    if len(values) == 0:
+        return numpy.empty(0)
+
+    if alpha >= 1:
+        return values.astype('float64')
+
+    decay = 1 - alpha
+    block_size = __block_size__(alpha)
+
+    result = numpy.empty(len(values))
+    previous = float(seed)
+
+    for start in range(0, len(values), block_size):
+        block = values[start:start + block_size]
+        powers = decay ** numpy.arange(1, len(block) + 1)
+        weighted_sum = numpy.cumsum(alpha * block / powers)
+
+        result[start:start + len(block)] = powers * (previous + weighted_sum)
+        previous = result[start + len(block) - 1]
+
+    return result
+
+def __block_size__(alpha: float) -> int:
+    return max(1, int(150 * math.log(10) / -math.log(1 - alpha)))
+
+# endregion
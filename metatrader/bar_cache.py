@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from logging import Logger
+from urllib.parse import quote
+
+import numpy
+
+from metatrader.models.metatrader_quote import rates_dtype, empty_rates
+
+
+class BarCache:
+    """
+    Локальное хранилище закрытых баров по (символ, таймфрейм).
+
+    Каждый ключ - файл из записей фиксированной длины (rates_dtype) по возрастанию времени,
+    читается через memory-map. Формирующийся бар в хранилище никогда не попадает.
+    При превышении max_size_bytes удаляются давно не использованные файлы.
+    """
+
+    def __init__(self, directory: str, max_size_bytes: int, logger: Logger):
+        self.logger = logger
+        self.directory = directory
+        self.max_size_bytes = max_size_bytes
+
+        self.lock = threading.RLock()
+        self.last_access: dict[str, float] = {}
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        for file_name in os.listdir(self.directory):
+            path = os.path.join(self.directory, file_name)
+            self.last_access[path] = os.path.getmtime(path)
+
+    # region Read
+    def length(self, symbol: str, timeframe: str) -> int:
+        with self.lock:
+            path = self.__touch__(symbol, timeframe)
+            return os.path.getsize(path) // rates_dtype.itemsize if os.path.exists(path) else 0
+
+    def first(self, symbol: str, timeframe: str) -> numpy.ndarray:
+        with self.lock:
+            return self.__read__(symbol, timeframe, lambda bars: bars[:1])
+
+    def last(self, symbol: str, timeframe: str) -> numpy.ndarray:
+        with self.lock:
+            return self.__read__(symbol, timeframe, lambda bars: bars[-1:])
+
+    def tail(self, symbol: str, timeframe: str, count: int) -> numpy.ndarray:
+        if count <= 0:
+            return empty_rates
+
+        with self.lock:
+            return self.__read__(symbol, timeframe, lambda bars: bars[-count:])
+
+    def between(self, symbol: str, timeframe: str, date_from: int, date_to: int) -> numpy.ndarray:
+        def select(bars: numpy.ndarray) -> numpy.ndarray:
+            times = bars['time']
+            return bars[numpy.searchsorted(times, date_from, 'left'):numpy.searchsorted(times, date_to, 'right')]
+
+        with self.lock:
+            return self.__read__(symbol, timeframe, select)
+
+    # endregion
+
+    # region Write
+    def store(self, symbol: str, timeframe: str, bars: numpy.ndarray) -> None:
+        with self.lock:
+            path = self.__touch__(symbol, timeframe)
+            self.__write__(path, bars)
+            self.__evict__(path)
+
+    def append(self, symbol: str, timeframe: str, bars: numpy.ndarray) -> None:
+        if len(bars) == 0:
+            return
+
+        with self.lock:
+            path = self.__touch__(symbol, timeframe)
+
+            with open(path, 'ab') as file:
+                file.write(bars.astype(rates_dtype).tobytes())
+
+            self.__evict__(path)
+
+    def prepend(self, symbol: str, timeframe: str, bars: numpy.ndarray) -> None:
+        if len(bars) == 0:
+            return
+
+        with self.lock:
+            path = self.__touch__(symbol, timeframe)
+            cached = self.__read__(symbol, timeframe, lambda x: x)
+            self.__write__(path, numpy.concatenate([bars.astype(rates_dtype), cached]))
+            self.__evict__(path)
+
+    def invalidate(self, symbol: str, timeframe: str) -> None:
+        with self.lock:
+            path = self.__path__(symbol, timeframe)
+
+            if os.path.exists(path):
+                os.remove(path)
+
+            self.last_access.pop(path, None)
+            self.logger.info("Кэш баров {symbol} {timeframe} сброшен", symbol=symbol, timeframe=timeframe)
+
+    # endregion
+
+    # region private
+    def __path__(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self.directory, f'{quote(symbol, safe="")}_{timeframe}.rates')
+
+    def __touch__(self, symbol: str, timeframe: str) -> str:
+        path = self.__path__(symbol, timeframe)
+        self.last_access[path] = time.time()
+        return path
+
+    def __read__(self, symbol: str, timeframe: str, select) -> numpy.ndarray:
+        path = self.__touch__(symbol, timeframe)
+
+        if not os.path.exists(path) or os.path.getsize(path) < rates_dtype.itemsize:
+            return empty_rates
+
+        bars = numpy.memmap(path, dtype=rates_dtype, mode='r')
+
+        try:
+            # Копируем, чтобы не держать отображение файла (под Windows его нельзя будет перезаписать)
+            return numpy.array(select(bars))
+        finally:
+            del bars
+
+    def __write__(self, path: str, bars: numpy.ndarray) -> None:
+        temp_path = path + '.tmp'
+
+        with open(temp_path, 'wb') as file:
+            file.write(bars.astype(rates_dtype).tobytes())
+
+        os.replace(temp_path, path)
+
+    def __evict__(self, current_path: str) -> None:
+        sizes = {path: os.path.getsize(path) for path in self.last_access if os.path.exists(path)}
+        total_size = sum(sizes.values())
+
+        for path in sorted(sizes, key=lambda x: self.last_access[x]):
+            if total_size <= self.max_size_bytes:
+                break
+
+            # Текущий файл нужен для ответа на запрос - он будет вытеснен позже
+            if path == current_path:
+                continue
+
+            os.remove(path)
+            self.last_access.pop(path, None)
+            total_size -= sizes[path]
+
+            self.logger.info("Файл кэша баров {path} удален по превышению размера", path=path)
+
+    # endregion
@@ -0,0 +1,108 @@
+import random
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime, UTC
+from logging import Logger
+
+from auxiliary import metrics
+
+
+class TerminalUnavailableError(Exception):
+    pass
+
+
+class ConnectionSupervisor:
+    """
+    Переподключение к терминалу в фоне с экспоненциальной задержкой между попытками.
+
+    Пока соединения нет (цепь разомкнута), обращения к терминалу сразу завершаются TerminalUnavailableError,
+    а не встают в очередь за запуском терминала. Первая попытка - сразу после обрыва, дальше задержка удваивается
+    от initial_backoff_seconds до max_backoff_seconds со случайным разбросом. Удачное подключение замыкает цепь.
+    connect выполняется в потоке-владельце MetaTrader и при неудаче бросает исключение с ошибкой терминала.
+    """
+
+    def __init__(self, connect: Callable[[], None], initial_backoff_seconds: float, max_backoff_seconds: float, logger: Logger):
+        self.connect = connect
+        self.initial_backoff_seconds = initial_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.logger = logger
+
+        self.lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+
+        self.connected = True
+        self.last_error = ''
+        self.disconnected_at: float | None = None
+        self.next_attempt_at: float | None = None
+        self.attempts = 0
+        self.reconnects = 0
+
+    def is_available(self) -> bool:
+        return self.connected
+
+    def ensure_available(self) -> None:
+        if not self.connected:
+            metrics.terminal_rejected_total.increment()
+            raise TerminalUnavailableError(f'Терминал недоступен ({self.last_error}), идет переподключение, попытка {self.attempts}')
+
+    def report_disconnect(self, error) -> None:
+        with self.lock:
+            if not self.connected:
+                return
+
+            self.connected = False
+            self.last_error = f'{error}'
+            self.disconnected_at = time.time()
+            self.attempts = 0
+
+            self.thread = threading.Thread(target=self.__run__, name='mt5-reconnect', daemon=True)
+            self.thread.start()
+
+        self.logger.error("Соединение с терминалом потеряно - {error}, запросы отклоняются до переподключения", error=error)
+
+    def health(self) -> dict:
+        with self.lock:
+            now = time.time()
+
+            return {'status': 'connected' if self.connected else 'reconnecting',
+                    'lastError': self.last_error,
+                    'disconnectedAt': None if self.connected or self.disconnected_at is None else datetime.fromtimestamp(self.disconnected_at, UTC).isoformat(),
+                    'reconnectAttempts': self.attempts,
+                    'nextAttemptInSeconds': None if self.connected or self.next_attempt_at is None else max(0.0, self.next_attempt_at - now),
+                    'reconnects': self.reconnects}
+
+    # region private
+    def __run__(self) -> None:
+        while True:
+            with self.lock:
+                self.attempts += 1
+                self.next_attempt_at = None
+
+            metrics.terminal_reconnect_attempts_total.increment()
+
+            try:
+                self.connect()
+            except Exception as e:
+                # Задержка растет вдвое, случайный разброс разводит попытки нескольких экземпляров сервиса
+                delay = min(self.max_backoff_seconds, self.initial_backoff_seconds * 2 ** (self.attempts - 1)) * random.uniform(0.5, 1.0)
+
+                with self.lock:
+                    self.last_error = f'{e}'
+                    self.next_attempt_at = time.time() + delay
+
+                self.logger.warning("Попытка переподключения к терминалу {attempt} не удалась - {error}, следующая через {delay} с",
+                                    attempt=self.attempts, error=e, delay=round(delay, 1))
+                time.sleep(delay)
+                continue
+
+            with self.lock:
+                self.connected = True
+                self.reconnects += 1
+                self.thread = None
+
+            metrics.terminal_reconnects_total.increment()
+            self.logger.info("Соединение с терминалом восстановлено, попыток - {attempts}", attempts=self.attempts)
+            return
+
+    # endregion
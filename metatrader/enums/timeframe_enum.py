@@ -24,3 +24,16 @@ class Metatrader5TimeframeEnum(enum.Enum):
     TIMEFRAME_W1 = 1 | 0x8000
     TIMEFRAME_MN1 = 1 | 0xC000
 
+    @property
+    def seconds(self) -> int:
+        # Для MN1 - верхняя граница длительности месяца
+        if self.value & 0xC000 == 0xC000:
+            return 31 * 24 * 60 * 60
+
+        if self.value & 0x8000:
+            return (self.value & 0x3FFF) * 7 * 24 * 60 * 60
+
+        if self.value & 0x4000:
+            return (self.value & 0x3FFF) * 60 * 60
+
+        return self.value * 60
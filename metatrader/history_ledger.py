@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from logging import Logger
+
+# Таблицы журнала: имя -> поле времени, по которому терминал отбирает записи истории
+time_fields = {
+    'deals': 'time',
+    'orders': 'time_setup',
+}
+
+# Имена типов записей - как у именованных кортежей MetaTrader5
+record_type_names = {
+    'deals': 'TradeDeal',
+    'orders': 'TradeOrder',
+}
+
+
+class HistoryLedger:
+    """
+    Локальный журнал истории сделок и ордеров в SQLite, ключ - тикет.
+
+    Столбцы таблицы повторяют поля именованного кортежа MetaTrader5 и создаются при первой записи.
+    Отметка синхронизации (high-water mark) - наибольшее время записи в таблице:
+    из терминала догружаются только записи начиная с нее за вычетом overlap_seconds[таблица].
+    Ордер попадает в историю при исполнении или снятии, а отбирается по времени выставления, поэтому для ордеров
+    запоминается и самое раннее время выставления действующих ордеров (active_since): ордер, который был
+    действующим при прошлой синхронизации, попадет в следующую, как бы давно он ни был выставлен.
+    """
+
+    def __init__(self, path: str, overlap_seconds: dict[str, int], logger: Logger):
+        self.logger = logger
+        self.path = path
+        self.overlap_seconds = overlap_seconds
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        self.connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+
+        self.connection.execute('CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, value INTEGER)')
+
+        self.record_types: dict[str, type] = {}
+
+        for table in time_fields:
+            self.__load_record_type__(table)
+
+    # region Read
+    def high_water_mark(self, table: str) -> int | None:
+        if table not in self.record_types:
+            return None
+
+        with self.lock:
+            return self.connection.execute(f'SELECT MAX("{time_fields[table]}") FROM {table}').fetchone()[0]
+
+    def sync_date_from(self, table: str, active_since: int | None = None) -> int:
+        """
+        С какого времени запрашивать историю у терминала, 0 - журнал пуст.
+        active_since - самое раннее время выставления ордеров, действующих сейчас
+        """
+        high_water_mark = self.high_water_mark(table)
+
+        if high_water_mark is None:
+            return 0
+
+        date_from = high_water_mark - self.overlap_seconds[table]
+
+        for value in (self.active_since(table), active_since):
+            if value is not None:
+                date_from = min(date_from, value)
+
+        return max(0, date_from)
+
+    def active_since(self, table: str) -> int | None:
+        """Самое раннее время выставления ордеров, действовавших при прошлой синхронизации"""
+        with self.lock:
+            row = self.connection.execute('SELECT value FROM sync_state WHERE name = ?', (f'{table}_active_since',)).fetchone()
+
+        return None if row is None else row[0]
+
+    def is_compatible(self, table: str, fields: tuple[str, ...]) -> bool:
+        """Совпадают ли поля журнала с полями записей терминала (пустой журнал совместим с любыми)"""
+        record_type = self.record_types.get(table)
+        return record_type is None or record_type._fields == fields
+
+    def between(self, table: str, date_from: int, date_to: int) -> list[tuple]:
+        time_field = time_fields[table]
+        return self.__select__(table, f'"{time_field}" BETWEEN ? AND ? ORDER BY "{time_field}", ticket', (date_from, date_to))
+
+    def since(self, table: str, since_ticket: int | None, since_time: int | None) -> list[tuple]:
+        """Записи с тикетом больше since_ticket и (или) временем не раньше since_time, по возрастанию тикета"""
+        conditions = []
+        parameters = []
+
+        if since_ticket is not None:
+            conditions.append('ticket > ?')
+            parameters.append(since_ticket)
+
+        if since_time is not None:
+            conditions.append(f'"{time_fields[table]}" >= ?')
+            parameters.append(since_time)
+
+        if len(conditions) == 0:
+            raise Exception('Не указан ни тикет, ни время, с которых нужны изменения')
+
+        return self.__select__(table, ' AND '.join(conditions) + ' ORDER BY ticket', tuple(parameters))
+
+    # endregion
+
+    # region Write
+    def store(self, table: str, records: tuple | list, active_since: int | None = None) -> None:
+        # active_since записывается в той же транзакции, что и записи: следующая синхронизация начнется не позже него
+        with self.lock:
+            if len(records) > 0:
+                fields = type(records[0])._fields
+                record_type = self.record_types.get(table)
+
+                if record_type is None or record_type._fields != fields:
+                    self.__create_table__(table, fields)
+
+            self.connection.execute('BEGIN')
+
+            try:
+                if len(records) > 0:
+                    placeholders = ', '.join('?' * len(fields))
+                    self.connection.executemany(f'INSERT OR REPLACE INTO {table} VALUES ({placeholders})', records)
+
+                if active_since is None:
+                    self.connection.execute('DELETE FROM sync_state WHERE name = ?', (f'{table}_active_since',))
+                else:
+                    self.connection.execute('INSERT OR REPLACE INTO sync_state VALUES (?, ?)', (f'{table}_active_since', active_since))
+
+                self.connection.execute('COMMIT')
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+
+    # endregion
+
+    # region private
+    def __select__(self, table: str, condition: str, parameters: tuple) -> list[tuple]:
+        record_type = self.record_types.get(table)
+
+        if record_type is None:
+            return []
+
+        with self.lock:
+            cursor = self.connection.cursor()
+            cursor.row_factory = lambda _, row: record_type._make(row)
+
+            return cursor.execute(f'SELECT * FROM {table} WHERE {condition}', parameters).fetchall()
+
+    def __create_table__(self, table: str, fields: tuple[str, ...]) -> None:
+        # Набор полей у MetaTrader5 поменялся (или таблицы еще нет) - журнал этой таблицы собирается заново
+        if table in self.record_types:
+            self.logger.warning("Поля {table} в терминале изменились, журнал истории будет загружен заново", table=table)
+
+        columns = ', '.join(f'"{field}" PRIMARY KEY' if field == 'ticket' else f'"{field}"' for field in fields)
+
+        self.connection.execute(f'DROP TABLE IF EXISTS {table}')
+        self.connection.execute(f'CREATE TABLE {table} ({columns})')
+        self.connection.execute(f'CREATE INDEX {table}_time ON {table} ("{time_fields[table]}")')
+
+        self.record_types[table] = self.__create_record_type__(table, fields)
+
+    def __load_record_type__(self, table: str) -> None:
+        fields = tuple(x[1] for x in self.connection.execute(f'PRAGMA table_info({table})').fetchall())
+
+        if len(fields) > 0:
+            self.record_types[table] = self.__create_record_type__(table, fields)
+
+    @staticmethod
+    def __create_record_type__(table: str, fields: tuple[str, ...]) -> type:
+        return namedtuple(record_type_names[table], fields)
+
+    # endregion
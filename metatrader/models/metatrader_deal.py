@@ -1,12 +1,11 @@
 from dataclasses import dataclass
 from datetime import datetime
 
-from MetaTrader5 import TradeDeal
+from metatrader.time_conversion import unix_time_to_datetime
+from metatrader.models.record_table import RecordTable
 
-from metatrader.auxiliary import unix_time_to_datetime
 
-
-@dataclass
+@dataclass(slots=True)
 class MetaTraderDeal:
     ticket: int
     order: int
@@ -27,7 +26,7 @@ class MetaTraderDeal:
     externalId: str
 
     @staticmethod
-    def create(metatrader_deal: TradeDeal) -> 'MetaTraderDeal':
+    def create(metatrader_deal: tuple) -> 'MetaTraderDeal':
         return MetaTraderDeal(
             ticket=metatrader_deal.ticket,
             order=metatrader_deal.order,
@@ -47,3 +46,9 @@ class MetaTraderDeal:
             comment=metatrader_deal.comment,
             externalId=metatrader_deal.external_id
         )
+
+
+class MetaTraderDeals(RecordTable):
+    row_type = MetaTraderDeal
+    source_fields = ('ticket', 'order', 'time', 'type', 'entry', 'magic', 'reason', 'position_id', 'volume', 'price',
+                     'commission', 'swap', 'profit', 'fee', 'symbol', 'comment', 'external_id')
@@ -1,10 +1,11 @@
 from dataclasses import dataclass
 from datetime import datetime
 
-from metatrader.auxiliary import unix_time_to_datetime
+from metatrader.time_conversion import unix_time_to_datetime
+from metatrader.models.record_table import RecordTable
 
 
-@dataclass
+@dataclass(slots=True)
 class MetaTraderOpenedPosition:
     ticket: int
     time: datetime
@@ -43,3 +44,9 @@ class MetaTraderOpenedPosition:
                                         symbol=opened_position.symbol,
                                         comment=opened_position.comment,
                                         externalId=opened_position.external_id)
+
+
+class MetaTraderOpenedPositions(RecordTable):
+    row_type = MetaTraderOpenedPosition
+    source_fields = ('ticket', 'time', 'time_update', 'type', 'magic', 'identifier', 'reason', 'volume', 'price_open', 'sl', 'tp',
+                     'price_current', 'swap', 'profit', 'symbol', 'comment', 'external_id')
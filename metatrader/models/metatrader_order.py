@@ -0,0 +1,33 @@
+from typing import NamedTuple
+
+
+class MetaTraderOrder(NamedTuple):
+    """
+    Поля ордера истории (TradeOrder модуля MetaTrader5) с типами: ордера отдаются именованными кортежами терминала,
+    по этому типу строятся столбцы, когда ордеров нет
+    """
+
+    ticket: int
+    time_setup: int
+    time_setup_msc: int
+    time_done: int
+    time_done_msc: int
+    time_expiration: int
+    type: int
+    type_time: int
+    type_filling: int
+    state: int
+    magic: int
+    position_id: int
+    position_by_id: int
+    reason: int
+    volume_initial: float
+    volume_current: float
+    price_open: float
+    sl: float
+    tp: float
+    price_current: float
+    price_stoplimit: float
+    symbol: str
+    comment: str
+    external_id: str
@@ -1,10 +1,18 @@
 from dataclasses import dataclass
 from datetime import datetime
 
-from metatrader.auxiliary import unix_time_to_datetime
+import numpy
 
+from metatrader.time_conversion import unix_time_to_datetime
+from metatrader.models.record_table import RecordTable
 
-@dataclass
+# Структура массива, который возвращают copy_rates_from_pos / copy_rates_range
+rates_dtype = numpy.dtype([('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+                           ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')])
+empty_rates = numpy.empty(0, dtype=rates_dtype)
+
+
+@dataclass(slots=True)
 class Quote:
     date: datetime
     open: float
@@ -20,3 +28,13 @@ class Quote:
             high=float(data[2]),
             low=float(data[3]),
             close=float(data[4]))
+
+
+class Quotes(RecordTable):
+    row_type = Quote
+    source_fields = ('time', 'open', 'high', 'low', 'close')
+
+    @staticmethod
+    def from_rates(rates: numpy.ndarray) -> 'Quotes':
+        # Столбцы - представления массива баров терминала, без копирования
+        return Quotes({name: rates[field] for name, field in zip(Quotes.fields, Quotes.source_fields)}, len(rates))
@@ -0,0 +1,25 @@
+from dataclasses import dataclass, field
+
+# Виды приказов пакета: open - новая позиция, close - закрытие позиций по символу, modify - новый стоп-лосс позиции
+instruction_types = ('open', 'close', 'modify')
+
+
+@dataclass(slots=True)
+class OrderInstruction:
+    type: str
+    symbol: str | None = None
+    action: str | None = None
+    volume: float | None = None
+    stop_loss: float | None = None
+    identifier: int | None = None
+
+
+@dataclass(slots=True)
+class OrderInstructionResult:
+    instruction: OrderInstruction
+    # Результаты order_check: по одному на запрос, у close - по запросу на каждую позицию символа
+    checks: list[tuple] = field(default_factory=list)
+    result: tuple | bool | None = None
+    error: Exception | None = None
+    check_seconds: float = 0.0
+    send_seconds: float = 0.0
@@ -0,0 +1,72 @@
+import dataclasses
+from collections.abc import Iterator
+from datetime import datetime
+
+import numpy
+
+from metatrader.time_conversion import unix_time_to_datetime
+
+# Тип поля модели -> тип столбца. Время хранится как есть (unix-время MetaTrader), строки - фиксированной ширины
+column_dtypes = {int: 'int64', float: 'float64', str: 'str', datetime: 'int64'}
+
+
+class RecordTable:
+    """
+    Записи терминала по столбцам (struct of arrays): numpy-массив на каждое поле модели row_type вместо объекта на запись.
+
+    Объект модели (строка) создается только при обращении по индексу или переборе, datetime - только для полей строки.
+    Срез - таблица из представлений тех же столбцов, без копирования.
+    source_fields - поля именованного кортежа MetaTrader5 в порядке полей модели
+    """
+
+    row_type: type
+    source_fields: tuple[str, ...]
+
+    fields: tuple[str, ...]
+    time_fields: frozenset[str]
+    dtypes: dict[str, str]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        model_fields = dataclasses.fields(cls.row_type)
+        cls.fields = tuple(x.name for x in model_fields)
+        cls.time_fields = frozenset(x.name for x in model_fields if x.type is datetime)
+        cls.dtypes = {x.name: column_dtypes[x.type] for x in model_fields}
+
+    def __init__(self, columns: dict[str, numpy.ndarray], length: int):
+        self.columns = columns
+        self.length = length
+
+    @classmethod
+    def create(cls, records: tuple | list) -> 'RecordTable':
+        # Именованные кортежи терминала -> столбцы: zip(*records) транспонирует записи за один проход на C
+        if len(records) == 0:
+            return cls({name: numpy.empty(0, dtype=dtype) for name, dtype in cls.dtypes.items()}, 0)
+
+        positions = [records[0]._fields.index(x) for x in cls.source_fields]
+        values = list(zip(*records))
+
+        return cls({name: numpy.array(values[position], dtype=cls.dtypes[name]) for name, position in zip(cls.fields, positions)}, len(records))
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index: int | slice):
+        if isinstance(index, slice):
+            columns = {name: column[index] for name, column in self.columns.items()}
+            return type(self)(columns, len(next(iter(columns.values()))))
+
+        values = (self.columns[name][index].item() for name in self.fields)
+        return self.row_type(*(unix_time_to_datetime(value) if name in self.time_fields else value for name, value in zip(self.fields, values)))
+
+    def __iter__(self) -> Iterator:
+        # Столбцы переводятся в объекты Python целиком (tolist), строки собираются из готовых значений
+        columns = [list(map(unix_time_to_datetime, self.columns[name].tolist())) if name in self.time_fields else self.columns[name].tolist()
+                   for name in self.fields]
+
+        return map(self.row_type, *columns)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
@@ -0,0 +1,61 @@
+import threading
+import time
+
+
+class PositionIndex:
+    """
+    Открытые позиции терминала по идентификатору и по символу - поиск позиции без перебора всех позиций.
+
+    Индекс строится из одного снимка positions_get и считается актуальным refresh_seconds, устаревший
+    перечитывается при следующем обращении. Снимок обновляется и при каждом получении всех позиций
+    (opened-positions, опрос подписок), открытие и закрытие позиций сразу делают индекс устаревшим.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.Lock()
+
+        self.loaded_at: float | None = None
+        self.by_identifier: dict[int, list[tuple]] = {}
+        self.by_symbol: dict[str, list[tuple]] = {}
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.refresh_seconds
+
+    def update(self, positions: tuple | list) -> None:
+        by_identifier: dict[int, list[tuple]] = {}
+        by_symbol: dict[str, list[tuple]] = {}
+
+        for position in positions:
+            by_identifier.setdefault(position.identifier, []).append(position)
+            by_symbol.setdefault(position.symbol, []).append(position)
+
+        with self.lock:
+            self.by_identifier = by_identifier
+            self.by_symbol = by_symbol
+            self.loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.loaded_at = None
+
+    def find(self, identifier: int) -> list[tuple]:
+        with self.lock:
+            return self.by_identifier.get(identifier, [])
+
+    def find_by_symbol(self, symbol: str) -> list[tuple]:
+        with self.lock:
+            return self.by_symbol.get(symbol, [])
+
+    def apply_stop_loss(self, identifier: int, stop_loss: float) -> None:
+        # Стоп-лосс изменен в терминале - позиция в индексе обновляется без нового снимка
+        with self.lock:
+            positions = self.by_identifier.get(identifier)
+
+            if positions is None:
+                return
+
+            self.by_identifier[identifier] = [x._replace(sl=stop_loss) for x in positions]
+
+            for symbol in {x.symbol for x in positions}:
+                self.by_symbol[symbol] = [x._replace(sl=stop_loss) if x.identifier == identifier else x for x in self.by_symbol[symbol]]
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import namedtuple
+from operator import itemgetter
+
+# Поля SymbolInfo, которые меняются в течение торговой сессии (котировки, объемы, статистика сессии).
+# Стоимость тика символов с валютой прибыли не в валюте счета (кроссы) пересчитывается по текущему курсу,
+# select и visible меняются при symbol_select и правке Market Watch
+volatile_fields = frozenset([
+    'select', 'visible', 'trade_tick_value', 'trade_tick_value_profit', 'trade_tick_value_loss',
+    'time', 'spread', 'bid', 'bidhigh', 'bidlow', 'ask', 'askhigh', 'asklow', 'last', 'lasthigh', 'lastlow',
+    'volume', 'volumehigh', 'volumelow', 'volume_real', 'volumehigh_real', 'volumelow_real',
+    'session_deals', 'session_buy_orders', 'session_sell_orders', 'session_volume', 'session_turnover',
+    'session_interest', 'session_buy_orders_volume', 'session_sell_orders_volume', 'session_open', 'session_close',
+    'session_aw', 'session_price_settlement', 'session_price_limit_min', 'session_price_limit_max',
+    'price_change', 'price_volatility', 'price_theoretical', 'price_greeks_delta', 'price_greeks_theta',
+    'price_greeks_gamma', 'price_greeks_vega', 'price_greeks_rho', 'price_greeks_omega', 'price_sensitivity',
+])
+
+
+class SymbolCatalog:
+    """
+    Справочник символов: редко меняющиеся поля SymbolInfo (digits, размер контракта, шаг объема, маржа...)
+    хранятся в памяти и перечитываются из терминала не чаще раза в refresh_seconds.
+    version увеличивается только при фактическом изменении статических полей.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.Lock()
+
+        self.version = 0
+        self.loaded_at: float | None = None
+        self.static_symbols: list[tuple] = []
+        self.static_by_name: dict[str, tuple] = {}
+
+        self.static_type: type | None = None
+        self.volatile_type: type | None = None
+        self.static_getter: itemgetter | None = None
+        self.volatile_getter: itemgetter | None = None
+
+    def snapshot(self) -> tuple[int, list[tuple]]:
+        with self.lock:
+            return self.version, self.static_symbols
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.refresh_seconds
+
+    def update(self, symbols: list[tuple]) -> bool:
+        with self.lock:
+            if len(symbols) > 0 and self.static_type is None:
+                self.__compile_projections__(type(symbols[0]))
+
+            static_symbols = [self.static_type._make(self.static_getter(x)) for x in symbols] if len(symbols) > 0 else []
+            is_changed = static_symbols != self.static_symbols
+
+            if is_changed:
+                self.static_symbols = static_symbols
+                self.static_by_name = {x.name: x for x in static_symbols}
+                self.version += 1
+
+            self.loaded_at = time.monotonic()
+            return is_changed
+
+    def to_volatile(self, symbol_info: tuple) -> tuple:
+        if self.volatile_type is None:
+            with self.lock:
+                self.__compile_projections__(type(symbol_info))
+
+        return self.volatile_type._make(self.volatile_getter(symbol_info))
+
+    def __compile_projections__(self, symbol_info_type: type) -> None:
+        if self.static_type is not None:
+            return
+
+        fields = symbol_info_type._fields
+        static_indexes = [i for i, field in enumerate(fields) if field not in volatile_fields]
+        # Имя символа - в начале изменчивой части, чтобы ее можно было сопоставить со статической
+        volatile_indexes = [fields.index('name')] + [i for i, field in enumerate(fields) if field in volatile_fields]
+
+        self.static_type = namedtuple('StaticSymbolInfo', [fields[i] for i in static_indexes])
+        self.volatile_type = namedtuple('VolatileSymbolInfo', [fields[i] for i in volatile_indexes])
+        self.static_getter = itemgetter(*static_indexes)
+        self.volatile_getter = itemgetter(*volatile_indexes)
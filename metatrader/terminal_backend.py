@@ -0,0 +1,82 @@
+import time
+from typing import Protocol
+
+import numpy
+
+from auxiliary import metrics
+
+
+class TerminalBackend(Protocol):
+    """
+    Функции и константы MetaTrader5, которыми пользуется MetaTrader5Integration.
+    Реализации: модуль MetaTrader5 (только Windows) и TerminalSimulator для профилирования и нагрузочных тестов.
+    """
+
+    TRADE_ACTION_DEAL: int
+    TRADE_ACTION_SLTP: int
+    ORDER_FILLING_RETURN: int
+
+    def initialize(self, path: str, login: int, password: str, server: str) -> bool: ...
+
+    def shutdown(self) -> None: ...
+
+    def last_error(self) -> tuple[int, str]: ...
+
+    def version(self) -> tuple | None: ...
+
+    def terminal_info(self) -> tuple | None: ...
+
+    def account_info(self) -> tuple | None: ...
+
+    def positions_get(self) -> tuple | None: ...
+
+    def orders_get(self) -> tuple | None: ...
+
+    def symbols_get(self) -> tuple | None: ...
+
+    def symbol_info(self, symbol: str) -> tuple | None: ...
+
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int) -> numpy.ndarray | None: ...
+
+    def copy_rates_range(self, symbol: str, timeframe: int, date_from: int, date_to: int) -> numpy.ndarray | None: ...
+
+    def order_send(self, request: dict) -> tuple | None: ...
+
+    def order_check(self, request: dict) -> tuple | None: ...
+
+    def order_calc_profit(self, action: int, symbol: str, volume: float, price_open: float, price_close: float) -> float | None: ...
+
+    def order_calc_margin(self, action: int, symbol: str, volume: float, price: float) -> float | None: ...
+
+    def history_deals_get(self, date_from: int, date_to: int) -> tuple | None: ...
+
+    def history_orders_get(self, date_from: int, date_to: int) -> tuple | None: ...
+
+    def Close(self, symbol: str) -> bool | None: ...
+
+
+class InstrumentedTerminal:
+    """
+    Обертка над терминалом, замеряющая каждый вызов функции MetaTrader5 (метрика mt5_terminal_call_seconds).
+    Обертка функции создается при первом обращении и сохраняется в атрибутах, константы читаются напрямую
+    """
+
+    def __init__(self, terminal: TerminalBackend):
+        self.terminal = terminal
+
+    def __getattr__(self, name: str):
+        value = getattr(self.terminal, name)
+
+        if not callable(value):
+            return value
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+
+            try:
+                return value(*args, **kwargs)
+            finally:
+                metrics.observe_terminal_call(name, time.perf_counter() - started)
+
+        setattr(self, name, timed)
+        return timed
@@ -1,35 +1,74 @@
 # pyre-strict
+import time
 import traceback
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
 from logging import Logger
 
-import MetaTrader5 as mt5
+import numpy
 from numpy import number
 
-from metatrader.models.metatrader_deal import MetaTraderDeal
-from metatrader.models.metatrader_opened_position import MetaTraderOpenedPosition
-from metatrader.models.metatrader_quote import Quote
+from auxiliary import metrics
+from metatrader import bar_aggregation, trade_calculator
+from metatrader.bar_aggregation import AggregationCache
+from metatrader.bar_cache import BarCache
+from metatrader.connection_supervisor import ConnectionSupervisor, TerminalUnavailableError
+from metatrader.history_ledger import HistoryLedger
+from metatrader.position_index import PositionIndex
+from metatrader.symbol_catalog import SymbolCatalog
+from metatrader.terminal_backend import TerminalBackend, InstrumentedTerminal
+from metatrader.terminal_process_pool import TerminalProcessPool
+from metatrader.terminal_state_cache import TerminalStateCache
+from metatrader.terminal_worker import TerminalWorker
+from metatrader.models.metatrader_deal import MetaTraderDeals
+from metatrader.models.metatrader_opened_position import MetaTraderOpenedPositions
+from metatrader.models.metatrader_quote import Quotes, empty_rates
+from metatrader.models.order_instruction import OrderInstruction, OrderInstructionResult
 from metatrader.enums.order_type_enum import Metatrader5OrderTypeEnum
 from metatrader.enums.timeframe_enum import Metatrader5TimeframeEnum
 
 
 class MetaTrader5Integration:
-    def __init__(self, metatrader_path: str, login: int, password: str, server: str, logger: Logger):
+    def __init__(self, metatrader_path: str, login: int, password: str, server: str, logger: Logger,
+                 bar_cache: BarCache | None = None, terminal_worker: TerminalWorker | None = None,
+                 symbol_catalog: SymbolCatalog | None = None, terminal: TerminalBackend | None = None,
+                 history_ledger: HistoryLedger | None = None, terminal_process_pool: TerminalProcessPool | None = None,
+                 terminal_process_pool_min_symbols: int = 20, aggregation_cache: AggregationCache | None = None,
+                 reconnect_initial_backoff_seconds: float = 1, reconnect_max_backoff_seconds: float = 60,
+                 position_index: PositionIndex | None = None, state_cache: TerminalStateCache | None = None):
+        if terminal is None:
+            # Модуль MetaTrader5 есть только под Windows, поэтому импортируется, лишь когда другой терминал не передан
+            import MetaTrader5 as terminal
+
+        self.terminal = InstrumentedTerminal(terminal)
         self.logger = logger
         self.metatrader_path = metatrader_path
         self.login = login
         self.password = password
         self.server = server
+        self.bar_cache = bar_cache
+        self.terminal_worker = terminal_worker if terminal_worker is not None else TerminalWorker(100, 30, logger)
+        self.symbol_catalog = symbol_catalog if symbol_catalog is not None else SymbolCatalog(60 * 60)
+        self.history_ledger = history_ledger
+        self.terminal_process_pool = terminal_process_pool
+        self.terminal_process_pool_min_symbols = terminal_process_pool_min_symbols
+        self.aggregation_cache = aggregation_cache if aggregation_cache is not None else AggregationCache(256, 1000)
+        self.position_index = position_index if position_index is not None else PositionIndex(1)
+        self.state_cache = state_cache if state_cache is not None else TerminalStateCache({})
 
         self.mt5_connect_status = False
         self.mt5_connect_last_error = ''
+        self.connection_supervisor = ConnectionSupervisor(self.__reconnect__, reconnect_initial_backoff_seconds, reconnect_max_backoff_seconds, logger)
 
-        self.__mt5_init_internal__()
+        self.terminal_worker.call(self.__mt5_init_internal__)
+
+        # Терминал не запустился - подключение продолжается в фоне, запросы отклоняются сразу
+        if not self.mt5_connect_status:
+            self.connection_supervisor.report_disconnect(self.mt5_connect_last_error)
 
     def __mt5_init_internal__(self) -> None:
-        if not mt5.initialize(self.metatrader_path, login=self.login, password=self.password, server=self.server):
+        if not self.terminal.initialize(self.metatrader_path, login=self.login, password=self.password, server=self.server):
             self.mt5_connect_status = False
-            self.mt5_connect_last_error = mt5.last_error()
+            self.mt5_connect_last_error = self.terminal.last_error()
 
             self.logger.fatal("Ошибка установки соединения с MetaTrader5 ({path}) - {err}", path=self.metatrader_path, err=self.mt5_connect_last_error)
 
@@ -39,7 +78,51 @@ class MetaTrader5Integration:
 
             self.logger.info(f'Соединение с [{self.metatrader_path}] установлено')
 
-    def __connect_and_do_work__(self, func: Callable, is_returned_value: bool = False, attempt: int = 1):
+    def __reconnect__(self) -> None:
+        # Выполняется потоком переподключения через очередь потока-владельца
+        def reconnect_internal():
+            self.terminal.shutdown()
+            self.__mt5_init_internal__()
+
+            if not self.mt5_connect_status:
+                raise Exception(self.mt5_connect_last_error)
+
+        self.terminal_worker.call(reconnect_internal)
+
+        # Терминал мог быть перезапущен или обновлен, а счет - измениться, пока соединения не было
+        self.state_cache.clear()
+
+    def __connect_and_do_work__(self, func: Callable, is_returned_value: bool = False):
+        # Все обращения к MetaTrader выполняются в потоке-владельце; без соединения - отказ сразу, без очереди
+        self.connection_supervisor.ensure_available()
+
+        if metrics.current_request() is None:
+            return self.terminal_worker.call(lambda: self.__connect_and_do_work_internal__(func, is_returned_value))
+
+        # Этапы запроса: terminal - ожидание в очереди и вызовы MetaTrader5, conversion - остальная работа в потоке-владельце
+        conversion_seconds = 0.0
+
+        def timed():
+            nonlocal conversion_seconds
+            terminal_seconds, started = metrics.terminal_seconds(), time.perf_counter()
+
+            try:
+                return self.__connect_and_do_work_internal__(func, is_returned_value)
+            finally:
+                conversion_seconds = time.perf_counter() - started - (metrics.terminal_seconds() - terminal_seconds)
+
+        started = time.perf_counter()
+
+        try:
+            return self.terminal_worker.call(timed)
+        finally:
+            metrics.add_stage('terminal', time.perf_counter() - started - conversion_seconds)
+            metrics.add_stage('conversion', conversion_seconds)
+
+    def __connect_and_do_work_internal__(self, func: Callable, is_returned_value: bool = False):
+        # Соединение могло оборваться, пока обращение ждало в очереди
+        self.connection_supervisor.ensure_available()
+
         try:
             if not is_returned_value:
                 func()
@@ -47,230 +130,735 @@ class MetaTrader5Integration:
 
             result = func()
             if result is None:
-                raise Exception(mt5.last_error())
+                raise Exception(self.terminal.last_error())
 
             return result
         except Exception as e:
-            last_mt5_error = mt5.last_error()
+            last_mt5_error = self.terminal.last_error()
+            metrics.terminal_errors_total.increment(str(last_mt5_error[0]))
 
-            if last_mt5_error[0] == -10001:  # if terminal is closed
-                mt5.shutdown()
-                self.__mt5_init_internal__()
+            # Терминал закрыт - переподключение в фоне (ConnectionSupervisor), запрос не ждет запуска терминала
+            if last_mt5_error[0] == -10001:
+                self.connection_supervisor.report_disconnect(last_mt5_error)
+                raise TerminalUnavailableError(f'Терминал недоступен ({last_mt5_error}), идет переподключение') from e
 
-                if attempt <= 3:
-                    return self.__connect_and_do_work__(func, is_returned_value, attempt + 1)
-
-            self.logger.error("Ошибка при обращении к MetaTrader - {exception}, mt5 error - {mt5_error}", exception=e, mt5_error=mt5.last_error(), stacktrace=traceback.format_exc())
+            self.logger.error("Ошибка при обращении к MetaTrader - {exception}, mt5 error - {mt5_error}", exception=e, mt5_error=self.terminal.last_error(), stacktrace=traceback.format_exc())
             raise e
 
+    def __is_stale_read_allowed__(self) -> bool:
+        # Пока терминал переподключается, чтение справочника символов, кэша баров и журнала истории идет без обновления из терминала
+        return not self.connection_supervisor.is_available()
+
+    def __is_symbol_catalog_refresh_needed__(self) -> bool:
+        return self.symbol_catalog.is_stale() and not (self.__is_stale_read_allowed__() and len(self.symbol_catalog.static_by_name) > 0)
+
     # region Terminal Info
     def get_version(self):
         def get_version_internal():
-            version = mt5.version()
+            version = self.terminal.version()
             return {'mtVersion': version[0], 'build': version[1], 'releaseDate': version[2]}
 
-        return self.__connect_and_do_work__(get_version_internal, True)
+        return self.state_cache.get(('version',), lambda: self.__connect_and_do_work__(get_version_internal, True))
 
     def get_info(self):
         def get_info_internal():
-            return mt5.terminal_info()
+            return self.terminal.terminal_info()
 
-        return self.__connect_and_do_work__(get_info_internal, True)
+        return self.state_cache.get(('terminal_info',), lambda: self.__connect_and_do_work__(get_info_internal, True))
 
     # endregion
 
     # region Account info
-    def get_account_info(self) -> dict:
+    def get_account_info(self) -> tuple:
 
         def get_account_info_internal():
-            result = mt5.account_info()
+            result = self.terminal.account_info()
 
             if result is None:
-                raise Exception(mt5.last_error())
+                raise Exception(self.terminal.last_error())
 
-            return result._asdict()
+            return result
 
-        return self.__connect_and_do_work__(get_account_info_internal, True)
+        return self.state_cache.get(('account_info',), lambda: self.__connect_and_do_work__(get_account_info_internal, True))
 
     # endregion
 
     # region Opened Positions
-    def get_opened_positions(self) -> list[MetaTraderOpenedPosition]:
+    def get_opened_positions(self) -> MetaTraderOpenedPositions:
         def get_opened_positions_internal():
-            opened_positions = mt5.positions_get()
-            return list(map(lambda x: MetaTraderOpenedPosition.create(x), opened_positions))
+            opened_positions = self.terminal.positions_get()
+            self.position_index.update(opened_positions)
+
+            return MetaTraderOpenedPositions.create(opened_positions)
 
         return self.__connect_and_do_work__(get_opened_positions_internal, True)
 
     # endregion
 
     # region Symbol Info
-    def get_symbols(self) -> list[dict]:
+    def get_symbols(self) -> list[tuple]:
         def get_symbols_internal():
-            symbols = mt5.symbols_get()
-            return list(map(lambda x: x._asdict(), symbols))
+            symbols = list(self.terminal.symbols_get())
+            self.symbol_catalog.update(symbols)
+            return symbols
 
         return self.__connect_and_do_work__(get_symbols_internal, True)
 
-    def get_symbol_info(self, symbol: str) -> dict:
+    def get_symbol_info(self, symbol: str) -> tuple:
         def get_symbol_info_internal():
-            symbol_info = mt5.symbol_info(symbol)
+            symbol_info = self.terminal.symbol_info(symbol)
 
             if symbol_info is None:
                 raise Exception(f'Symbol \'{symbol}\' not found.')
 
-            return symbol_info._asdict()
+            return symbol_info
+
+        return self.state_cache.get(('symbol_info', symbol), lambda: self.__connect_and_do_work__(get_symbol_info_internal, True))
+
+    def get_symbols_static(self) -> tuple[int, list[tuple]]:
+        """Статические поля всех символов из справочника и его версия"""
+        if self.__is_symbol_catalog_refresh_needed__():
+            self.get_symbols()
+
+        return self.symbol_catalog.snapshot()
+
+    def get_symbol_static_info(self, symbol: str) -> tuple:
+        if self.__is_symbol_catalog_refresh_needed__():
+            self.get_symbols()
 
-        return self.__connect_and_do_work__(get_symbol_info_internal, True)
+        static_symbol_info = self.symbol_catalog.static_by_name.get(symbol)
+
+        if static_symbol_info is None:
+            raise Exception(f'Symbol \'{symbol}\' not found.')
+
+        return static_symbol_info
+
+    def get_symbols_volatile(self, symbols: list[str] | None) -> list[tuple]:
+        """Изменчивые поля (котировки, статистика сессии) - всегда из терминала"""
+        if symbols is None:
+            return list(map(self.symbol_catalog.to_volatile, self.get_symbols()))
+
+        def get_symbols_volatile_internal():
+            result = []
+
+            for symbol in symbols:
+                symbol_info = self.terminal.symbol_info(symbol)
+
+                if symbol_info is None:
+                    raise Exception(f'Symbol \'{symbol}\' not found.')
+
+                result.append(self.symbol_catalog.to_volatile(symbol_info))
+
+            return result
+
+        return self.__connect_and_do_work__(get_symbols_volatile_internal, True)
 
     # endregion
 
     # region Quotes
-    def get_last_quotes(self, symbols: list[str], timeframe_str: str, requested_count: int) -> dict[str, list[Quote]]:
+    def get_last_quotes(self, symbols: list[str], timeframe_str: str, requested_count: int) -> dict[str, Quotes]:
+        last_rates = self.get_last_quotes_rates(symbols, timeframe_str, requested_count)
+
+        return {symbol: Quotes.from_rates(rates) for symbol, rates in last_rates.items()}
 
-        def get_last_quotes_internal():
-            count = min([requested_count, 5000])
+    def get_last_quotes_rates(self, symbols: list[str], timeframe_str: str, requested_count: int) -> dict[str, numpy.ndarray]:
+        count = min([requested_count, 5000])
+
+        if self.terminal_process_pool is None or len(symbols) < self.terminal_process_pool_min_symbols:
+            return self.__get_last_quotes_rates_direct__(symbols, timeframe_str, count)
+
+        # Символы делятся между процессами пула, не полученные пулом - запрашиваются через основное подключение
+        result = self.terminal_process_pool.get_last_quotes_rates(symbols, timeframe_str, count)
+        failed_symbols = [symbol for symbol, rates in result.items() if rates is None]
+
+        if len(failed_symbols) > 0:
+            result.update(self.__get_last_quotes_rates_direct__(failed_symbols, timeframe_str, count))
+
+        return result
+
+    def __get_last_quotes_rates_direct__(self, symbols: list[str], timeframe_str: str, count: int) -> dict[str, numpy.ndarray]:
+
+        def get_last_quotes_rates_internal():
             timeframe = Metatrader5TimeframeEnum[timeframe_str]
-            result: dict[str, list[Quote]] = {}
+            result: dict[str, numpy.ndarray] = {}
 
             for symbol in symbols:
                 try:
-                    rates = mt5.copy_rates_from_pos(symbol, timeframe.value, 0, count)
+                    rates = self.terminal.copy_rates_from_pos(symbol, timeframe.value, 0, count)
                     if rates is None or len(rates) == 0:
-                        result.update({symbol: []})
+                        result.update({symbol: empty_rates})
                         continue
 
-                    quotes = list(map(lambda x: Quote.create(x), rates))
-                    result.update({symbol: quotes})
+                    result.update({symbol: rates})
                 except Exception as e:
                     self.logger.error("Ошибка при получении котировок для {symbol} - {exception}", symbol=symbol, exception=e)
-                    result.update({symbol: []})
+                    result.update({symbol: empty_rates})
 
             return result
 
-        return self.__connect_and_do_work__(get_last_quotes_internal, True)
+        return self.__connect_and_do_work__(get_last_quotes_rates_internal, True)
 
-    def get_quotes(self, symbol: str, timeframe_str: str, requested_count: int) -> list[Quote]:
+    def get_quotes(self, symbol: str, timeframe_str: str, requested_count: int) -> Quotes:
+        rates = self.get_quotes_rates(symbol, timeframe_str, requested_count)
 
-        def get_quotes_internal():
+        return Quotes.from_rates(rates)
+
+    def get_quotes_rates(self, symbol: str, timeframe_str: str, requested_count: int) -> numpy.ndarray:
+        # Терминал переподключается - закрытые бары из кэша, если их хватает
+        if self.__is_stale_read_allowed__() and self.bar_cache is not None and self.bar_cache.length(symbol, timeframe_str) >= requested_count > 0:
+            return self.__chunked_order__(self.bar_cache.tail(symbol, timeframe_str, requested_count))
+
+        def get_quotes_rates_internal():
             if requested_count <= 0:
-                return []
+                return empty_rates
 
             timeframe = Metatrader5TimeframeEnum[timeframe_str]
-            result: list[Quote] = []
-            start_position = 0
 
-            while start_position < requested_count:
+            if self.bar_cache is not None:
                 try:
-                    count = min([requested_count - len(result), 5000])
-                    rates = mt5.copy_rates_from_pos(symbol, timeframe.value, start_position, count)
+                    return self.__chunked_order__(self.__get_cached_quotes_rates__(symbol, timeframe, requested_count))
+                except Exception as e:
+                    self.logger.error("Ошибка при получении котировок для {symbol} - {exception}", symbol=symbol, exception=e)
+                    return empty_rates
+
+            chunks: list[numpy.ndarray] = []
+            received_count = 0
+
+            while received_count < requested_count:
+                try:
+                    count = min([requested_count - received_count, 5000])
+                    rates = self.terminal.copy_rates_from_pos(symbol, timeframe.value, received_count, count)
 
                     if rates is None or len(rates) == 0:
                         break
 
-                    quotes = list(map(lambda x: Quote.create(x), rates))
-                    result.extend(quotes)
-                    start_position += len(quotes)
+                    chunks.append(rates)
+                    received_count += len(rates)
 
                 except Exception as e:
                     self.logger.error("Ошибка при получении котировок для {symbol} - {exception}", symbol=symbol, exception=e)
-                    result = []
+                    chunks = []
                     break
 
-            return result
+            # Порядок как и прежде - пачки от новых к старым, внутри пачки - по возрастанию времени
+            return numpy.concatenate(chunks) if len(chunks) > 0 else empty_rates
+
+        return self.__connect_and_do_work__(get_quotes_rates_internal, True)
+
+    def get_range_quotes(self, symbol: str, timeframe_str: str, date_from: int, date_to: int) -> Quotes:
+        rates = self.get_range_quotes_rates(symbol, timeframe_str, date_from, date_to)
+
+        return Quotes.from_rates(rates)
 
-        return self.__connect_and_do_work__(get_quotes_internal, True)
+    def get_range_quotes_rates(self, symbol: str, timeframe_str: str, date_from: int, date_to: int) -> numpy.ndarray:
+        # Терминал переподключается - закрытые бары из кэша, если он покрывает начало диапазона
+        if self.__is_stale_read_allowed__() and self.bar_cache is not None and self.bar_cache.length(symbol, timeframe_str) > 0 \
+                and self.bar_cache.first(symbol, timeframe_str)['time'][0] <= date_from:
+            return self.bar_cache.between(symbol, timeframe_str, date_from, date_to)
 
-    def get_range_quotes(self, symbol: str, timeframe_str: str, date_from: int, date_to: int) -> list[Quote]:
-        def get_range_quotes_internal():
+        def get_range_quotes_rates_internal():
             timeframe = Metatrader5TimeframeEnum[timeframe_str]
-            result: list[Quote] = []
 
             try:
-                rates = mt5.copy_rates_range(symbol, timeframe.value, date_from, date_to)
+                if self.bar_cache is not None:
+                    return self.__get_cached_range_quotes_rates__(symbol, timeframe, date_from, date_to)
+
+                rates = self.terminal.copy_rates_range(symbol, timeframe.value, date_from, date_to)
 
                 if rates is None or len(rates) == 0:
-                    result = []
-                else:
-                    result = list(map(lambda x: Quote.create(x), rates))
+                    return empty_rates
+
+                return rates
             except Exception as e:
                 self.logger.error("Ошибка при получении котировок для {symbol} - {exception}", symbol=symbol, exception=e)
-                result = []
+                return empty_rates
+
+        return self.__connect_and_do_work__(get_range_quotes_rates_internal, True)
+
+    def get_aggregated_rates(self, symbol: str, timeframe_str: str, interval_seconds: int, date_from: int, date_to: int,
+                             indicators: list[tuple[str, int, str]]) -> tuple[numpy.ndarray, dict[str, numpy.ndarray]]:
+        """
+        Бары timeframe_str с date_from по date_to, сгруппированные в интервалы interval_seconds, и индикаторы на них (столбец по имени).
+        Расчет начинается с границы блока интервалов (AggregationCache.anchor_intervals) не позже чем за наибольший период
+        индикаторов до date_from: начало зависит только от запроса, поэтому и результат не зависит от содержимого кэша.
+        Закрытые интервалы и их индикаторы кэшируются по символу, таймфрейму, интервалу, индикаторам и началу расчета,
+        запрос берет из кэша свой срез - повторный запрос, в том числе с другим date_from в том же блоке, считает только
+        новые интервалы.
+        """
+        timeframe = Metatrader5TimeframeEnum[timeframe_str]
+
+        if interval_seconds <= 0 or interval_seconds % timeframe.seconds != 0:
+            raise Exception(f'Интервал {interval_seconds} с не кратен таймфрейму {timeframe_str}')
+
+        interval_from = date_from // interval_seconds * interval_seconds
+        warm_up_from = interval_from - max((x[1] for x in indicators), default=0) * interval_seconds
+        block_seconds = self.aggregation_cache.anchor_intervals * interval_seconds
+        start = max(0, warm_up_from // block_seconds * block_seconds)
+        # Интервал, в который попадает date_to, берется целиком
+        interval_to = min(date_to // interval_seconds * interval_seconds + interval_seconds - 1, 2147483647)
+
+        key = (symbol, timeframe_str, interval_seconds, tuple(indicators), start)
+        entry = self.aggregation_cache.get(key)
+
+        if entry is not None:
+            closed_bars, closed_values = entry
+        else:
+            closed_bars = empty_rates
+            closed_values = {x: [numpy.empty(0)] * len(bar_aggregation.indicator_names(x)) for x in indicators}
 
-            return result
+        # Из терминала - только бары с первого незакрытого интервала по date_to; последний полученный интервал считается
+        # формирующимся и не кэшируется
+        fetch_from = start if len(closed_bars) == 0 else int(closed_bars['time'][-1]) + interval_seconds
+
+        if fetch_from <= interval_to:
+            bars = bar_aggregation.resample(self.get_range_quotes_rates(symbol, timeframe_str, fetch_from, interval_to), interval_seconds)
+        else:
+            bars = empty_rates
+
+        new_closed_bars, forming_bars = bars[:-1], bars[-1:]
+
+        if len(new_closed_bars) > 0:
+            new_values = {x: bar_aggregation.compute_indicator(x, new_closed_bars, closed_bars, closed_values[x]) for x in indicators}
+
+            closed_values = {x: [numpy.concatenate((a, b)) for a, b in zip(closed_values[x], new_values[x])] for x in indicators}
+            closed_bars = numpy.concatenate((closed_bars, new_closed_bars))
+
+            self.aggregation_cache.put(key, closed_bars, closed_values)
+
+        forming_values = {x: bar_aggregation.compute_indicator(x, forming_bars, closed_bars, closed_values[x]) for x in indicators}
+
+        result_bars = numpy.concatenate((closed_bars, forming_bars))
+        begin = numpy.searchsorted(result_bars['time'], interval_from, 'left')
+        end = numpy.searchsorted(result_bars['time'], date_to, 'right')
+        columns: dict[str, numpy.ndarray] = {}
+
+        for indicator in indicators:
+            for name, closed, forming in zip(bar_aggregation.indicator_names(indicator), closed_values[indicator], forming_values[indicator]):
+                columns[name] = numpy.concatenate((closed, forming))[begin:end]
+
+        return result_bars[begin:end], columns
+
+    def iter_quotes_rates(self, symbol: str, timeframe_str: str, requested_count: int) -> Iterator[numpy.ndarray]:
+        """Те же пачки, что и в get_quotes_rates, но каждая запрашивается у терминала отдельно"""
+        timeframe = Metatrader5TimeframeEnum[timeframe_str]
+        received_count = 0
+
+        while received_count < requested_count:
+            count = min([requested_count - received_count, 5000])
+            rates = self.__connect_and_do_work__(lambda: self.__copy_rates_from_pos__(symbol, timeframe, received_count, count), True)
+
+            if len(rates) == 0:
+                break
+
+            yield rates
+            received_count += len(rates)
+
+    def iter_range_quotes_rates(self, symbol: str, timeframe_str: str, date_from: int, date_to: int) -> Iterator[numpy.ndarray]:
+        timeframe = Metatrader5TimeframeEnum[timeframe_str]
+        page_seconds = 5000 * timeframe.seconds
+        page_from = date_from
+        # Как и в __history_pages__: полные страницы - не дальше суток после текущего момента (запас на разницу времени
+        # сервера брокера), последняя - до date_to, иначе открытый диапазон перебирался бы пустыми страницами до 2038 года
+        now = int(time.time()) + 24 * 60 * 60
+
+        while page_from <= date_to:
+            page_to = min([page_from + page_seconds - 1, date_to]) if page_from + page_seconds <= now else date_to
+            yield self.__connect_and_do_work__(lambda: self.__copy_rates_range__(symbol, timeframe, page_from, page_to), True)
+            page_from = page_to + 1
+
+    # endregion
+
+    # region Bar cache
+    def __get_cached_quotes_rates__(self, symbol: str, timeframe: Metatrader5TimeframeEnum, requested_count: int) -> numpy.ndarray:
+        forming_bar = self.__top_up_bar_cache__(symbol, timeframe)
+
+        if forming_bar is None:
+            rates = self.__copy_rates_from_pos__(symbol, timeframe, 0, requested_count)
+            self.bar_cache.store(symbol, timeframe.name, rates[:-1])
+            return rates
+
+        # Позиция 0 - формирующийся бар, позиции 1..cached_count - закрытые бары из кэша
+        cached_count = self.bar_cache.length(symbol, timeframe.name)
+
+        if cached_count + 1 < requested_count:
+            older_rates = self.__copy_rates_from_pos__(symbol, timeframe, cached_count + 1, requested_count - cached_count - 1)
+
+            if len(older_rates) > 0 and older_rates['time'][-1] >= self.bar_cache.first(symbol, timeframe.name)['time'][0]:
+                raise Exception(f'История {symbol} {timeframe.name} в терминале не совпадает с кэшем')
+
+            self.bar_cache.prepend(symbol, timeframe.name, older_rates)
+
+        return numpy.concatenate([self.bar_cache.tail(symbol, timeframe.name, requested_count - 1), forming_bar])
+
+    def __get_cached_range_quotes_rates__(self, symbol: str, timeframe: Metatrader5TimeframeEnum, date_from: int, date_to: int) -> numpy.ndarray:
+        forming_bar = self.__top_up_bar_cache__(symbol, timeframe)
+
+        if forming_bar is None:
+            # Кэш заполняется только диапазоном, который доходит до формирующегося бара: запрос старой истории
+            # берется из терминала как есть, а не загружает в кэш все бары от нее до текущего момента
+            forming_bar = self.__copy_rates_from_pos__(symbol, timeframe, 0, 1)
+
+            if len(forming_bar) == 0:
+                return empty_rates
+
+            if date_to < forming_bar['time'][0]:
+                return self.__copy_rates_range__(symbol, timeframe, date_from, date_to)
+
+            rates = self.__copy_rates_range__(symbol, timeframe, date_from, 2147483647)
+
+            if len(rates) == 0:
+                return empty_rates
+
+            self.bar_cache.store(symbol, timeframe.name, rates[:-1])
+            forming_bar = rates[-1:]
+        else:
+            first_cached_time = self.bar_cache.first(symbol, timeframe.name)['time'][0]
+
+            # Диапазон целиком раньше кэша - тоже из терминала, без загрузки промежутка до начала кэша
+            if date_to < first_cached_time:
+                return self.__copy_rates_range__(symbol, timeframe, date_from, date_to)
+
+            if date_from < first_cached_time:
+                older_rates = self.__copy_rates_range__(symbol, timeframe, date_from, first_cached_time - 1)
+                self.bar_cache.prepend(symbol, timeframe.name, older_rates)
+
+        rates = self.bar_cache.between(symbol, timeframe.name, date_from, date_to)
 
-        return self.__connect_and_do_work__(get_range_quotes_internal, True)
+        if date_from <= forming_bar['time'][0] <= date_to:
+            rates = numpy.concatenate([rates, forming_bar])
+
+        return rates
+
+    def __top_up_bar_cache__(self, symbol: str, timeframe: Metatrader5TimeframeEnum) -> numpy.ndarray | None:
+        """
+        Догружает в кэш бары, закрывшиеся после последнего закэшированного, и возвращает формирующийся бар.
+        None - кэш пуст или сброшен, т.к. история в терминале разошлась с кэшем.
+        """
+        last_cached_bar = self.bar_cache.last(symbol, timeframe.name)
+
+        if len(last_cached_bar) == 0:
+            return None
+
+        rates = self.__copy_rates_range__(symbol, timeframe, int(last_cached_bar['time'][0]), 2147483647)
+
+        # Первый бар должен совпасть с последним закэшированным, после него - как минимум формирующийся
+        if len(rates) < 2 or any(rates[0][field] != last_cached_bar[0][field] for field in ('time', 'open', 'high', 'low', 'close')):
+            self.bar_cache.invalidate(symbol, timeframe.name)
+            return None
+
+        self.bar_cache.append(symbol, timeframe.name, rates[1:-1])
+
+        return rates[-1:]
+
+    def __copy_rates_from_pos__(self, symbol: str, timeframe: Metatrader5TimeframeEnum, start_position: int, requested_count: int) -> numpy.ndarray:
+        """Бары позиций [start_position, start_position + requested_count) по возрастанию времени"""
+        chunks: list[numpy.ndarray] = []
+        received_count = 0
+
+        while received_count < requested_count:
+            count = min([requested_count - received_count, 5000])
+            rates = self.terminal.copy_rates_from_pos(symbol, timeframe.value, start_position + received_count, count)
+
+            if rates is None:
+                raise Exception(self.terminal.last_error())
+
+            if len(rates) == 0:
+                break
+
+            chunks.insert(0, rates)
+            received_count += len(rates)
+
+        return numpy.concatenate(chunks) if len(chunks) > 0 else empty_rates
+
+    def __copy_rates_range__(self, symbol: str, timeframe: Metatrader5TimeframeEnum, date_from: int, date_to: int) -> numpy.ndarray:
+        rates = self.terminal.copy_rates_range(symbol, timeframe.value, date_from, date_to)
+
+        if rates is None:
+            raise Exception(self.terminal.last_error())
+
+        return rates
+
+    @staticmethod
+    def __chunked_order__(rates: numpy.ndarray) -> numpy.ndarray:
+        """Раскладывает бары по пачкам в 5000 в том же порядке, что и постраничная выборка copy_rates_from_pos"""
+        if len(rates) <= 5000:
+            return rates
+
+        return numpy.concatenate([rates[max(0, end - 5000):end] for end in range(len(rates), 0, -5000)])
 
     # endregion
 
     # region Position Management
-    def update_stop_loss(self, identifier: int, sl_value: float) -> dict:
+    def update_stop_loss(self, identifier: int, sl_value: float) -> tuple:
 
         def update_stop_loss_internal():
-            positions = list(filter(lambda x: x.identifier == identifier, self.get_opened_positions()))
+            self.__refresh_position_index__([identifier])
+            return self.__send_stop_loss__(identifier, sl_value)
 
-            if len(positions) == 0:
-                raise Exception(f'По идентификатору {identifier} не найдено открытой позиции')
+        return self.__connect_and_do_work__(update_stop_loss_internal, True)
 
-            if len(positions) > 1:
-                raise Exception(f'По идентификатору {identifier} найдено более одной открытой позиции')
+    def update_stop_losses(self, stop_losses: list[tuple[int, float]]) -> list[tuple | Exception]:
+        """Стоп-лоссы многих позиций за одно обращение к потоку-владельцу: результат или ошибка на каждую позицию"""
 
-            request = {
-                "action": mt5.TRADE_ACTION_SLTP,
-                "symbol": positions[0].symbol,
-                "volume": positions[0].volume,
-                "position": identifier,
-                "sl": sl_value,
-                "ENUM_ORDER_STATE": mt5.ORDER_FILLING_RETURN
-            }
+        def update_stop_losses_internal():
+            self.__refresh_position_index__([identifier for identifier, _ in stop_losses])
+            results = []
 
-            result = mt5.order_send(request)
+            for identifier, sl_value in stop_losses:
+                try:
+                    results.append(self.__send_stop_loss__(identifier, sl_value))
+                except Exception as e:
+                    # Терминал закрыт - остальные позиции тоже не изменить
+                    if self.terminal.last_error()[0] == -10001:
+                        raise
 
-            if result is None:
-                raise Exception(mt5.last_error())
+                    self.logger.error("Ошибка изменения стоп-лосса позиции {identifier} - {exception}", identifier=identifier, exception=e)
+                    results.append(e)
 
-            return result._asdict()
+            return results
 
-        return self.__connect_and_do_work__(update_stop_loss_internal, True)
+        return self.__connect_and_do_work__(update_stop_losses_internal, True)
 
-    def open_position(self, action_str: str, symbol: str, volume: float, stop_loss: float) -> dict:
-        def open_position_internal():
-            request = {
-                "action": mt5.TRADE_ACTION_DEAL,
-                "symbol": symbol,
-                "volume": volume,
-                "type": Metatrader5OrderTypeEnum[action_str].value,
-                "sl": stop_loss
-            }
+    def submit_orders(self, instructions: list[OrderInstruction], dry_run: bool) -> list[OrderInstructionResult]:
+        """
+        Пакет приказов за одно обращение к потоку-владельцу: сначала order_check всех приказов, затем приказы,
+        прошедшие проверку, отправляются подряд без возврата в очередь между ними. dry_run - только проверка
+        """
 
-            result = mt5.order_send(request)
+        def submit_orders_internal():
+            self.__refresh_position_index__([x.identifier for x in instructions if x.type == 'modify'])
+
+            results = [self.__check_instruction__(x) for x in instructions]
+
+            if dry_run:
+                return results
+
+            for item in results:
+                if item.error is None:
+                    self.__send_instruction__(item)
+
+            if any(x.instruction.type in ('open', 'close') and x.result is not None for x in results):
+                self.position_index.invalidate()
+
+            return results
+
+        return self.__connect_and_do_work__(submit_orders_internal, True)
+
+    def open_position(self, action_str: str, symbol: str, volume: float, stop_loss: float) -> tuple:
+        def open_position_internal():
+            result = self.terminal.order_send(self.__open_request__(action_str, symbol, volume, stop_loss))
 
             if result is None:
-                raise Exception(mt5.last_error())
+                raise Exception(self.terminal.last_error())
 
-            return result._asdict()
+            self.position_index.invalidate()
+            self.__invalidate_trade_state__(symbol)
+            return result
 
         return self.__connect_and_do_work__(open_position_internal, True)
 
     def close_position(self, symbol: str) -> bool:
 
         def close_position_internal():
-            result = mt5.Close(symbol)
+            result = self.terminal.Close(symbol)
 
             if result is None:
-                raise Exception(mt5.last_error())
+                raise Exception(self.terminal.last_error())
 
+            self.position_index.invalidate()
+            self.__invalidate_trade_state__(symbol)
             return result
 
         return self.__connect_and_do_work__(close_position_internal, True)
 
+    def __refresh_position_index__(self, identifiers: list[int]) -> None:
+        # Индекс устарел или в нем нет позиции, открытой после снимка, - снимок перечитывается одним positions_get
+        if self.position_index.is_stale() or any(len(self.position_index.find(x)) == 0 for x in identifiers):
+            positions = self.terminal.positions_get()
+
+            if positions is None:
+                raise Exception(self.terminal.last_error())
+
+            self.position_index.update(positions)
+
+    def __send_stop_loss__(self, identifier: int, sl_value: float) -> tuple:
+        position = self.__find_single_position__(identifier)
+
+        result = self.terminal.order_send(self.__stop_loss_request__(position, sl_value))
+
+        if result is None:
+            raise Exception(self.terminal.last_error())
+
+        self.position_index.apply_stop_loss(identifier, sl_value)
+        self.__invalidate_trade_state__(position.symbol)
+        return result
+
+    def __check_instruction__(self, instruction: OrderInstruction) -> OrderInstructionResult:
+        item = OrderInstructionResult(instruction)
+        started = time.perf_counter()
+
+        try:
+            if instruction.type == 'open':
+                requests = [self.__open_request__(instruction.action, instruction.symbol, instruction.volume, instruction.stop_loss)]
+            elif instruction.type == 'close':
+                requests = list(map(self.__close_request__, self.position_index.find_by_symbol(instruction.symbol)))
+
+                if len(requests) == 0:
+                    raise Exception(f'По символу {instruction.symbol} нет открытых позиций')
+            else:
+                requests = [self.__stop_loss_request__(self.__find_single_position__(instruction.identifier), instruction.stop_loss)]
+
+            for request in requests:
+                check = self.terminal.order_check(request)
+
+                if check is None:
+                    raise Exception(self.terminal.last_error())
+
+                item.checks.append(check)
+
+                if check.retcode != 0:
+                    raise Exception(f'Проверка приказа не пройдена - {check.comment} (retcode:{check.retcode})')
+        except Exception as e:
+            # Терминал закрыт - пакет прерывается целиком
+            if self.terminal.last_error()[0] == -10001:
+                raise
+
+            item.error = e
+        finally:
+            item.check_seconds = time.perf_counter() - started
+
+        return item
+
+    def __send_instruction__(self, item: OrderInstructionResult) -> None:
+        instruction = item.instruction
+        started = time.perf_counter()
+
+        try:
+            if instruction.type == 'modify':
+                item.result = self.__send_stop_loss__(instruction.identifier, instruction.stop_loss)
+                return
+
+            if instruction.type == 'open':
+                result = self.terminal.order_send(self.__open_request__(instruction.action, instruction.symbol, instruction.volume, instruction.stop_loss))
+            else:
+                result = self.terminal.Close(instruction.symbol)
+
+            if result is None:
+                raise Exception(self.terminal.last_error())
+
+            self.__invalidate_trade_state__(instruction.symbol)
+            item.result = result
+        except Exception as e:
+            if self.terminal.last_error()[0] == -10001:
+                raise
+
+            self.logger.error("Ошибка отправки приказа {instruction} - {exception}", instruction=instruction, exception=e)
+            item.error = e
+        finally:
+            item.send_seconds = time.perf_counter() - started
+
+    def __invalidate_trade_state__(self, symbol: str) -> None:
+        # Своя сделка меняет баланс и маржу счета и статистику сессии символа
+        self.state_cache.invalidate(('account_info',), ('symbol_info', symbol))
+
+    def __find_single_position__(self, identifier: int) -> tuple:
+        positions = self.position_index.find(identifier)
+
+        if len(positions) == 0:
+            raise Exception(f'По идентификатору {identifier} не найдено открытой позиции')
+
+        if len(positions) > 1:
+            raise Exception(f'По идентификатору {identifier} найдено более одной открытой позиции')
+
+        return positions[0]
+
+    def __open_request__(self, action_str: str, symbol: str, volume: float, stop_loss: float) -> dict:
+        return {
+            "action": self.terminal.TRADE_ACTION_DEAL,
+            "symbol": symbol,
+            "volume": volume,
+            "type": Metatrader5OrderTypeEnum[action_str].value,
+            "sl": stop_loss
+        }
+
+    def __stop_loss_request__(self, position: tuple, sl_value: float) -> dict:
+        return {
+            "action": self.terminal.TRADE_ACTION_SLTP,
+            "symbol": position.symbol,
+            "volume": position.volume,
+            "position": position.identifier,
+            "sl": sl_value,
+            "ENUM_ORDER_STATE": self.terminal.ORDER_FILLING_RETURN
+        }
+
+    def __close_request__(self, position: tuple) -> dict:
+        # Встречная сделка на весь объем позиции - так закрывает позицию Close
+        return {
+            "action": self.terminal.TRADE_ACTION_DEAL,
+            "symbol": position.symbol,
+            "volume": position.volume,
+            "type": Metatrader5OrderTypeEnum.ORDER_TYPE_SELL.value if position.type == 0 else Metatrader5OrderTypeEnum.ORDER_TYPE_BUY.value,
+            "position": position.identifier
+        }
+
     # endregion
 
     # region order_check
 
+    def order_calc_profit_grid(self, action_str: str, symbol: str, volumes: numpy.ndarray, price_open: float,
+                               prices_close: numpy.ndarray) -> numpy.ndarray:
+        """
+        Прибыль по всем сочетаниям объема (строка) и цены закрытия (столбец), локально по кэшированному symbol_info.
+        Значения приблизительные, пока их не подтвердит verify_order_calc
+        """
+        return trade_calculator.calc_profit(self.get_symbol_info(symbol), Metatrader5OrderTypeEnum[action_str].value,
+                                            volumes[:, numpy.newaxis], price_open, prices_close[numpy.newaxis, :])
+
+    def order_calc_margin_grid(self, action_str: str, symbol: str, volumes: numpy.ndarray, prices: numpy.ndarray) -> numpy.ndarray:
+        """
+        Маржа по всем сочетаниям объема (строка) и цены (столбец), локально по кэшированным symbol_info и account_info.
+        Значения приблизительные, пока их не подтвердит verify_order_calc
+        """
+        return trade_calculator.calc_margin(self.get_symbol_info(symbol), self.get_account_info(), Metatrader5OrderTypeEnum[action_str].value,
+                                            volumes[:, numpy.newaxis], prices[numpy.newaxis, :])
+
+    def verify_order_calc(self, method: str, action_str: str, symbol: str, arguments: list[tuple], local_values: list[float]) -> dict:
+        """
+        Сверка локального расчета с терминалом: method (order_calc_profit или order_calc_margin) вызывается для каждого
+        набора arguments за одно обращение к потоку терминала. Терминал округляет результат до знаков валюты счета,
+        расхождение больше единицы последнего знака считается ошибкой локального расчета
+        """
+        def verify_order_calc_internal():
+            calculate = getattr(self.terminal, method)
+            action = Metatrader5OrderTypeEnum[action_str].value
+            values = []
+
+            for item in arguments:
+                value = calculate(action, symbol, *item)
+
+                if value is None:
+                    raise Exception(self.terminal.last_error())
+
+                values.append(value)
+
+            return values
+
+        terminal_values = self.__connect_and_do_work__(verify_order_calc_internal, True)
+        tolerance = 10 ** -self.get_account_info().currency_digits
+        errors = [abs(local - terminal) for local, terminal in zip(local_values, terminal_values)]
+
+        mismatches = [{'arguments': item, 'localValue': local, 'terminalValue': terminal}
+                      for item, local, terminal, error in zip(arguments, local_values, terminal_values, errors) if error > tolerance]
+
+        if len(mismatches) > 0:
+            self.logger.warning("Локальный {method} для {symbol} расходится с терминалом в {mismatches} из {samples} образцов",
+                                method=method, symbol=symbol, mismatches=len(mismatches), samples=len(arguments))
+
+        return {'samples': len(arguments), 'tolerance': tolerance, 'maxError': max(errors, default=0.0), 'mismatches': mismatches}
+
     def order_calc_profit(self, action_str: str, symbol: str, volume: float, price_open: float, price_close: float) -> number:
         def order_calc_profit_internal():
-            result = mt5.order_calc_profit(
+            result = self.terminal.order_calc_profit(
                 Metatrader5OrderTypeEnum[action_str].value,
                 symbol,
                 volume,
@@ -279,7 +867,7 @@ class MetaTrader5Integration:
             )
 
             if result is None:
-                raise Exception(mt5.last_error())
+                raise Exception(self.terminal.last_error())
 
             return result
 
@@ -287,7 +875,7 @@ class MetaTrader5Integration:
 
     def order_calc_margin(self, action_str: str, symbol: str, volume: float, price_open: float) -> number:
         def order_calc_margin_internal():
-            result = mt5.order_calc_margin(
+            result = self.terminal.order_calc_margin(
                 Metatrader5OrderTypeEnum[action_str].value,
                 symbol,
                 volume,
@@ -295,53 +883,140 @@ class MetaTrader5Integration:
             )
 
             if result is None:
-                raise Exception(mt5.last_error())
+                raise Exception(self.terminal.last_error())
 
             return result
 
         return self.__connect_and_do_work__(order_calc_margin_internal, True)
 
-    def order_check(self, action_str: str, symbol: str, volume: float, stop_loss: float) -> dict:
+    def order_check(self, action_str: str, symbol: str, volume: float, stop_loss: float) -> tuple:
         def order_check_internal():
-            request = {
-                "action": mt5.TRADE_ACTION_DEAL,
-                "symbol": symbol,
-                "volume": volume,
-                "type": Metatrader5OrderTypeEnum[action_str].value,
-                "sl": stop_loss
-            }
-
-            result = mt5.order_check(request)
+            result = self.terminal.order_check(self.__open_request__(action_str, symbol, volume, stop_loss))
 
             if result is None:
-                raise Exception(mt5.last_error())
+                raise Exception(self.terminal.last_error())
 
-            return result._asdict()
+            return result
 
         return self.__connect_and_do_work__(order_check_internal, True)
 
     # endregion
 
     # region history
-    def history_deals_get(self, date_from: int) -> list[MetaTraderDeal]:
+    def history_deals_get(self, date_from: int, date_to: int = 2147483647) -> MetaTraderDeals:
+        if self.history_ledger is not None:
+            self.__sync_history_ledger_if_available__('deals')
+            return MetaTraderDeals.create(self.history_ledger.between('deals', date_from, date_to))
+
         def history_deals_get_internal():
-            result = mt5.history_deals_get(date_from, 2147483647)
+            result = self.terminal.history_deals_get(date_from, date_to)
 
             if result is None:
-                raise Exception(mt5.last_error())
+                raise Exception(self.terminal.last_error())
 
-            return list(map(lambda x: MetaTraderDeal.create(x), result))
+            return MetaTraderDeals.create(result)
 
         return self.__connect_and_do_work__(history_deals_get_internal, True)
 
-    def history_orders_get(self, date_from: int) -> list[dict]:
+    def history_orders_get(self, date_from: int, date_to: int = 2147483647) -> list[tuple]:
+        if self.history_ledger is not None:
+            self.__sync_history_ledger_if_available__('orders')
+            return self.history_ledger.between('orders', date_from, date_to)
+
         def history_orders_get_internal():
-            result = mt5.history_orders_get(date_from, 2147483647)
+            result = self.terminal.history_orders_get(date_from, date_to)
 
             if result is None:
-                raise Exception(mt5.last_error())
+                raise Exception(self.terminal.last_error())
 
-            return list(map(lambda x: x._asdict(), result))
+            return list(result)
 
         return self.__connect_and_do_work__(history_orders_get_internal, True)
+
+    def history_deals_since(self, since_ticket: int | None, since_time: int | None) -> MetaTraderDeals:
+        """Сделки, появившиеся после since_ticket и (или) не раньше since_time - только изменения для клиента"""
+        self.__sync_history_ledger_if_available__('deals')
+        return MetaTraderDeals.create(self.history_ledger.since('deals', since_ticket, since_time))
+
+    def history_orders_since(self, since_ticket: int | None, since_time: int | None) -> list[tuple]:
+        self.__sync_history_ledger_if_available__('orders')
+        return self.history_ledger.since('orders', since_ticket, since_time)
+
+    def iter_history_deals(self, date_from: int, page_seconds: int) -> Iterator[MetaTraderDeals]:
+        if self.history_ledger is not None:
+            self.__sync_history_ledger_if_available__('deals')
+
+            for page_from, page_to in self.__history_pages__(date_from, page_seconds):
+                yield MetaTraderDeals.create(self.history_ledger.between('deals', page_from, page_to))
+
+            return
+
+        for page_from, page_to in self.__history_pages__(date_from, page_seconds):
+            yield self.history_deals_get(page_from, page_to)
+
+    def iter_history_orders(self, date_from: int, page_seconds: int) -> Iterator[list[tuple]]:
+        if self.history_ledger is not None:
+            self.__sync_history_ledger_if_available__('orders')
+
+            for page_from, page_to in self.__history_pages__(date_from, page_seconds):
+                yield self.history_ledger.between('orders', page_from, page_to)
+
+            return
+
+        for page_from, page_to in self.__history_pages__(date_from, page_seconds):
+            yield self.history_orders_get(page_from, page_to)
+
+    def sync_history_ledger(self, table: str) -> None:
+        """Догружает в журнал записи истории начиная с отметки синхронизации (вся история - при первом обращении)"""
+        if self.history_ledger is None:
+            raise Exception('Локальный журнал истории не подключен')
+
+        get_history = self.terminal.history_deals_get if table == 'deals' else self.terminal.history_orders_get
+
+        def sync_history_ledger_internal():
+            active_since = None
+
+            if table == 'orders':
+                # Действующий ордер попадет в историю со своим временем выставления, которое может быть раньше отметки журнала
+                active_orders = self.terminal.orders_get()
+
+                if active_orders is None:
+                    raise Exception(self.terminal.last_error())
+
+                active_since = min((x.time_setup for x in active_orders), default=None)
+
+            date_from = self.history_ledger.sync_date_from(table, active_since)
+            result = get_history(date_from, 2147483647)
+
+            if result is None:
+                raise Exception(self.terminal.last_error())
+
+            # Поля записей в терминале поменялись - журнал собирается заново со всей истории
+            if date_from > 0 and len(result) > 0 and not self.history_ledger.is_compatible(table, type(result[0])._fields):
+                result = get_history(0, 2147483647)
+
+                if result is None:
+                    raise Exception(self.terminal.last_error())
+
+            self.history_ledger.store(table, result, active_since)
+
+        self.__connect_and_do_work__(sync_history_ledger_internal)
+
+    def __sync_history_ledger_if_available__(self, table: str) -> None:
+        # Терминал переподключается - отдается то, что уже есть в журнале
+        if not self.__is_stale_read_allowed__() or self.history_ledger is None or self.history_ledger.high_water_mark(table) is None:
+            self.sync_history_ledger(table)
+
+    @staticmethod
+    def __history_pages__(date_from: int, page_seconds: int) -> Iterator[tuple[int, int]]:
+        # С запасом на разницу времени сервера брокера, последняя страница - до конца истории
+        now = int(time.time()) + 24 * 60 * 60
+        page_from = date_from
+
+        while page_from + page_seconds <= now:
+            yield page_from, page_from + page_seconds - 1
+            page_from += page_seconds
+
+        yield page_from, 2147483647
+
     # endregion
@@ -0,0 +1,168 @@
+import logging
+import multiprocessing
+import threading
+from collections.abc import Callable
+from logging import Logger
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy
+
+from metatrader.models.metatrader_quote import rates_dtype
+from metatrader.terminal_backend import TerminalBackend
+
+
+class TerminalProcessPool:
+    """
+    Пул процессов со своим подключением к терминалу у каждого (MetaTrader5 - одно подключение на процесс).
+
+    Символы запроса делятся между процессами, каждый пишет бары в общий блок разделяемой памяти
+    в ячейки фиксированного размера (count баров на символ), по каналу возвращается только число баров.
+    Процесс, который упал или не ответил за task_timeout, перезапускается, его символы возвращаются как None.
+    """
+
+    def __init__(self, processes_count: int, task_timeout: float, metatrader_path: str, login: int, password: str, server: str,
+                 logger: Logger, terminal_factory: Callable[[], TerminalBackend] | None = None):
+        self.task_timeout = task_timeout
+        self.logger = logger
+
+        # Процессу передаются только данные для подключения, объекты терминала в другой процесс не переносятся
+        self.worker_args = (metatrader_path, login, password, server, logger.name, terminal_factory)
+        self.context = multiprocessing.get_context('spawn')
+        self.lock = threading.Lock()
+
+        self.workers: list[tuple[multiprocessing.Process, Connection]] = [self.__start_worker__(i) for i in range(processes_count)]
+
+    def get_last_quotes_rates(self, symbols: list[str], timeframe_str: str, count: int) -> dict[str, numpy.ndarray | None]:
+        """Последние count баров по каждому символу, None - процесс с этим символом не ответил"""
+        shard_size = -(-len(symbols) // len(self.workers))
+        shards = [(offset, symbols[offset:offset + shard_size]) for offset in range(0, len(symbols), shard_size)]
+        result: dict[str, numpy.ndarray | None] = dict.fromkeys(symbols)
+
+        with self.lock:
+            shared_memory = SharedMemory(create=True, size=max(1, len(symbols) * count * rates_dtype.itemsize))
+
+            try:
+                for i, (offset, shard) in enumerate(shards):
+                    self.__send__(i, (shard, timeframe_str, count, shared_memory.name, offset))
+
+                counts_by_shard = [self.__receive__(i) for i in range(len(shards))]
+
+                buffer = numpy.ndarray((len(symbols) * count,), dtype=rates_dtype, buffer=shared_memory.buf)
+
+                for (offset, shard), counts in zip(shards, counts_by_shard):
+                    if counts is None:
+                        continue
+
+                    for i, symbol in enumerate(shard):
+                        start = (offset + i) * count
+                        result[symbol] = buffer[start:start + counts[i]].copy()
+
+                del buffer
+            finally:
+                shared_memory.close()
+                shared_memory.unlink()
+
+        return result
+
+    def close(self) -> None:
+        with self.lock:
+            for process, connection in self.workers:
+                try:
+                    connection.send(None)
+                except OSError:
+                    pass
+
+                process.join(5)
+
+                if process.is_alive():
+                    process.kill()
+
+    # region private
+    def __start_worker__(self, index: int) -> tuple[multiprocessing.Process, Connection]:
+        connection, worker_connection = self.context.Pipe()
+        process = self.context.Process(target=__worker_main__, args=(worker_connection, *self.worker_args), name=f'mt5-pool-{index}', daemon=True)
+        process.start()
+        worker_connection.close()
+
+        return process, connection
+
+    def __restart_worker__(self, index: int) -> None:
+        process, connection = self.workers[index]
+        self.logger.warning("Процесс пула терминала {name} не отвечает и будет перезапущен", name=process.name)
+
+        connection.close()
+        process.kill()
+        process.join()
+
+        self.workers[index] = self.__start_worker__(index)
+
+    def __send__(self, index: int, task: tuple) -> None:
+        try:
+            self.workers[index][1].send(task)
+        except OSError:
+            self.__restart_worker__(index)
+            self.workers[index][1].send(task)
+
+    def __receive__(self, index: int) -> list[int] | None:
+        process, connection = self.workers[index]
+
+        try:
+            if not connection.poll(self.task_timeout):
+                raise TimeoutError(f'Нет ответа за {self.task_timeout} с')
+
+            response = connection.recv()
+        except (EOFError, OSError, TimeoutError) as e:
+            self.logger.error("Ошибка процесса пула терминала {name} - {exception}", name=process.name, exception=e)
+            self.__restart_worker__(index)
+            return None
+
+        if isinstance(response, str):
+            self.logger.error("Ошибка процесса пула терминала {name} - {exception}", name=process.name, exception=response)
+            return None
+
+        return response
+
+    # endregion
+
+
+def __worker_main__(connection, metatrader_path: str, login: int, password: str, server: str, logger_name: str,
+                    terminal_factory: Callable[[], TerminalBackend] | None) -> None:
+    # Переподключение к терминалу - та же логика __connect_and_do_work__, что и в основном процессе
+    from metatrader.terminal_integration import MetaTrader5Integration
+
+    terminal = terminal_factory() if terminal_factory is not None else None
+    mt5 = MetaTrader5Integration(metatrader_path, login, password, server, logging.getLogger(logger_name), terminal=terminal)
+
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            return
+
+        if task is None:
+            return
+
+        symbols, timeframe_str, count, shared_memory_name, offset = task
+
+        try:
+            if not mt5.mt5_connect_status:
+                raise Exception(mt5.mt5_connect_last_error)
+
+            rates_by_symbol = mt5.get_last_quotes_rates(symbols, timeframe_str, count)
+
+            shared_memory = SharedMemory(shared_memory_name)
+            buffer = numpy.ndarray((len(symbols) * count,), dtype=rates_dtype, buffer=shared_memory.buf, offset=offset * count * rates_dtype.itemsize)
+            counts = []
+
+            for i, symbol in enumerate(symbols):
+                rates = rates_by_symbol[symbol]
+                buffer[i * count:i * count + len(rates)] = rates
+                counts.append(len(rates))
+
+            del buffer
+            shared_memory.close()
+
+            connection.send(counts)
+        except Exception as e:
+            connection.send(f'{e}')
@@ -0,0 +1,495 @@
+import bisect
+import time
+import zlib
+from collections import namedtuple
+
+import numpy
+
+from metatrader.enums.timeframe_enum import Metatrader5TimeframeEnum
+from metatrader.models.metatrader_quote import rates_dtype
+
+# Детерминированный терминал в памяти процесса: те же функции и именованные кортежи, что и у MetaTrader5.
+# Нужен, чтобы профилировать и нагружать сервис без Windows и брокерского счета
+
+# region MetaTrader5 types
+AccountInfo = namedtuple('AccountInfo', [
+    'login', 'trade_mode', 'leverage', 'limit_orders', 'margin_so_mode', 'trade_allowed', 'trade_expert', 'margin_mode',
+    'currency_digits', 'fifo_close', 'balance', 'credit', 'profit', 'equity', 'margin', 'margin_free', 'margin_level',
+    'margin_so_call', 'margin_so_so', 'margin_initial', 'margin_maintenance', 'assets', 'liabilities', 'commission_blocked',
+    'name', 'server', 'currency', 'company'])
+
+TerminalInfo = namedtuple('TerminalInfo', [
+    'community_account', 'community_connection', 'connected', 'dlls_allowed', 'trade_allowed', 'tradeapi_disabled',
+    'email_enabled', 'ftp_enabled', 'notifications_enabled', 'mqid', 'build', 'maxbars', 'codepage', 'ping_last',
+    'community_balance', 'retransmission', 'company', 'name', 'language', 'path', 'data_path', 'commondata_path'])
+
+SymbolInfo = namedtuple('SymbolInfo', [
+    'custom', 'chart_mode', 'select', 'visible', 'session_deals', 'session_buy_orders', 'session_sell_orders', 'volume',
+    'volumehigh', 'volumelow', 'time', 'digits', 'spread', 'spread_float', 'ticks_bookdepth', 'trade_calc_mode',
+    'trade_mode', 'start_time', 'expiration_time', 'trade_stops_level', 'trade_freeze_level', 'trade_exemode',
+    'swap_mode', 'swap_rollover3days', 'margin_hedged_use_leg', 'expiration_mode', 'filling_mode', 'order_mode',
+    'order_gtc_mode', 'option_mode', 'option_right', 'bid', 'bidhigh', 'bidlow', 'ask', 'askhigh', 'asklow', 'last',
+    'lasthigh', 'lastlow', 'volume_real', 'volumehigh_real', 'volumelow_real', 'option_strike', 'point',
+    'trade_tick_value', 'trade_tick_value_profit', 'trade_tick_value_loss', 'trade_tick_size', 'trade_contract_size',
+    'trade_accrued_interest', 'trade_face_value', 'trade_liquidity_rate', 'volume_min', 'volume_max', 'volume_step',
+    'volume_limit', 'swap_long', 'swap_short', 'margin_initial', 'margin_maintenance', 'session_volume',
+    'session_turnover', 'session_interest', 'session_buy_orders_volume', 'session_sell_orders_volume', 'session_open',
+    'session_close', 'session_aw', 'session_price_settlement', 'session_price_limit_min', 'session_price_limit_max',
+    'margin_hedged', 'price_change', 'price_volatility', 'price_theoretical', 'price_greeks_delta',
+    'price_greeks_theta', 'price_greeks_gamma', 'price_greeks_vega', 'price_greeks_rho', 'price_greeks_omega',
+    'price_sensitivity', 'basis', 'category', 'currency_base', 'currency_profit', 'currency_margin', 'bank',
+    'description', 'exchange', 'formula', 'isin', 'name', 'page', 'path'])
+
+TradePosition = namedtuple('TradePosition', [
+    'ticket', 'time', 'time_msc', 'time_update', 'time_update_msc', 'type', 'magic', 'identifier', 'reason', 'volume',
+    'price_open', 'sl', 'tp', 'price_current', 'swap', 'profit', 'symbol', 'comment', 'external_id'])
+
+TradeDeal = namedtuple('TradeDeal', [
+    'ticket', 'order', 'time', 'time_msc', 'type', 'entry', 'magic', 'position_id', 'reason', 'volume', 'price',
+    'commission', 'swap', 'profit', 'fee', 'symbol', 'comment', 'external_id'])
+
+TradeOrder = namedtuple('TradeOrder', [
+    'ticket', 'time_setup', 'time_setup_msc', 'time_done', 'time_done_msc', 'time_expiration', 'type', 'type_time',
+    'type_filling', 'state', 'magic', 'position_id', 'position_by_id', 'reason', 'volume_initial', 'volume_current',
+    'price_open', 'sl', 'tp', 'price_current', 'price_stoplimit', 'symbol', 'comment', 'external_id'])
+
+TradeRequest = namedtuple('TradeRequest', [
+    'action', 'magic', 'order', 'symbol', 'volume', 'price', 'stoplimit', 'sl', 'tp', 'deviation', 'type',
+    'type_filling', 'type_time', 'expiration', 'comment', 'position', 'position_by'])
+
+OrderSendResult = namedtuple('OrderSendResult', [
+    'retcode', 'deal', 'order', 'volume', 'price', 'bid', 'ask', 'comment', 'request_id', 'retcode_external', 'request'])
+
+OrderCheckResult = namedtuple('OrderCheckResult', [
+    'retcode', 'balance', 'equity', 'profit', 'margin', 'margin_free', 'margin_level', 'comment', 'request'])
+
+# endregion
+
+symbol_names = ['EURUSD', 'GBPUSD', 'USDJPY', 'USDCHF', 'AUDUSD', 'USDCAD', 'NZDUSD', 'EURGBP', 'EURJPY', 'XAUUSD']
+base_time = 1_600_000_000
+
+RES_S_OK = (1, 'Success')
+RES_E_INVALID_PARAMS = (-2, 'Invalid arguments')
+RES_E_NOT_FOUND = (-4, 'Not found')
+RES_E_INTERNAL_FAIL_SEND = (-10001, 'IPC send failed')
+RES_E_INTERNAL_FAIL_INIT = (-10005, 'IPC initialize failed')
+TRADE_RETCODE_DONE = 10009
+
+
+# region Builders
+def create_account_info() -> AccountInfo:
+    return AccountInfo(1234567, 0, 100, 200, 0, True, True, 2, 2, False, 10000.0, 0.0, 12.5, 10012.5, 350.2, 9662.3,
+                       2859.07, 100.0, 50.0, 0.0, 0.0, 0.0, 0.0, 0.0, 'Test account', 'Broker-Demo', 'USD', 'Broker Ltd.')
+
+
+def create_symbol_info(index: int) -> SymbolInfo:
+    name = f'{symbol_names[index % len(symbol_names)]}{index // len(symbol_names) or ""}'
+    currency_base, currency_profit = name[:3], name[3:6]
+    # Forex-символ с лотом 100000 и тиком 0.00001; стоимость тика в долларах счета - через цену, если прибыль не в долларах
+    tick_value = 1.0 if currency_profit == 'USD' else round(1 / (1.1 + index * 0.01 + 0.00003), 5)
+    values = []
+
+    for field in SymbolInfo._fields:
+        if field in ('custom', 'select', 'visible', 'spread_float', 'margin_hedged_use_leg'):
+            values.append(index % 2 == 0)
+        elif field in ('bid', 'ask', 'last', 'bidhigh', 'bidlow', 'askhigh', 'asklow', 'lasthigh', 'lastlow', 'session_open', 'session_close'):
+            values.append(1.1 + index * 0.01 + len(field) * 0.00001)
+        elif field == 'trade_calc_mode':
+            values.append(0)
+        elif field == 'trade_contract_size':
+            values.append(100000.0)
+        elif field in ('point', 'trade_tick_size'):
+            values.append(0.00001)
+        elif field in ('trade_tick_value', 'trade_tick_value_profit', 'trade_tick_value_loss'):
+            values.append(tick_value)
+        elif field == 'margin_initial':
+            values.append(0.0)
+        elif field.startswith(('volume_', 'trade_', 'price_', 'session_', 'swap_l', 'swap_s', 'margin_', 'option_strike', 'point')):
+            values.append(round(0.1 * (len(field) + index), 5))
+        elif field in ('basis', 'category', 'bank', 'exchange', 'formula', 'isin', 'page'):
+            values.append('')
+        elif field in ('currency_base', 'currency_margin'):
+            values.append(currency_base)
+        elif field == 'currency_profit':
+            values.append(currency_profit)
+        elif field == 'name':
+            values.append(name)
+        elif field == 'description':
+            values.append(f'Synthetic instrument {name}')
+        elif field == 'path':
+            values.append(f'Forex\\{name}')
+        else:
+            values.append(len(field) + index)
+
+    return SymbolInfo(*values)
+
+
+def create_position(index: int) -> TradePosition:
+    time = base_time + index * 3600
+    return TradePosition(100000 + index, time, time * 1000, time + 60, (time + 60) * 1000, index % 2, 0, 100000 + index, 3,
+                         0.1 * (index % 10 + 1), 1.1 + index * 0.001, 1.09, 0.0, 1.1012, -0.5, 1.2 * index,
+                         symbol_names[index % len(symbol_names)], '', '')
+
+
+def create_deal(index: int) -> TradeDeal:
+    time = base_time + index * 600
+    return TradeDeal(200000 + index, 300000 + index, time, time * 1000, index % 2, index % 2, 0, 100000 + index // 2, 3,
+                     0.1 * (index % 10 + 1), 1.1 + index * 0.0001, -0.35, 0.0, round(index * 0.37 - 50, 2), 0.0,
+                     symbol_names[index % len(symbol_names)], '', '')
+
+
+def create_order(index: int) -> TradeOrder:
+    time = base_time + index * 600
+    return TradeOrder(300000 + index, time, time * 1000, time + 1, (time + 1) * 1000, 0, index % 2, 0, 1, 4, 0,
+                      100000 + index // 2, 0, 3, 0.1 * (index % 10 + 1), 0.0, 1.1 + index * 0.0001, 0.0, 0.0,
+                      1.1 + index * 0.0001, 0.0, symbol_names[index % len(symbol_names)], '', '')
+
+
+def create_trade_request(symbol: str = 'EURUSD') -> TradeRequest:
+    return TradeRequest(1, 0, 0, symbol, 0.1, 0.0, 0.0, 1.09, 0.0, 0, 0, 0, 0, 0, '', 0, 0)
+
+
+def create_order_send_result() -> OrderSendResult:
+    return OrderSendResult(10009, 200001, 300001, 0.1, 1.1012, 1.1011, 1.1012, 'Request executed', 1, 0, create_trade_request())
+
+
+def create_order_check_result() -> OrderCheckResult:
+    return OrderCheckResult(0, 10000.0, 10012.5, 12.5, 110.12, 9902.38, 9092.36, 'Done', create_trade_request())
+
+
+def create_rates(count: int, start_time: int = base_time, bar_seconds: int = 60, seed: int = 42) -> numpy.ndarray:
+    random = numpy.random.default_rng(seed)
+    close = 1.1 + numpy.cumsum(random.normal(0, 0.0005, count)).round(5)
+
+    rates = numpy.empty(count, dtype=rates_dtype)
+    rates['time'] = start_time + numpy.arange(count, dtype='int64') * bar_seconds
+    rates['open'] = numpy.roll(close, 1)
+    rates['high'] = close + 0.0003
+    rates['low'] = close - 0.0003
+    rates['close'] = close
+    rates['tick_volume'] = 100
+    rates['spread'] = 2
+    rates['real_volume'] = 0
+
+    return rates
+
+
+# endregion
+
+
+class TerminalSimulator:
+    """
+    Реализация TerminalBackend в памяти: symbols_count символов, positions_count открытых позиций,
+    history_size сделок и ордеров в истории, bars_count баров на каждую пару символ/таймфрейм.
+    Данные зависят только от параметров и seed, каждое обращение задерживается на latency_seconds.
+    """
+
+    TRADE_ACTION_DEAL = 1
+    TRADE_ACTION_SLTP = 6
+    ORDER_FILLING_RETURN = 2
+
+    def __init__(self, symbols_count: int = 100, positions_count: int = 20, history_size: int = 10000,
+                 bars_count: int = 100000, latency_seconds: float = 0.0, now: int = 1_750_000_000, seed: int = 42):
+        self.bars_count = bars_count
+        self.latency_seconds = latency_seconds
+        self.now = now
+        self.seed = seed
+
+        self.error = RES_S_OK
+        self.is_initialized = False
+        self.is_closed = False
+        self.failed_initializations = 0
+
+        self.account = create_account_info()
+        self.symbols = tuple(create_symbol_info(i) for i in range(symbols_count))
+        self.symbols_by_name = {x.name: x for x in self.symbols}
+        self.positions = [create_position(i) for i in range(positions_count)]
+        self.deals = [create_deal(i) for i in range(history_size)]
+        self.orders = [create_order(i) for i in range(history_size)]
+        self.active_orders: list[TradeOrder] = []
+
+        self.rates: dict[tuple[str, int], numpy.ndarray] = {}
+        self.next_ticket = 1000000
+
+    # region Terminal
+    def initialize(self, path: str = '', login: int = 0, password: str = '', server: str = '') -> bool:
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+        # Терминал после close_terminal поднимается не с первой попытки
+        if self.failed_initializations > 0:
+            self.failed_initializations -= 1
+            self.error = RES_E_INTERNAL_FAIL_INIT
+            return False
+
+        self.error = RES_S_OK
+        self.is_closed = False
+        self.is_initialized = True
+        return True
+
+    def shutdown(self) -> None:
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+        self.is_initialized = False
+
+    def close_terminal(self, failed_initializations: int = 0) -> None:
+        """Терминал закрыт: обращения возвращают None с ошибкой -10001, initialize удается после failed_initializations неудач"""
+        self.is_closed = True
+        self.failed_initializations = failed_initializations
+
+    def place_pending_order(self, symbol: str, volume: float, price: float, time_setup: int) -> int:
+        """Отложенный ордер (buy limit), выставленный в time_setup: виден в orders_get до исполнения"""
+        ticket = self.next_ticket
+        self.next_ticket += 1
+
+        self.active_orders.append(TradeOrder(ticket, time_setup, time_setup * 1000, 0, 0, 0, 2, 0, self.ORDER_FILLING_RETURN, 1, 0, 0, 0, 3,
+                                             volume, volume, price, 0.0, 0.0, price, 0.0, symbol, '', ''))
+        return ticket
+
+    def fill_pending_order(self, ticket: int) -> None:
+        """Отложенный ордер исполнен сейчас: уходит в историю со своим прежним time_setup, появляется сделка"""
+        order = next(x for x in self.active_orders if x.ticket == ticket)
+        self.active_orders.remove(order)
+
+        bisect.insort(self.orders, order._replace(time_done=self.now, time_done_msc=self.now * 1000, state=4, volume_current=0.0),
+                      key=lambda x: x.time_setup)
+        self.deals.append(TradeDeal(self.next_ticket, ticket, self.now, self.now * 1000, 0, 0, 0, ticket, 3,
+                                    order.volume_initial, order.price_open, 0.0, 0.0, 0.0, 0.0, order.symbol, '', ''))
+        self.next_ticket += 1
+
+    def last_error(self) -> tuple[int, str]:
+        return self.error
+
+    def version(self) -> tuple:
+        if not self.__simulate_call__():
+            return None
+
+        return 500, 5640, '20 Feb 2026'
+
+    def terminal_info(self) -> TerminalInfo:
+        if not self.__simulate_call__():
+            return None
+
+        return TerminalInfo(False, False, True, False, True, False, False, False, False, False, 5640, 100000, 0, 0,
+                            0.0, 0.0, 'Broker Ltd.', 'MetaTrader 5 Simulator', 'English', '', '', '')
+
+    def account_info(self) -> AccountInfo:
+        if not self.__simulate_call__():
+            return None
+
+        return self.account
+
+    # endregion
+
+    # region Symbols
+    def symbols_get(self) -> tuple:
+        if not self.__simulate_call__():
+            return None
+
+        return self.symbols
+
+    def symbol_info(self, symbol: str) -> SymbolInfo | None:
+        if not self.__simulate_call__():
+            return None
+
+        return self.__find_symbol__(symbol)
+
+    # endregion
+
+    # region Rates
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int) -> numpy.ndarray | None:
+        if not self.__simulate_call__():
+            return None
+
+        rates = self.__get_rates__(symbol, timeframe)
+
+        if rates is None:
+            return None
+
+        end = max(0, len(rates) - start_pos)
+        return rates[max(0, end - count):end].copy()
+
+    def copy_rates_range(self, symbol: str, timeframe: int, date_from: int, date_to: int) -> numpy.ndarray | None:
+        if not self.__simulate_call__():
+            return None
+
+        rates = self.__get_rates__(symbol, timeframe)
+
+        if rates is None:
+            return None
+
+        start = numpy.searchsorted(rates['time'], date_from, side='left')
+        end = numpy.searchsorted(rates['time'], date_to, side='right')
+        return rates[start:end].copy()
+
+    # endregion
+
+    # region Positions and orders
+    def positions_get(self) -> tuple:
+        if not self.__simulate_call__():
+            return None
+
+        return tuple(self.positions)
+
+    def orders_get(self) -> tuple:
+        if not self.__simulate_call__():
+            return None
+
+        return tuple(self.active_orders)
+
+    def order_send(self, request: dict) -> OrderSendResult | None:
+        if not self.__simulate_call__():
+            return None
+
+        trade_request = self.__create_trade_request__(request)
+
+        if trade_request is None:
+            return None
+
+        symbol_info = self.symbols_by_name[trade_request.symbol]
+
+        if trade_request.action == self.TRADE_ACTION_SLTP:
+            for i, position in enumerate(self.positions):
+                if position.identifier == trade_request.position:
+                    self.positions[i] = position._replace(sl=trade_request.sl, time_update=self.now, time_update_msc=self.now * 1000)
+                    return OrderSendResult(TRADE_RETCODE_DONE, 0, 0, position.volume, 0.0, symbol_info.bid, symbol_info.ask,
+                                           'Request executed', 1, 0, trade_request)
+
+            self.error = RES_E_NOT_FOUND
+            return None
+
+        ticket = self.next_ticket
+        self.next_ticket += 1
+        price = symbol_info.ask if trade_request.type == 0 else symbol_info.bid
+
+        self.positions.append(TradePosition(ticket, self.now, self.now * 1000, self.now, self.now * 1000, trade_request.type, 0,
+                                            ticket, 3, trade_request.volume, price, trade_request.sl, 0.0, price, 0.0, 0.0,
+                                            trade_request.symbol, '', ''))
+        self.orders.append(TradeOrder(ticket, self.now, self.now * 1000, self.now, self.now * 1000, 0, trade_request.type, 0,
+                                      self.ORDER_FILLING_RETURN, 4, 0, ticket, 0, 3, trade_request.volume, 0.0, price,
+                                      trade_request.sl, 0.0, price, 0.0, trade_request.symbol, '', ''))
+        self.deals.append(TradeDeal(ticket, ticket, self.now, self.now * 1000, trade_request.type, 0, 0, ticket, 3,
+                                    trade_request.volume, price, 0.0, 0.0, 0.0, 0.0, trade_request.symbol, '', ''))
+
+        return OrderSendResult(TRADE_RETCODE_DONE, ticket, ticket, trade_request.volume, price, symbol_info.bid, symbol_info.ask,
+                               'Request executed', 1, 0, trade_request)
+
+    def order_check(self, request: dict) -> OrderCheckResult | None:
+        if not self.__simulate_call__():
+            return None
+
+        trade_request = self.__create_trade_request__(request)
+
+        if trade_request is None:
+            return None
+
+        symbol_info = self.symbols_by_name[trade_request.symbol]
+        margin = trade_request.volume * symbol_info.trade_contract_size * symbol_info.ask / self.account.leverage
+        margin_free = self.account.margin_free - margin
+
+        return OrderCheckResult(0, self.account.balance, self.account.equity, self.account.profit, self.account.margin + margin,
+                                margin_free, round(self.account.equity / (self.account.margin + margin) * 100, 2), 'Done', trade_request)
+
+    def order_calc_profit(self, action: int, symbol: str, volume: float, price_open: float, price_close: float) -> float | None:
+        if not self.__simulate_call__():
+            return None
+
+        symbol_info = self.__find_symbol__(symbol)
+
+        if symbol_info is None:
+            return None
+
+        # Простая модель, не зависящая от trade_calculator: прибыль и маржа считаются сразу в валюте счета,
+        # без перевода из валюты прибыли - совпадает с терминалом только для символов с прибылью в валюте счета (XXXUSD)
+        direction = 1 if action == 0 else -1
+        return round(direction * (price_close - price_open) * volume * symbol_info.trade_contract_size, 2)
+
+    def order_calc_margin(self, action: int, symbol: str, volume: float, price: float) -> float | None:
+        if not self.__simulate_call__():
+            return None
+
+        symbol_info = self.__find_symbol__(symbol)
+
+        if symbol_info is None:
+            return None
+
+        return round(volume * symbol_info.trade_contract_size * price / self.account.leverage, 2)
+
+    def Close(self, symbol: str) -> bool:
+        if not self.__simulate_call__():
+            return None
+
+        positions_count = len(self.positions)
+        self.positions = [x for x in self.positions if x.symbol != symbol]
+
+        return len(self.positions) < positions_count
+
+    # endregion
+
+    # region History
+    def history_deals_get(self, date_from: int, date_to: int) -> tuple:
+        if not self.__simulate_call__():
+            return None
+
+        return self.__between__(self.deals, lambda x: x.time, date_from, date_to)
+
+    def history_orders_get(self, date_from: int, date_to: int) -> tuple:
+        if not self.__simulate_call__():
+            return None
+
+        return self.__between__(self.orders, lambda x: x.time_setup, date_from, date_to)
+
+    # endregion
+
+    # region private
+    def __simulate_call__(self) -> bool:
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+        if self.is_closed:
+            self.error = RES_E_INTERNAL_FAIL_SEND
+            return False
+
+        self.error = RES_S_OK
+        return True
+
+    def __find_symbol__(self, symbol: str) -> SymbolInfo | None:
+        symbol_info = self.symbols_by_name.get(symbol)
+
+        if symbol_info is None:
+            self.error = RES_E_NOT_FOUND
+
+        return symbol_info
+
+    def __get_rates__(self, symbol: str, timeframe: int) -> numpy.ndarray | None:
+        if self.__find_symbol__(symbol) is None:
+            return None
+
+        rates = self.rates.get((symbol, timeframe))
+
+        if rates is None:
+            bar_seconds = Metatrader5TimeframeEnum(timeframe).seconds
+            # Последний бар - формирующийся, его время не позже now
+            start_time = (self.now // bar_seconds - self.bars_count + 1) * bar_seconds
+            rates = create_rates(self.bars_count, start_time, bar_seconds, self.seed ^ zlib.crc32(f'{symbol}_{timeframe}'.encode()))
+            self.rates[(symbol, timeframe)] = rates
+
+        return rates
+
+    def __create_trade_request__(self, request: dict) -> TradeRequest | None:
+        if request.get('symbol') not in self.symbols_by_name:
+            self.error = RES_E_INVALID_PARAMS
+            return None
+
+        return TradeRequest(request.get('action', 0), 0, 0, request['symbol'], request.get('volume', 0.0), 0.0, 0.0,
+                            request.get('sl', 0.0), 0.0, 0, request.get('type', 0), request.get('type_filling', 0), 0, 0,
+                            '', request.get('position', 0), 0)
+
+    @staticmethod
+    def __between__(items: list[tuple], get_time, date_from: int, date_to: int) -> tuple:
+        start = bisect.bisect_left(items, date_from, key=get_time)
+        end = bisect.bisect_right(items, date_to, key=get_time)
+        return tuple(items[start:end])
+
+    # endregion
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Hashable
+
+
+class TerminalStateCache:
+    """
+    Состояние терминала только для чтения (версия, terminal_info, account_info, symbol_info) в памяти на ttl_seconds[метод].
+
+    Метод без TTL или с TTL 0 не кэшируется. Ключ - (метод, аргументы...). Собственные сделки сервиса сбрасывают
+    затронутые ключи (invalidate), и если значение читалось из терминала одновременно со сделкой, оно не сохраняется:
+    у каждого метода есть поколение, которое растет при сбросе
+    """
+
+    def __init__(self, ttl_seconds: dict[str, float]):
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+
+        self.entries: dict[Hashable, tuple[float, object]] = {}
+        self.generations: Counter[str] = Counter()
+
+        self.hits = Counter()
+        self.misses = Counter()
+        self.invalidations = Counter()
+
+    def get(self, key: tuple, load: Callable[[], object]):
+        method = key[0]
+        ttl = self.ttl_seconds.get(method, 0)
+
+        if ttl <= 0:
+            return load()
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits[method] += 1
+                return entry[1]
+
+            self.misses[method] += 1
+            generation = self.generations[method]
+
+        value = load()
+
+        with self.lock:
+            if self.generations[method] == generation:
+                self.entries[key] = (time.monotonic() + ttl, value)
+
+        return value
+
+    def invalidate(self, *keys: tuple) -> None:
+        # Ключ из одного метода - сброс всех значений метода, например ('symbol_info',) - всех символов
+        with self.lock:
+            for key in keys:
+                method = key[0]
+                self.generations[method] += 1
+                self.invalidations[method] += 1
+
+                if len(key) == 1:
+                    for cached_key in [x for x in self.entries if x[0] == method]:
+                        del self.entries[cached_key]
+                else:
+                    self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.generations.update(self.ttl_seconds.keys())
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {method: {'ttlSeconds': ttl, 'hits': self.hits[method], 'misses': self.misses[method],
+                             'invalidations': self.invalidations[method]}
+                    for method, ttl in self.ttl_seconds.items()}
@@ -0,0 +1,55 @@
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from logging import Logger
+
+from auxiliary import metrics
+
+
+class TerminalWorker:
+    """
+    Поток-владелец соединения с MetaTrader5.
+
+    Библиотека MetaTrader5 не потокобезопасна, поэтому все обращения к ней выполняются
+    в одном потоке через ограниченную очередь, а потоки веб-сервера только ждут результат.
+    """
+
+    def __init__(self, queue_size: int, put_timeout: float, logger: Logger):
+        self.logger = logger
+        self.put_timeout = put_timeout
+
+        self.queue: queue.Queue[tuple[Callable, Future, float]] = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self.__run__, name='mt5-worker', daemon=True)
+        self.thread.start()
+
+    def call(self, func: Callable):
+        # Вложенные вызовы (например, update_stop_loss -> get_opened_positions) уже в потоке-владельце
+        if threading.current_thread() is self.thread:
+            return func()
+
+        future = Future()
+
+        try:
+            self.queue.put((func, future, time.perf_counter()), timeout=self.put_timeout)
+        except queue.Full:
+            raise Exception(f'Очередь обращений к MetaTrader переполнена ({self.queue.maxsize})')
+
+        return future.result()
+
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    def __run__(self) -> None:
+        while True:
+            func, future, enqueued = self.queue.get()
+            metrics.terminal_queue_wait_seconds.observe(time.perf_counter() - enqueued)
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                future.set_result(func())
+            except BaseException as e:
+                future.set_exception(e)
@@ -0,0 +1,141 @@
+from datetime import datetime, UTC
+
+import numpy
+from dateutil.parser import parse
+
+# Время MetaTrader - unix-время по часам сервера брокера (кривое время): настоящее UTC получается вычитанием смещения.
+# Смещение задается при запуске сервиса (BROKER_UTC_OFFSET_SECONDS), по умолчанию - 3 часа
+broker_utc_offset_seconds = 3 * 60 * 60
+
+# Две цифры числа 0..99 кодами символов - строки ISO 8601 собираются из кодов прямо в массиве numpy.str_ (UCS-4)
+two_digits = numpy.array([[ord(str(x // 10)), ord(str(x % 10))] for x in range(100)], dtype='uint32')
+
+
+def set_broker_utc_offset(seconds: int) -> None:
+    global broker_utc_offset_seconds
+    broker_utc_offset_seconds = seconds
+
+
+def is_utc(date_time: datetime) -> bool:
+    return date_time.strftime('%Z') == 'UTC'
+
+
+# region Scalar
+def unix_time_to_datetime(unix_time: int) -> datetime:
+    # Корректировка кривого времени в MetaTrader
+    return datetime.fromtimestamp(unix_time - broker_utc_offset_seconds, UTC)
+
+
+def datetime_to_unix_time(date_time: datetime) -> int:
+    if date_time.tzinfo is not UTC and not is_utc(date_time):
+        raise ValueError(f'{date_time} is not UTC')
+
+    # Корректировка кривого времени в MetaTrader
+    return int(date_time.timestamp()) + broker_utc_offset_seconds
+
+
+def datetime_str_to_unix_time(date_time_str: str) -> int:
+    # Даты в запросах - ISO 8601, их разбирает datetime.fromisoformat без dateutil
+    try:
+        date_time = datetime.fromisoformat(date_time_str)
+    except ValueError:
+        date_time = parse(date_time_str)
+
+    if date_time.tzinfo is not UTC and not is_utc(date_time):
+        raise ValueError(f'{date_time_str} is not UTC')
+
+    return datetime_to_unix_time(date_time)
+
+
+# endregion
+
+# region Vectorized
+def corrected_unix_times(unix_times: numpy.ndarray) -> numpy.ndarray:
+    # Корректировка кривого времени в MetaTrader для целого столбца
+    return unix_times.astype('int64') - broker_utc_offset_seconds
+
+
+def unix_times_to_datetime64(unix_times: numpy.ndarray) -> numpy.ndarray:
+    return corrected_unix_times(unix_times).astype('datetime64[s]')
+
+
+def unix_times_to_iso_strings(unix_times: numpy.ndarray, quoted: bool = False) -> numpy.ndarray:
+    """
+    Векторный аналог unix_time_to_datetime(...).isoformat() для целого столбца времени: 'YYYY-MM-DDTHH:MM:SS+00:00',
+    с quoted - в кавычках, готовые значения JSON. Дата и время суток собираются из таблиц кодов символов
+    без промежуточных строк: дата считается один раз на день диапазона, время суток - из таблицы на 86400 секунд
+    """
+    days, seconds_of_day = numpy.divmod(corrected_unix_times(unix_times), 24 * 60 * 60)
+
+    prefix, suffix = ('"', '+00:00"') if quoted else ('', '+00:00')
+    start = len(prefix)
+    width = start + 19 + len(suffix)
+
+    chars = numpy.empty((len(days), width), dtype='uint32')
+    chars[:, :start] = [ord(x) for x in prefix]
+    chars[:, start + 19:] = [ord(x) for x in suffix]
+
+    if len(days) > 0:
+        first_day, last_day = int(days.min()), int(days.max())
+
+        # Бары и сделки плотно лежат во времени: дат в диапазоне обычно намного меньше, чем значений
+        if last_day - first_day < len(days):
+            chars[:, start:start + 10] = __date_chars__(numpy.arange(first_day, last_day + 1))[days - first_day]
+        else:
+            chars[:, start:start + 10] = __date_chars__(days)
+
+        chars[:, start + 10:start + 19] = __time_of_day_chars__()[seconds_of_day]
+
+    return chars.view(f'U{width}').reshape(len(days))
+
+
+# endregion
+
+# region private
+def __date_chars__(days: numpy.ndarray) -> numpy.ndarray:
+    # Дни от 1970-01-01 -> 'YYYY-MM-DD' (civil_from_days, H. Hinnant), годы 0..9999
+    shifted_days = days + 719468
+    era = shifted_days // 146097
+    day_of_era = shifted_days - era * 146097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    shifted_month = (5 * day_of_year + 2) // 153
+
+    day = day_of_year - (153 * shifted_month + 2) // 5 + 1
+    month = numpy.where(shifted_month < 10, shifted_month + 3, shifted_month - 9)
+    year = year_of_era + era * 400 + (month <= 2)
+
+    chars = numpy.empty((len(days), 10), dtype='uint32')
+    chars[:, 0:2] = two_digits[year // 100]
+    chars[:, 2:4] = two_digits[year % 100]
+    chars[:, 4] = ord('-')
+    chars[:, 5:7] = two_digits[month]
+    chars[:, 7] = ord('-')
+    chars[:, 8:10] = two_digits[day]
+
+    return chars
+
+
+def __time_of_day_chars__() -> numpy.ndarray:
+    # 'THH:MM:SS' для каждой секунды суток, строится при первом обращении
+    global time_of_day_chars
+
+    if time_of_day_chars is None:
+        seconds = numpy.arange(24 * 60 * 60)
+
+        chars = numpy.empty((len(seconds), 9), dtype='uint32')
+        chars[:, 0] = ord('T')
+        chars[:, 1:3] = two_digits[seconds // 3600]
+        chars[:, 3] = ord(':')
+        chars[:, 4:6] = two_digits[seconds // 60 % 60]
+        chars[:, 6] = ord(':')
+        chars[:, 7:9] = two_digits[seconds % 60]
+
+        time_of_day_chars = chars
+
+    return time_of_day_chars
+
+# endregion
+
+
+time_of_day_chars: numpy.ndarray | None = None
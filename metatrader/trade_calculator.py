@@ -0,0 +1,96 @@
+import numpy
+
+from metatrader.enums.order_type_enum import Metatrader5OrderTypeEnum
+
+# Режимы расчета маржи и прибыли символа (symbol_info.trade_calc_mode, ENUM_SYMBOL_CALC_MODE)
+calc_mode_forex = 0
+calc_mode_futures = 1
+calc_mode_cfd = 2
+calc_mode_cfd_index = 3
+calc_mode_cfd_leverage = 4
+calc_mode_forex_no_leverage = 5
+calc_mode_exch_stocks = 32
+calc_mode_exch_futures = 33
+calc_mode_exch_futures_forts = 34
+calc_mode_exch_stocks_moex = 38
+
+# Маржа на лот для режима: в валюте маржи символа, кроме cfd_index - сразу в валюте счета.
+# Для forex и cfd вместо размера контракта - начальная маржа символа, если она задана (как в терминале)
+margin_formulas = {
+    calc_mode_forex: lambda symbol_info, leverage, prices: __margin_contract_size__(symbol_info) / leverage,
+    calc_mode_forex_no_leverage: lambda symbol_info, leverage, prices: __margin_contract_size__(symbol_info),
+    calc_mode_cfd: lambda symbol_info, leverage, prices: __margin_contract_size__(symbol_info) * prices,
+    calc_mode_cfd_leverage: lambda symbol_info, leverage, prices: __margin_contract_size__(symbol_info) * prices / leverage,
+    calc_mode_cfd_index: lambda symbol_info, leverage, prices:
+        __margin_contract_size__(symbol_info) * prices * symbol_info.trade_tick_value / symbol_info.trade_tick_size,
+    calc_mode_futures: lambda symbol_info, leverage, prices: symbol_info.margin_initial,
+    calc_mode_exch_futures: lambda symbol_info, leverage, prices: symbol_info.margin_initial,
+    calc_mode_exch_futures_forts: lambda symbol_info, leverage, prices: symbol_info.margin_initial,
+    calc_mode_exch_stocks: lambda symbol_info, leverage, prices: symbol_info.trade_contract_size * prices,
+    calc_mode_exch_stocks_moex: lambda symbol_info, leverage, prices: symbol_info.trade_contract_size * prices,
+}
+
+
+def __margin_contract_size__(symbol_info: tuple) -> float:
+    return symbol_info.margin_initial if symbol_info.margin_initial > 0 else symbol_info.trade_contract_size
+
+
+def __direction__(order_type: int) -> int:
+    return 1 if order_type == Metatrader5OrderTypeEnum.ORDER_TYPE_BUY.value else -1
+
+
+def __profit_to_account_rate__(symbol_info: tuple) -> float:
+    # Стоимость тика - изменение цены на trade_tick_size для одного лота в валюте счета, отсюда курс валюты прибыли к валюте счета
+    return symbol_info.trade_tick_value / (symbol_info.trade_tick_size * symbol_info.trade_contract_size)
+
+
+def calc_profit(symbol_info: tuple, order_type: int, volumes: numpy.ndarray, prices_open: numpy.ndarray | float,
+                prices_close: numpy.ndarray) -> numpy.ndarray:
+    """
+    Прибыль в валюте счета для массивов объемов и цен (как order_calc_profit, массивы согласуются по правилам numpy).
+
+    Для всех режимов расчета прибыль - число тиков изменения цены на стоимость тика и объем, стоимость тика
+    выигрыша и проигрыша терминал считает отдельно (trade_tick_value_profit / trade_tick_value_loss).
+    Результат приблизительный, пока его не подтвердит verify_order_calc
+    """
+    price_changes = __direction__(order_type) * (numpy.asarray(prices_close, dtype='float64') - prices_open)
+    tick_values = numpy.where(price_changes >= 0,
+                              symbol_info.trade_tick_value_profit or symbol_info.trade_tick_value,
+                              symbol_info.trade_tick_value_loss or symbol_info.trade_tick_value)
+
+    return price_changes / symbol_info.trade_tick_size * tick_values * volumes
+
+
+def calc_margin(symbol_info: tuple, account_info: tuple, order_type: int, volumes: numpy.ndarray,
+                prices: numpy.ndarray) -> numpy.ndarray:
+    """
+    Маржа в валюте счета для массивов объемов и цен (как order_calc_margin, массивы согласуются по правилам numpy).
+
+    Маржа на лот считается по trade_calc_mode символа и переводится из валюты маржи в валюту счета: для forex валюта
+    маржи - базовая, через цену она переводится в валюту прибыли, валюта прибыли - через стоимость тика.
+    Коэффициенты маржи символа (SymbolInfoMarginRate) модулю MetaTrader5 недоступны и считаются равными 1.
+    Формулы не сверены с живым терминалом: результат приблизительный, пока его не подтвердит verify_order_calc
+    """
+    margin_formula = margin_formulas.get(symbol_info.trade_calc_mode)
+
+    if margin_formula is None:
+        raise Exception(f'Calculation mode {symbol_info.trade_calc_mode} of symbol \'{symbol_info.name}\' is not supported.')
+
+    prices = numpy.asarray(prices, dtype='float64')
+    margins = margin_formula(symbol_info, account_info.leverage, prices) * numpy.asarray(volumes, dtype='float64')
+
+    if symbol_info.trade_calc_mode == calc_mode_cfd_index or symbol_info.currency_margin == account_info.currency:
+        return margins
+
+    if symbol_info.trade_calc_mode in (calc_mode_forex, calc_mode_forex_no_leverage) and symbol_info.currency_margin != symbol_info.currency_profit:
+        margins = margins * prices
+
+    return margins * __profit_to_account_rate__(symbol_info)
+
+
+def sample_indexes(shape: tuple[int, ...], count: int) -> tuple[numpy.ndarray, ...]:
+    # Образцы для сверки с терминалом - равномерно по всей сетке, первый и последний элементы входят всегда
+    size = int(numpy.prod(shape))
+    flat_indexes = numpy.unique(numpy.linspace(0, size - 1, min(count, size)).round().astype('int64'))
+
+    return numpy.unravel_index(flat_indexes, shape)
@@ -1,20 +1,36 @@
-import json
+import asyncio
+import functools
 import logging
 import os
+import sys
 
 import seqlog
-import jsonpickle
-from flask import Flask, request
+from flask import Flask, request, Response
 from waitress import serve
 
 from config import app_config
-from auxiliary import web_helpers
-from metatrader.auxiliary import datetime_str_to_unix_time
+from auxiliary import web_helpers, binary_encoding, metrics
+from auxiliary.asgi_application import AsgiApplication
+from auxiliary.terminal_operations import TerminalOperations
+from metatrader import time_conversion
+from metatrader.bar_aggregation import AggregationCache
+from metatrader.bar_cache import BarCache
 from metatrader.enums.mt5_dealer_type_enum import Mt5DealerTypeEnum
+from metatrader.history_ledger import HistoryLedger
+from metatrader.position_index import PositionIndex
+from metatrader.symbol_catalog import SymbolCatalog
 from metatrader.terminal_integration import MetaTrader5Integration
+from metatrader.terminal_process_pool import TerminalProcessPool
+from metatrader.terminal_state_cache import TerminalStateCache
+from metatrader.terminal_simulator import TerminalSimulator
+from metatrader.terminal_worker import TerminalWorker
 
 app = Flask(__name__)
 
+mt5: MetaTrader5Integration
+operations: TerminalOperations
+current_dealer: Mt5DealerTypeEnum
+
 # region Terminal Info
 terminal_info_controller = '/terminal-info'
 
@@ -22,9 +38,9 @@ terminal_info_controller = '/terminal-info'
 @app.route(f'{terminal_info_controller}/version', methods=['POST'])
 def get_version():
     def internal():
-        return json.dumps(mt5.get_version())
+        return operations.get_version({})
 
-    return web_helpers.execute(internal, mt5)
+    return web_helpers.execute(internal)
 
 
 # endregion
@@ -38,11 +54,9 @@ def get_account_info():
     def internal():
         __dealer_validate__(request)
 
-        account_info_dirt = mt5.get_account_info()
-        account_info = web_helpers.dict_keys_modify(account_info_dirt, web_helpers.snake_to_lower_camel_case)
-        return jsonpickle.encode(account_info, unpicklable=False)
+        return operations.get_account_info(request.get_json())
 
-    return web_helpers.execute(internal, mt5)
+    return web_helpers.execute(internal)
 
 
 # endregion
@@ -56,10 +70,9 @@ def get_opened_positions():
     def internal():
         __dealer_validate__(request)
 
-        opened_positions = mt5.get_opened_positions()
-        return jsonpickle.encode(opened_positions, unpicklable=False)
+        return operations.get_opened_positions(request.get_json())
 
-    return web_helpers.execute(internal, mt5)
+    return web_helpers.execute(internal)
 
 
 # endregion
@@ -73,12 +86,9 @@ def get_symbols():
     def internal():
         __dealer_validate__(request)
 
-        symbols_dirt = mt5.get_symbols()
-        symbols = list(map(lambda x: web_helpers.dict_keys_modify(x, web_helpers.snake_to_lower_camel_case), symbols_dirt))
+        return operations.get_symbols(request.get_json())
 
-        return jsonpickle.encode(symbols, unpicklable=False)
-
-    return web_helpers.execute(internal, mt5)
+    return web_helpers.execute_with_etag(internal, request.headers.get('If-None-Match'))
 
 
 @app.route(f'{symbol_info_controller}/get-symbol-info', methods=['POST'])
@@ -86,14 +96,39 @@ def get_symbol_info():
     def internal():
         __dealer_validate__(request)
 
-        data = request.get_json()
-        symbol = data['symbol']
+        return operations.get_symbol_info(request.get_json())
+
+    return web_helpers.execute_with_etag(internal, request.headers.get('If-None-Match'))
+
+
+@app.route(f'{symbol_info_controller}/get-symbols-static', methods=['POST'])
+def get_symbols_static():
+    def internal():
+        __dealer_validate__(request)
+
+        return operations.get_symbols_static(request.get_json())
+
+    return web_helpers.execute_with_etag(internal, request.headers.get('If-None-Match'))
+
+
+@app.route(f'{symbol_info_controller}/get-symbol-static-info', methods=['POST'])
+def get_symbol_static_info():
+    def internal():
+        __dealer_validate__(request)
+
+        return operations.get_symbol_static_info(request.get_json())
+
+    return web_helpers.execute_with_etag(internal, request.headers.get('If-None-Match'))
+
 
-        symbol_info_dirt = mt5.get_symbol_info(symbol)
-        symbol_info = web_helpers.dict_keys_modify(symbol_info_dirt, web_helpers.snake_to_lower_camel_case)
-        return jsonpickle.encode(symbol_info, unpicklable=False)
+@app.route(f'{symbol_info_controller}/get-symbols-volatile', methods=['POST'])
+def get_symbols_volatile():
+    def internal():
+        __dealer_validate__(request)
+
+        return operations.get_symbols_volatile(request.get_json())
 
-    return web_helpers.execute(internal, mt5)
+    return web_helpers.execute_with_etag(internal, request.headers.get('If-None-Match'))
 
 
 # endregion
@@ -107,34 +142,39 @@ def update_stop_loss():
     def internal():
         __dealer_validate__(request)
 
-        data = request.get_json()
-        identifier = int(data['identifier'])
-        sl_value = float(data['stopLossValue'])
+        return operations.update_stop_loss(request.get_json())
 
-        result_dirt = mt5.update_stop_loss(identifier, sl_value)
-        result = web_helpers.dict_keys_modify(result_dirt, web_helpers.snake_to_lower_camel_case)
+    return web_helpers.execute(internal)
 
-        return jsonpickle.encode(result, unpicklable=False)
 
-    return web_helpers.execute(internal, mt5)
+@app.route(f'{position_management_controller}/update-stop-losses', methods=['POST'])
+def update_stop_losses():
+    def internal():
+        __dealer_validate__(request)
 
+        return operations.update_stop_losses(request.get_json())
 
-@app.route(f'{position_management_controller}/close-position', methods=['POST'])
-def close_position():
+    return web_helpers.execute(internal)
+
+
+@app.route(f'{position_management_controller}/submit-orders', methods=['POST'])
+def submit_orders():
     def internal():
         __dealer_validate__(request)
 
-        data = request.get_json()
-        symbol = data['symbol']
+        return operations.submit_orders(request.get_json())
 
-        result = mt5.close_position(symbol)
+    return web_helpers.execute(internal)
 
-        if result is True:
-            return '{ }'
 
-        raise Exception('Unknown error')
+@app.route(f'{position_management_controller}/close-position', methods=['POST'])
+def close_position():
+    def internal():
+        __dealer_validate__(request)
+
+        return operations.close_position(request.get_json())
 
-    return web_helpers.execute(internal, mt5)
+    return web_helpers.execute(internal)
 
 
 @app.route(f'{position_management_controller}/open-position', methods=['POST'])
@@ -142,18 +182,9 @@ def open_position():
     def internal():
         __dealer_validate__(request)
 
-        data = request.get_json()
-        symbol = data['symbol']
-        action_str = data['action']
-        volume = float(data['volume'])
-        stop_loss = float(data['stopLoss'])
-
-        result_dirt = mt5.open_position(action_str, symbol, volume, stop_loss)
-        result = web_helpers.dict_keys_modify(result_dirt, web_helpers.snake_to_lower_camel_case)
+        return operations.open_position(request.get_json())
 
-        return jsonpickle.encode(result, unpicklable=False)
-
-    return web_helpers.execute(internal, mt5)
+    return web_helpers.execute(internal)
 
 
 # endregion
@@ -164,57 +195,75 @@ quotes_controller = '/quotes'
 
 @app.route(f'{quotes_controller}/get-last-quotes', methods=['POST'])
 def get_last_quotes():
+    media_type = binary_encoding.negotiate(request.accept_mimetypes)
+
     def internal():
         __dealer_validate__(request)
 
-        data = request.get_json()
-        symbols = data['symbols']
-        timeframe = data['timeframe']
-        count = int(data['count'])
-
-        last_quotes = mt5.get_last_quotes(symbols, timeframe, count)
-        return jsonpickle.encode(last_quotes, unpicklable=False)
+        return operations.get_last_quotes(request.get_json(), media_type)
 
-    return web_helpers.execute(internal, mt5)
+    return web_helpers.execute_negotiated(internal, media_type)
 
 
 @app.route(f'{quotes_controller}/get-quotes', methods=['POST'])
 def get_quotes():
+    media_type = binary_encoding.negotiate(request.accept_mimetypes)
+
     def internal():
         __dealer_validate__(request)
 
-        data = request.get_json()
-        symbol = data['symbol']
-        timeframe = data['timeframe']
-        count = int(data['count'])
-
-        quotes = mt5.get_quotes(symbol, timeframe, count)
-        return jsonpickle.encode(quotes, unpicklable=False)
+        return operations.get_quotes(request.get_json(), media_type)
 
-    return web_helpers.execute(internal, mt5)
+    return web_helpers.execute_negotiated(internal, media_type)
 
 
 @app.route(f'{quotes_controller}/get-range-quotes', methods=['POST'])
 def get_range_quotes():
+    media_type = binary_encoding.negotiate(request.accept_mimetypes)
+
     def internal():
         __dealer_validate__(request)
 
-        data = request.get_json()
-        symbol = data['symbol']
-        timeframe = data['timeframe']
-        date_from = datetime_str_to_unix_time(data['dateFrom'])
-        date_to = datetime_str_to_unix_time(data['dateTo'])
+        return operations.get_range_quotes(request.get_json(), media_type)
 
-        quotes = mt5.get_range_quotes(symbol, timeframe, date_from, date_to)
-        return jsonpickle.encode(quotes, unpicklable=False)
+    return web_helpers.execute_negotiated(internal, media_type)
 
-    return web_helpers.execute(internal, mt5)
+
+@app.route(f'{quotes_controller}/get-aggregated-quotes', methods=['POST'])
+def get_aggregated_quotes():
+    media_type = binary_encoding.negotiate(request.accept_mimetypes)
+
+    def internal():
+        __dealer_validate__(request)
+
+        return operations.get_aggregated_quotes(request.get_json(), media_type)
+
+    return web_helpers.execute_negotiated(internal, media_type)
+
+
+@app.route(f'{quotes_controller}/stream-quotes', methods=['POST'])
+def stream_quotes():
+    def internal():
+        __dealer_validate__(request)
+
+        return operations.stream_quotes(request.get_json())
+
+    return web_helpers.execute_stream(internal)
+
+
+@app.route(f'{quotes_controller}/stream-range-quotes', methods=['POST'])
+def stream_range_quotes():
+    def internal():
+        __dealer_validate__(request)
+
+        return operations.stream_range_quotes(request.get_json())
+
+    return web_helpers.execute_stream(internal)
 
 
 # endregion
 
 # region order_check
-
 order_check_controller = '/order-check'
 
 
@@ -223,17 +272,9 @@ def order_calc_profit():
     def internal():
         __dealer_validate__(request)
 
-        data = request.get_json()
-        symbol = data['symbol']
-        action_str = data['action']
-        volume = float(data['volume'])
-        price_open = float(data['priceOpen'])
-        price_close = float(data['priceClose'])
-
-        result = mt5.order_calc_profit(action_str, symbol, volume, price_open, price_close)
-        return jsonpickle.encode(result, unpicklable=False)
+        return operations.order_calc_profit(request.get_json())
 
-    return web_helpers.execute(internal, mt5)
+    return web_helpers.execute(internal)
 
 
 @app.route(f'{order_check_controller}/order-calc-margin', methods=['POST'])
@@ -241,117 +282,388 @@ def order_calc_margin():
     def internal():
         __dealer_validate__(request)
 
-        data = request.get_json()
-        symbol = data['symbol']
-        action_str = data['action']
-        volume = float(data['volume'])
-        price_open = float(data['priceOpen'])
+        return operations.order_calc_margin(request.get_json())
 
-        result = mt5.order_calc_margin(action_str, symbol, volume, price_open)
-        return jsonpickle.encode(result, unpicklable=False)
+    return web_helpers.execute(internal)
 
-    return web_helpers.execute(internal, mt5)
 
+@app.route(f'{order_check_controller}/order-calc-profit-grid', methods=['POST'])
+def order_calc_profit_grid():
+    def internal():
+        __dealer_validate__(request)
 
-@app.route(f'{order_check_controller}/order-check', methods=['POST'])
-def order_check():
+        return operations.order_calc_profit_grid(request.get_json())
+
+    return web_helpers.execute(internal)
+
+
+@app.route(f'{order_check_controller}/order-calc-margin-grid', methods=['POST'])
+def order_calc_margin_grid():
     def internal():
         __dealer_validate__(request)
 
-        data = request.get_json()
-        symbol = data['symbol']
-        action_str = data['action']
-        volume = float(data['volume'])
-        stop_loss = float(data['stopLoss'])
+        return operations.order_calc_margin_grid(request.get_json())
+
+    return web_helpers.execute(internal)
+
 
-        result_dirt = mt5.order_check(action_str, symbol, volume, stop_loss)
-        result = web_helpers.dict_keys_modify(result_dirt, web_helpers.snake_to_lower_camel_case)
+@app.route(f'{order_check_controller}/order-check', methods=['POST'])
+def order_check():
+    def internal():
+        __dealer_validate__(request)
 
-        return jsonpickle.encode(result, unpicklable=False)
+        return operations.order_check(request.get_json())
 
-    return web_helpers.execute(internal, mt5)
+    return web_helpers.execute(internal)
 
 
 # endregion
 
 # region history
-
 get_history_controller = '/get-history'
 
 
 @app.route(f'{get_history_controller}/get-history-deals', methods=['POST'])
 def history_deals_get():
+    media_type = binary_encoding.negotiate(request.accept_mimetypes)
+
     def internal():
         __dealer_validate__(request)
 
-        data = request.get_json()
-        date_from = datetime_str_to_unix_time(data['dateFrom'])
-
-        result = mt5.history_deals_get(date_from)
-
-        return jsonpickle.encode(result, unpicklable=False)
+        return operations.history_deals_get(request.get_json(), media_type)
 
-    return web_helpers.execute(internal, mt5)
+    return web_helpers.execute_negotiated(internal, media_type)
 
 
 @app.route(f'{get_history_controller}/get-history-orders', methods=['POST'])
 def history_orders_get():
+    media_type = binary_encoding.negotiate(request.accept_mimetypes)
+
+    def internal():
+        __dealer_validate__(request)
+
+        return operations.history_orders_get(request.get_json(), media_type)
+
+    return web_helpers.execute_negotiated(internal, media_type)
+
+
+@app.route(f'{get_history_controller}/get-history-deals-since', methods=['POST'])
+def history_deals_since():
+    media_type = binary_encoding.negotiate(request.accept_mimetypes)
+
+    def internal():
+        __dealer_validate__(request)
+
+        return operations.history_deals_since(request.get_json(), media_type)
+
+    return web_helpers.execute_negotiated(internal, media_type)
+
+
+@app.route(f'{get_history_controller}/get-history-orders-since', methods=['POST'])
+def history_orders_since():
+    media_type = binary_encoding.negotiate(request.accept_mimetypes)
+
+    def internal():
+        __dealer_validate__(request)
+
+        return operations.history_orders_since(request.get_json(), media_type)
+
+    return web_helpers.execute_negotiated(internal, media_type)
+
+
+@app.route(f'{get_history_controller}/stream-history-deals', methods=['POST'])
+def stream_history_deals():
     def internal():
         __dealer_validate__(request)
 
-        data = request.get_json()
-        date_from = datetime_str_to_unix_time(data['dateFrom'])
+        return operations.stream_history_deals(request.get_json())
+
+    return web_helpers.execute_stream(internal)
+
 
-        result_dirt = mt5.history_orders_get(date_from)
-        result = list(map(lambda x: web_helpers.dict_keys_modify(x, web_helpers.snake_to_lower_camel_case), result_dirt))
+@app.route(f'{get_history_controller}/stream-history-orders', methods=['POST'])
+def stream_history_orders():
+    def internal():
+        __dealer_validate__(request)
 
-        return jsonpickle.encode(result, unpicklable=False)
+        return operations.stream_history_orders(request.get_json())
 
-    return web_helpers.execute(internal, mt5)
+    return web_helpers.execute_stream(internal)
 
 
 # endregion
 
-# region private
+# region Batch
+batch_controller = '/batch'
 
-def __dealer_validate__(_request: request):
-    data = _request.get_json()
-    dealer = data['dealerType']
 
-    if Mt5DealerTypeEnum[dealer] != current_dealer:
-        raise Exception(f'Invalid dealer - current dealer is {current_dealer}, but requested {dealer}')
+@app.route(batch_controller, methods=['POST'])
+def batch():
+    def internal():
+        __dealer_validate__(request)
+
+        return operations.batch(request.get_json())
+
+    return web_helpers.execute(internal)
 
 
 # endregion
 
-# configure application
-import sys
+# region Subscriptions
+subscriptions_controller = '/subscriptions'
 
-seqlog.configure_from_file('config/log_config.yml')
-logger = logging.getLogger('main_logger')
 
-if len(sys.argv) < 4:
-    raise Exception("Required args (dealer, port, environment) not specified")
+@app.route(f'{subscriptions_controller}/stream', methods=['GET'])
+def subscribe():
+    # Server-Sent Events: EventSource отправляет только GET, параметры - в строке запроса
+    def internal():
+        __dealer_value_validate__(request.args.get('dealerType'))
 
-dealer_str = sys.argv[1]
-current_dealer = Mt5DealerTypeEnum[dealer_str]
-port = int(sys.argv[2])
-env = sys.argv[3]
+        return operations.subscribe(request.args.to_dict())
 
-login = int(os.environ.get(f'{dealer_str}_Login_{env}'))
-password = os.environ.get(f'{dealer_str}_Password_{env}')
-server = os.environ.get(f'{dealer_str}_Server_{env}')
+    return web_helpers.execute_event_stream(internal)
 
-mt5: MetaTrader5Integration
 
-if current_dealer == Mt5DealerTypeEnum.AlfaForex:
-    mt5 = MetaTrader5Integration(app_config.ALPHA_FOREX_METATRADER_PATH, login, password, server, logging.getLogger('mt5_alfa_forex_logger'))
-elif current_dealer == Mt5DealerTypeEnum.Finam:
-    mt5 = MetaTrader5Integration(app_config.FINAM_METATRADER_PATH, login, password, server, logging.getLogger('mt5_finam_logger'))
-else:
-    raise Exception(f'Invalid dealer \'{sys.argv[1]}\'')
+async def subscribe_native(query: dict, body: bytes) -> tuple:
+    # Тот же поток событий для asyncio-сервера: обработчик работает в цикле событий, ожидание событий не занимает поток.
+    # Потоки событий делят поток цикла, поэтому время запроса не привязано к потоку и завершается при закрытии подписки
+    timings = metrics.RequestTimings(f'{subscriptions_controller}/stream')
+
+    def internal():
+        __dealer_value_validate__(query.get('dealerType'))
+
+        return operations.subscribe_async(query)
+
+    # Проверка символов может обновить справочник символов через терминал - в пуле потоков, цикл событий не ждет терминал
+    events, status, headers = await asyncio.get_running_loop().run_in_executor(None, web_helpers.execute_event_stream, internal)
 
-logger.info(f'Application stared for dealer \'{current_dealer}\' on port {port}')
+    if isinstance(events, str):
+        metrics.end_request(status, None, timings)
+        return events, status, headers
 
-# 1 поток, максимум 200 ожидающих соединений - может жестко жрать ресурсы и тупить - проверить
-serve(app, host="0.0.0.0", port=port, threads=1, connection_limit=200)
+    async def events_with_metrics():
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+            metrics.end_request(status, None, timings)
+
+    return events_with_metrics(), status, headers
+
+
+asgi_native_routes = {('GET', f'{subscriptions_controller}/stream'): subscribe_native}
+
+# endregion
+
+# region Service info
+service_info_controller = '/service-info'
+
+
+@app.route(f'{service_info_controller}/coalescing-stats', methods=['POST'])
+def get_coalescing_stats():
+    def internal():
+        return operations.get_coalescing_stats({})
+
+    return web_helpers.execute(internal)
+
+
+@app.route(f'{service_info_controller}/state-cache-stats', methods=['POST'])
+def get_state_cache_stats():
+    def internal():
+        return operations.get_state_cache_stats({})
+
+    return web_helpers.execute(internal)
+
+
+@app.route(f'{service_info_controller}/subscriptions-stats', methods=['POST'])
+def get_subscriptions_stats():
+    def internal():
+        return operations.get_subscriptions_stats({})
+
+    return web_helpers.execute(internal)
+
+
+@app.route(f'{service_info_controller}/health', methods=['GET'])
+def get_health():
+    # Для балансировщика и мониторинга: 503, пока терминал переподключается
+    return operations.get_health({}), 200 if mt5.connection_supervisor.is_available() else 503, {'Content-Type': 'application/json'}
+
+
+@app.route(f'{service_info_controller}/profiler-configure', methods=['POST'])
+def configure_profiler():
+    def internal():
+        return operations.configure_profiler(request.get_json())
+
+    return web_helpers.execute(internal)
+
+
+@app.route(f'{service_info_controller}/profiler-profiles', methods=['POST'])
+def get_profiles():
+    def internal():
+        return operations.get_profiles(request.get_json(silent=True) or {})
+
+    return web_helpers.execute(internal)
+
+
+@app.route(f'{service_info_controller}/profiler-dump', methods=['GET'])
+def dump_profiles():
+    # Collapsed stacks (format=collapsed) или файл speedscope (format=speedscope) по профилю id или по маршруту route
+    return web_helpers.execute_raw(lambda: operations.dump_profiles(request.args.to_dict()))
+
+
+# endregion
+
+# region metrics and profiling
+@app.before_request
+def begin_request_metrics():
+    metrics.begin_request(request.url_rule.rule if request.url_rule is not None else 'unknown')
+
+
+@app.after_request
+def end_request_metrics(response: Response) -> Response:
+    # Порции потокового ответа (страницы истории, котировок, события подписки) готовятся после after_request
+    # в том же потоке - такой запрос завершается при закрытии ответа
+    if response.is_streamed:
+        response.call_on_close(lambda: metrics.end_request(response.status_code, None))
+    else:
+        metrics.end_request(response.status_code, response.calculate_content_length())
+
+    return response
+
+
+@app.before_request
+def begin_request_profile():
+    # Выключенный профилировщик - одна проверка флага
+    if operations.request_profiler.enabled:
+        operations.request_profiler.begin(request.url_rule.rule if request.url_rule is not None else 'unknown')
+
+
+@app.after_request
+def end_request_profile(response: Response) -> Response:
+    if response.is_streamed:
+        response.call_on_close(__end_request_profile__)
+    else:
+        __end_request_profile__()
+
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return metrics.render(), 200, {'Content-Type': metrics.content_type}
+
+
+# endregion
+
+# region configuration
+def configure(mt5_integration: MetaTrader5Integration, dealer: Mt5DealerTypeEnum) -> None:
+    """Подключает маршруты к терминалу. Вызывается при запуске сервиса и в бенчмарках с симулятором терминала"""
+    global mt5, operations, current_dealer
+
+    mt5 = mt5_integration
+    operations = TerminalOperations(mt5_integration)
+    current_dealer = dealer
+
+    metrics.terminal_connected.set_function(lambda: int(mt5_integration.connection_supervisor.is_available()))
+    metrics.terminal_queue_depth.set_function(mt5_integration.terminal_worker.queue_depth)
+    metrics.subscribers.set_function(lambda: len(operations.subscription_hub.subscriptions))
+
+
+# endregion
+
+# region private
+
+def __dealer_validate__(_request: request):
+    with metrics.stage('parse'):
+        data = _request.get_json()
+
+    with metrics.stage('dealer_validation'):
+        __dealer_value_validate__(data['dealerType'])
+
+
+def __dealer_value_validate__(dealer: str):
+    if Mt5DealerTypeEnum[dealer] != current_dealer:
+        raise Exception(f'Invalid dealer - current dealer is {current_dealer}, but requested {dealer}')
+
+
+def __end_request_profile__() -> None:
+    if operations.request_profiler.active:
+        operations.request_profiler.end()
+
+
+# endregion
+
+# configure application
+if __name__ == '__main__':
+    seqlog.configure_from_file('config/log_config.yml')
+    logger = logging.getLogger('main_logger')
+
+    if len(sys.argv) < 4:
+        raise Exception("Required args (dealer, port, environment) not specified")
+
+    dealer_str = sys.argv[1]
+    port = int(sys.argv[2])
+    env = sys.argv[3]
+    http_server = sys.argv[4] if len(sys.argv) > 4 else app_config.HTTP_SERVER
+
+    terminal_worker = TerminalWorker(app_config.MT5_QUEUE_SIZE, app_config.MT5_QUEUE_PUT_TIMEOUT_SECONDS, logger)
+    symbol_catalog = SymbolCatalog(app_config.SYMBOL_CATALOG_REFRESH_SECONDS)
+    bar_cache = BarCache(os.path.join(app_config.BAR_CACHE_PATH, f'{dealer_str}_{env}'), app_config.BAR_CACHE_MAX_SIZE_BYTES, logger)
+    history_ledger = HistoryLedger(os.path.join(app_config.HISTORY_LEDGER_PATH, f'{dealer_str}_{env}.sqlite3'), app_config.HISTORY_LEDGER_OVERLAP_SECONDS, logger)
+
+    if env == app_config.SIMULATOR_ENVIRONMENT:
+        # Терминал в памяти процесса - для профилирования и нагрузочных тестов без MetaTrader
+        terminal_factory = functools.partial(TerminalSimulator, app_config.SIMULATOR_SYMBOLS_COUNT, app_config.SIMULATOR_POSITIONS_COUNT,
+                                             app_config.SIMULATOR_HISTORY_SIZE, app_config.SIMULATOR_BARS_COUNT, app_config.SIMULATOR_LATENCY_SECONDS)
+        terminal = terminal_factory()
+        login, password, server = 0, '', ''
+    else:
+        terminal_factory = None
+        terminal = None
+        login = int(os.environ.get(f'{dealer_str}_Login_{env}'))
+        password = os.environ.get(f'{dealer_str}_Password_{env}')
+        server = os.environ.get(f'{dealer_str}_Server_{env}')
+
+    dealer = Mt5DealerTypeEnum[dealer_str]
+
+    if dealer == Mt5DealerTypeEnum.AlfaForex:
+        metatrader_path, mt5_logger = app_config.ALPHA_FOREX_METATRADER_PATH, logging.getLogger('mt5_alfa_forex_logger')
+    elif dealer == Mt5DealerTypeEnum.Finam:
+        metatrader_path, mt5_logger = app_config.FINAM_METATRADER_PATH, logging.getLogger('mt5_finam_logger')
+    else:
+        raise Exception(f'Invalid dealer \'{sys.argv[1]}\'')
+
+    time_conversion.set_broker_utc_offset(app_config.BROKER_UTC_OFFSET_SECONDS[dealer_str])
+
+    # Пул процессов со своими подключениями к терминалу - для get-last-quotes по большому списку символов
+    terminal_process_pool = None
+
+    if app_config.TERMINAL_PROCESS_POOL_SIZE > 0:
+        terminal_process_pool = TerminalProcessPool(app_config.TERMINAL_PROCESS_POOL_SIZE, app_config.TERMINAL_PROCESS_POOL_TASK_TIMEOUT_SECONDS,
+                                                    metatrader_path, login, password, server, mt5_logger, terminal_factory)
+
+    mt5_integration = MetaTrader5Integration(metatrader_path, login, password, server, mt5_logger, bar_cache, terminal_worker, symbol_catalog,
+                                             terminal, history_ledger, terminal_process_pool, app_config.TERMINAL_PROCESS_POOL_MIN_SYMBOLS,
+                                             AggregationCache(app_config.AGGREGATION_CACHE_MAX_ENTRIES, app_config.AGGREGATION_ANCHOR_INTERVALS),
+                                             app_config.RECONNECT_INITIAL_BACKOFF_SECONDS, app_config.RECONNECT_MAX_BACKOFF_SECONDS,
+                                             PositionIndex(app_config.POSITION_INDEX_REFRESH_SECONDS),
+                                             TerminalStateCache(app_config.TERMINAL_STATE_CACHE_TTL_SECONDS))
+
+    configure(mt5_integration, dealer)
+
+    logger.info(f'Application stared for dealer \'{current_dealer}\' on port {port} ({http_server})')
+
+    if http_server == 'asgi':
+        # uvicorn нужен только для этого режима, поэтому импортируется здесь
+        import uvicorn
+
+        uvicorn.run(AsgiApplication(app, app_config.ASGI_THREADS, asgi_native_routes), host="0.0.0.0", port=port, log_config=None,
+                    access_log=False, timeout_keep_alive=app_config.ASGI_KEEP_ALIVE_SECONDS)
+    elif http_server == 'waitress':
+        # Разбор запросов и сериализация идут параллельно в потоках waitress, обращения к MetaTrader - в terminal_worker.
+        # Каждый открытый поток событий занимает поток waitress, поэтому под подписчиков потоки выделены сверх WAITRESS_THREADS
+        serve(app, host="0.0.0.0", port=port, threads=app_config.WAITRESS_THREADS + app_config.SUBSCRIPTION_MAX_SUBSCRIBERS,
+              connection_limit=app_config.WAITRESS_CONNECTION_LIMIT + app_config.SUBSCRIPTION_MAX_SUBSCRIBERS)
+    else:
+        raise Exception(f'Invalid HTTP server \'{http_server}\', expected waitress or asgi')